@@ -0,0 +1,57 @@
+"""
+Compare inline tokenizing throughput of the single-pass scanner against the
+original chained split_nodes_* passes, on large paragraphs with many links.
+
+    python3 benchmarks/bench_inline.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from textnode import TextNode, TextType
+from main import text_to_textnodes, split_nodes_delimiter, split_nodes_image, split_nodes_link
+
+
+def chained_text_to_textnodes(text):
+    nodes = [TextNode(text, TextType.NORMAL_TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD_TEXT)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC_TEXT)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE_TEXT)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def make_paragraph(sentences):
+    parts = []
+    for i in range(sentences):
+        parts.append(
+            f"Sentence {i} has **bold words**, some _emphasis_ and `inline code`, "
+            f"a [link number {i}](https://example.com/page/{i}) and "
+            f"an ![image {i}](/images/{i}.png) before [another link](/blog/{i})."
+        )
+    return " ".join(parts)
+
+
+def bench(name, func, text, repeat=5):
+    number = max(1, 2000000 // len(text))
+    best = min(timeit.repeat(lambda: func(text), number=number, repeat=repeat)) / number
+    megabytes = len(text) / 1e6
+    print(f"  {name:<10} {best * 1000:9.3f} ms/call {megabytes / best:8.2f} MB/s")
+    return best
+
+
+def main():
+    for sentences in (10, 100, 1000):
+        text = make_paragraph(sentences)
+        assert chained_text_to_textnodes(text) == text_to_textnodes(text)
+        print(f"{sentences} sentences, {len(text)} chars, {len(text_to_textnodes(text))} nodes")
+        chained = bench("chained", chained_text_to_textnodes, text)
+        scanner = bench("scanner", text_to_textnodes, text)
+        print(f"  speedup    {chained / scanner:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Report peak memory and node object counts while converting one large document.
+
+    python3 benchmarks/bench_memory.py --blocks 20000
+
+Run in a fresh process so peak RSS reflects this document only.
+"""
+import argparse
+import contextlib
+import gc
+import os
+import random
+import resource
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_page
+from htmlnode import HTMLNode
+import main as pipeline
+from main import generate_page, markdown_to_html_node, text_to_textnodes
+from textnode import TextNode
+
+
+def count_nodes(tree):
+    counts = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        name = type(node).__name__
+        counts[name] = counts.get(name, 0) + 1
+        stack.extend(node.children or ())
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory used by the node classes")
+    parser.add_argument("--blocks", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    markdown = make_page(random.Random(args.seed), args.blocks)
+    gc.collect()
+
+    tracemalloc.start()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tree = markdown_to_html_node(markdown)
+        text_nodes = text_to_textnodes(markdown)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    counts = count_nodes(tree)
+    html_nodes = sum(counts.values())
+    print(f"markdown:          {len(markdown) / 1e6:.2f} MB, {args.blocks} blocks")
+    print(f"HTML nodes:        {html_nodes} ({', '.join(f'{n} {name}' for name, n in sorted(counts.items()))})")
+    print(f"TextNodes:         {len(text_nodes)} from tokenizing the whole document")
+    print(f"bytes per node:    HTMLNode {bytes_per_instance(lambda: HTMLNode('p', None)):.0f}, "
+          f"TextNode {bytes_per_instance(lambda: TextNode('x', None)):.0f}")
+    print(f"traced peak:       {peak / 1e6:.2f} MB (still held {current / 1e6:.2f} MB)")
+    print(f"peak RSS:          {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+    del tree, text_nodes
+    with tempfile.TemporaryDirectory(prefix="ssg-bench-") as tmp:
+        source = os.path.join(tmp, "page.md")
+        template = os.path.join(tmp, "template.html")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(markdown)
+        with open(template, "w", encoding="utf-8") as f:
+            f.write("<title>{{ Title }}</title><article>{{ Content }}</article>")
+        del markdown
+
+        whole = page_peak(source, template, os.path.join(tmp, "whole.html"), threshold=float("inf"))
+        streamed = page_peak(source, template, os.path.join(tmp, "streamed.html"), threshold=0)
+    print(f"generate_page:     {whole / 1e6:.2f} MB peak read whole, {streamed / 1e6:.2f} MB streamed")
+
+
+def page_peak(source, template, dest, threshold):
+    """Traced peak of one generate_page call with the given streaming threshold"""
+    pipeline.STREAM_THRESHOLD = threshold
+    gc.collect()
+    tracemalloc.start()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        generate_page(source, template, dest, "/")
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bytes_per_instance(make, count=10000):
+    tracemalloc.start()
+    instances = [make() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return size / count
+
+
+if __name__ == "__main__":
+    main()
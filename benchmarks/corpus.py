@@ -0,0 +1,161 @@
+"""
+Generate a synthetic site to benchmark the generator against.
+
+    python3 benchmarks/corpus.py /tmp/corpus --pages 5000 --blocks 60 --depth 3
+
+The output directory gets content/, static/ and template.html laid out like
+the real site, so it can be built with `cd /tmp/corpus && python3 .../src/main.py`.
+The same seed always produces the same corpus.
+"""
+import argparse
+import os
+import random
+import shutil
+
+# Relative weight of each block type in generated pages
+DEFAULT_MIX = {
+    "paragraph": 40,
+    "heading": 12,
+    "unordered_list": 12,
+    "ordered_list": 8,
+    "code": 8,
+    "quote": 8,
+    "link_list": 6,
+    "image": 6,
+}
+
+WORDS = (
+    "ring hobbit shire elf dwarf wizard mountain river forest road tower king "
+    "sword shadow light star song tale journey fellowship council dragon gold "
+    "stone tree horse ship harbour gate bridge lamp fire water wind"
+).split()
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <meta charset="utf-8" />
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def inline_text(rng, count):
+    """A sentence with a sprinkling of inline markup"""
+    parts = []
+    for _ in range(max(1, count // 6)):
+        kind = rng.random()
+        if kind < 0.15:
+            parts.append(f"**{words(rng, 2)}**")
+        elif kind < 0.3:
+            parts.append(f"_{words(rng, 2)}_")
+        elif kind < 0.4:
+            parts.append(f"`{rng.choice(WORDS)}()`")
+        elif kind < 0.55:
+            parts.append(f"[{words(rng, 2)}](/pages/{rng.randrange(1000)})")
+        parts.append(words(rng, 5))
+    return " ".join(parts)
+
+
+def make_block(rng, kind):
+    if kind == "paragraph":
+        return inline_text(rng, rng.randint(20, 80))
+    if kind == "heading":
+        return "#" * rng.randint(2, 4) + " " + words(rng, rng.randint(2, 6)).title()
+    if kind == "unordered_list":
+        return "\n".join(f"- {inline_text(rng, rng.randint(4, 14))}" for _ in range(rng.randint(2, 8)))
+    if kind == "ordered_list":
+        return "\n".join(f"{i}. {inline_text(rng, rng.randint(4, 14))}" for i in range(1, rng.randint(3, 9)))
+    if kind == "code":
+        lines = [f"    {rng.choice(WORDS)} = {rng.choice(WORDS)}({rng.randrange(100)})" for _ in range(rng.randint(2, 12))]
+        return "```\nfunc main() {\n" + "\n".join(lines) + "\n}\n```"
+    if kind == "quote":
+        return "\n".join(f"> {inline_text(rng, rng.randint(6, 20))}" for _ in range(rng.randint(1, 4)))
+    if kind == "link_list":
+        return "\n".join(f"- [{words(rng, 3)}](/blog/{rng.choice(WORDS)}/{i})" for i in range(rng.randint(3, 10)))
+    if kind == "image":
+        return f"![{words(rng, 3)}](/images/{rng.choice(WORDS)}.png)"
+    raise ValueError(f"unknown block kind {kind}")
+
+
+def make_page(rng, blocks, mix=DEFAULT_MIX):
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    parts = [f"# {words(rng, 4).title()}"]
+    for kind in rng.choices(kinds, weights, k=blocks):
+        parts.append(make_block(rng, kind))
+    return "\n\n".join(parts) + "\n"
+
+
+def page_paths(pages, depth, fanout=8):
+    """Spread pages over a directory tree up to depth levels deep"""
+    for i in range(pages):
+        parts = []
+        n = i
+        for _ in range(i % (depth + 1)):
+            parts.append(f"section{n % fanout}")
+            n //= fanout
+        yield os.path.join(*parts, f"page{i}", "index.md") if parts else os.path.join(f"page{i}", "index.md")
+
+
+def generate_corpus(dest, pages=100, blocks=40, depth=2, mix=DEFAULT_MIX, seed=0, images=8):
+    """Write a synthetic site into dest, replacing anything already there"""
+    rng = random.Random(seed)
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+
+    content_dir = os.path.join(dest, "content")
+    for relative_path in page_paths(pages, depth):
+        path = os.path.join(content_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_page(rng, blocks, mix))
+
+    static_dir = os.path.join(dest, "static", "images")
+    os.makedirs(static_dir)
+    with open(os.path.join(dest, "static", "index.css"), "w", encoding="utf-8") as f:
+        f.write("body { margin: 0 auto; max-width: 40em; }\n")
+    for i in range(images):
+        with open(os.path.join(static_dir, f"image{i}.png"), "wb") as f:
+            f.write(rng.randbytes(64 * 1024))
+
+    with open(os.path.join(dest, "template.html"), "w", encoding="utf-8") as f:
+        f.write(TEMPLATE)
+    return dest
+
+
+def parse_mix(text):
+    """Parse "paragraph=5,code=1" into a mix dict"""
+    mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown block kind {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic site for benchmarks")
+    parser.add_argument("dest")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--blocks", type=int, default=40, help="blocks per page")
+    parser.add_argument("--depth", type=int, default=2, help="deepest directory nesting under content/")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="block weights, e.g. paragraph=5,code=1")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_corpus(args.dest, args.pages, args.blocks, args.depth, args.mix, args.seed)
+    print(f"Wrote {args.pages} pages to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
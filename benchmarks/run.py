@@ -0,0 +1,216 @@
+"""
+Repeatable benchmarks for the markdown pipeline and a full site build.
+
+    python3 benchmarks/run.py --output results.json
+    python3 benchmarks/run.py --save-baseline baseline.json
+    python3 benchmarks/run.py --baseline baseline.json --threshold 0.30
+
+Every benchmark reports the best time per call over several repeats. With
+--baseline, any benchmark slower than the baseline by more than the
+threshold is listed and the script exits with status 1. site_build is a
+clean SiteBuilder build, the one main runs, of a synthetic corpus.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from builder import SiteBuilder, SiteConfig
+from corpus import generate_corpus, inline_text, make_page
+from main import (
+    block_to_block_type,
+    markdown_to_blocks,
+    markdown_to_html_node,
+    text_to_textnodes,
+)
+
+
+def measure(func, repeat=5, min_time=0.2, setup=None):
+    """
+    Best seconds per call, calling func often enough that each repeat takes
+    min_time. With setup, it's called untimed before every single call.
+    """
+    if setup is not None:
+        best = None
+        for _ in range(repeat):
+            setup()
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def micro_benchmarks(seed=0):
+    rng = random.Random(seed)
+    paragraph = inline_text(rng, 2000)
+    page = make_page(rng, 200)
+    blocks = [block for block in markdown_to_blocks(page) if block.strip()]
+    tree = markdown_to_html_node(page)
+
+    return {
+        "text_to_textnodes": lambda: text_to_textnodes(paragraph),
+        "markdown_to_blocks": lambda: markdown_to_blocks(page),
+        "block_to_block_type": lambda: [block_to_block_type(block) for block in blocks],
+        "markdown_to_html_node": lambda: markdown_to_html_node(page),
+        "to_html": lambda: tree.to_html(),
+    }
+
+
+def build_benchmark(root, pages, blocks, depth, seed=0):
+    """
+    (setup, build) for a clean SiteBuilder build of a synthetic corpus in
+    root, setup removes what the last build wrote and cached
+    """
+    generate_corpus(root, pages=pages, blocks=blocks, depth=depth, seed=seed)
+    config = SiteConfig(
+        static_dir=os.path.join(root, "static"), content_dir=os.path.join(root, "content"),
+        template_path=os.path.join(root, "template.html"), targets=[(os.path.join(root, "docs"), "/")],
+        cache_dir=os.path.join(root, "cache"),
+    )
+
+    def setup():
+        for directory in (config.targets[0][0], config.cache_dir):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def build():
+        with SiteBuilder(config) as builder:
+            if not builder.build().succeeded:
+                raise RuntimeError("the benchmark site failed to build")
+
+    return setup, build
+
+
+def _slower(results, baseline, threshold):
+    """Names of the benchmarks in results slower than in baseline by more than threshold"""
+    base = baseline.get("benchmarks", {})
+    return [
+        name for name, result in results.items()
+        if name in base and result["seconds"] / base[name]["seconds"] - 1 > threshold
+    ]
+
+
+def run(args, baseline=None):
+    """
+    Measure every benchmark. With a baseline, those past the threshold are
+    measured again, up to args.confirm times, keeping the best time, so
+    one noisy measurement doesn't count as a regression.
+    """
+    results = {}
+    report = sys.stdout
+    # The pipeline logs every page and warning, keep that out of the results
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory(prefix="ssg-bench-") as tmp, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        benchmarks = micro_benchmarks(args.seed)
+        setup, build = build_benchmark(tmp, args.pages, args.blocks, args.depth, args.seed)
+        benchmarks["site_build"] = build
+
+        def time_benchmark(name):
+            if name == "site_build":
+                return measure(benchmarks[name], repeat=args.repeat, setup=setup)
+            return measure(benchmarks[name], repeat=args.repeat)
+
+        for name in benchmarks:
+            if args.only and name not in args.only:
+                continue
+            results[name] = {"seconds": time_benchmark(name)}
+            print(f"{name:<26} {results[name]['seconds'] * 1000:12.4f} ms", file=report)
+
+        for _ in range(args.confirm if baseline else 0):
+            slower = _slower(results, baseline, args.threshold)
+            if not slower:
+                break
+            for name in slower:
+                seconds = time_benchmark(name)
+                print(f"{name:<26} {seconds * 1000:12.4f} ms, measured again", file=report)
+                results[name]["seconds"] = min(results[name]["seconds"], seconds)
+    logging.disable(logging.NOTSET)
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "corpus": {"pages": args.pages, "blocks": args.blocks, "depth": args.depth, "seed": args.seed},
+        "benchmarks": results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return (name, baseline seconds, new seconds) for every regression past threshold"""
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base:
+            continue
+        change = result["seconds"] / base["seconds"] - 1
+        print(f"{name:<26} {change:+8.1%} vs baseline")
+        if change > threshold:
+            regressions.append((name, base["seconds"], result["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the static site generator")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--save-baseline", help="write results as the baseline to compare later runs with")
+    parser.add_argument("--baseline", help="compare against a saved baseline")
+    # Below run-to-run noise, which reaches 20-50% for the smallest benchmarks on a shared machine
+    parser.add_argument("--threshold", type=float, default=0.30, help="allowed slowdown before failing, 0.30 is 30%%")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--confirm", type=int, default=3, help="times a benchmark past the threshold is measured again before it fails")
+    parser.add_argument("--pages", type=int, default=200, help="pages in the full build corpus")
+    parser.add_argument("--blocks", type=int, default=40)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="only run these benchmarks")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run(args, baseline)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=1)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            for name, before, after in regressions:
+                print(f"REGRESSION {name}: {before * 1000:.4f} ms -> {after * 1000:.4f} ms")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import main as pipeline
+from main import BuildContext, _read_text, generate_large_page, render_page
+from highlight import CACHE_VERSION as HIGHLIGHT_CACHE_VERSION, DEFAULT_MAX_BYTES as HIGHLIGHT_CACHE_MAX_BYTES
+from compress import minify_html
+from inline_memo import InlineMemo
+from output import OutputWriter, write_file
+from render_cache import open_render_cache
+from search import TermCounter
+from template import load_template
+
+DEFAULT_READERS = 16
+DEFAULT_WRITERS = 8
+# Pages waiting between two stages, so memory stays flat however big the site is
+DEFAULT_MAX_PENDING = 64
+
+logger = logging.getLogger(__name__)
+
+
+def _scan(directory):
+    """Sorted subdirectory names and markdown file names directly in directory"""
+    subdirectories = []
+    pages = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirectories.append(entry.name)
+            elif entry.name.endswith(".md"):
+                pages.append(entry.name)
+    return sorted(subdirectories), sorted(pages)
+
+
+def _read_page(path):
+    """The markdown in path, or None if the page is big enough to be streamed instead"""
+    if os.path.getsize(path) >= pipeline.STREAM_THRESHOLD:
+        return None
+    return _read_text(path)
+
+
+class AsyncBuilder:
+    """
+    Builds the pages under content_dir with file I/O overlapping parsing.
+
+    Sources are discovered, read and written on a thread pool, while pages
+    are parsed one at a time on the event loop as their markdown arrives.
+    Each stage hands pages to the next through a bounded queue, so a slow
+    stage holds the others back instead of letting pages pile up in memory.
+    The files written are the same as generate_pages_recursive's, rendered
+    with build's options, apart from pages big enough to be streamed, which
+    aren't minified. Sources in skip, like drafts, aren't built. The render
+    cache isn't used.
+    """
+
+    def __init__(self, content_dir, template_path, dest_dir, basepath, build=None, readers=DEFAULT_READERS,
+                 writers=DEFAULT_WRITERS, max_pending=DEFAULT_MAX_PENDING, skip=()):
+        self.content_dir = content_dir
+        self.template_path = template_path
+        self.dest_dir = dest_dir
+        self.basepath = basepath
+        self.build = build or BuildContext()
+        self.options = self.build.options
+        self.readers = readers
+        self.writers = writers
+        self.max_pending = max_pending
+        self.skip = skip
+        if self.build.inline_memo is None and self.options.inline_memo_bytes:
+            self.build = self.build.replace(inline_memo=InlineMemo(self.options.inline_memo_bytes))
+
+        self.templates = {}
+        self.failures = []
+        self.changed = []
+        self.unchanged = 0
+
+    async def run(self):
+        """Build every page, returns the sources that failed"""
+        # A None on a queue tells its consumer that the stage before it is done
+        self.to_read = asyncio.Queue(self.max_pending)
+        self.to_parse = asyncio.Queue(self.max_pending)
+        self.to_write = asyncio.Queue(self.max_pending)
+
+        # Pages are only parsed on the event loop's thread, which is the one using this
+        if self.options.highlight_cache_path:
+            self.build = self.build.replace(highlight_cache=open_render_cache(
+                self.options.highlight_cache_path, HIGHLIGHT_CACHE_VERSION, HIGHLIGHT_CACHE_MAX_BYTES,
+            ))
+        with ThreadPoolExecutor(max_workers=self.readers + self.writers + 1) as self.executor:
+            await asyncio.gather(
+                self.discover(),
+                *[self.read() for _ in range(self.readers)],
+                self.parse(),
+                *[self.write() for _ in range(self.writers)],
+            )
+        return self.failures
+
+    async def io(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def fail(self, from_path, dest_path, error):
+        logger.error(f"Failed to generate {dest_path} from {from_path}: {type(error).__name__}: {error}")
+        self.failures.append(from_path)
+
+    async def discover(self):
+        directories = [(self.content_dir, self.dest_dir)]
+        while directories:
+            content_dir, dest_dir = directories.pop()
+            await self.io(os.makedirs, dest_dir, exist_ok=True)
+            subdirectories, pages = await self.io(_scan, content_dir)
+            for name in pages:
+                if os.path.join(content_dir, name) in self.skip:
+                    continue
+                output_filename = os.path.splitext(name)[0] + ".html"
+                await self.to_read.put((os.path.join(content_dir, name), os.path.join(dest_dir, output_filename)))
+            directories.extend(
+                (os.path.join(content_dir, name), os.path.join(dest_dir, name)) for name in reversed(subdirectories)
+            )
+
+        for _ in range(self.readers):
+            await self.to_read.put(None)
+
+    async def read(self):
+        while (page := await self.to_read.get()) is not None:
+            from_path, dest_path = page
+            try:
+                markdown = await self.io(_read_page, from_path)
+            except Exception as e:
+                self.fail(from_path, dest_path, e)
+                continue
+            await self.to_parse.put((from_path, dest_path, markdown))
+        await self.to_parse.put(None)
+
+    def template(self, from_path):
+        # Templates don't change during a build, so each is only loaded once
+        layouts = self.options.layouts
+        template_path = layouts.for_page(from_path) if layouts else self.template_path
+        if template_path not in self.templates:
+            self.templates[template_path] = load_template(template_path, self.basepath)
+        return template_path, self.templates[template_path]
+
+    def render(self, from_path, dest_path, markdown):
+        """The page's HTML, or None if it was too big and has been streamed to disk already"""
+        template_path, template = self.template(from_path)
+        logger.info(f"Generating page from {from_path} to {dest_path} using {template_path}")
+
+        links = []
+        terms = TermCounter()
+        build = self.build.replace(links=links, terms=terms)
+        if markdown is not None:
+            title, html = render_page(markdown, template, self.basepath, build)
+            if self.options.minify:
+                html = minify_html(html)
+        else:
+            writer = OutputWriter(jobs=0)
+            title = generate_large_page(from_path, template, dest_path, self.basepath, build.replace(output_writer=writer))
+            self.record(dest_path, bool(writer.changed))
+            html = None
+
+        if build.link_index is not None:
+            build.link_index.add(from_path, dest_path, links)
+        if build.search_index is not None:
+            build.search_index.add(from_path, dest_path, title, terms.counts())
+        return html
+
+    async def parse(self):
+        readers_left = self.readers
+        while readers_left:
+            page = await self.to_parse.get()
+            if page is None:
+                readers_left -= 1
+                continue
+
+            from_path, dest_path, markdown = page
+            try:
+                html = self.render(from_path, dest_path, markdown)
+            except Exception as e:
+                self.fail(from_path, dest_path, e)
+                continue
+            if html is not None:
+                await self.to_write.put((from_path, dest_path, html))
+
+        for _ in range(self.writers):
+            await self.to_write.put(None)
+
+    def record(self, dest_path, written):
+        if written:
+            self.changed.append(dest_path)
+        else:
+            self.unchanged += 1
+        logger.info(f"Successfully generated {dest_path}")
+
+    async def write(self):
+        while (page := await self.to_write.get()) is not None:
+            from_path, dest_path, html = page
+            try:
+                written = await self.io(write_file, dest_path, html)
+            except Exception as e:
+                self.fail(from_path, dest_path, e)
+                continue
+            self.record(dest_path, written)
+
+
+def build_async(content_dir, template_path, dest_dir, basepath, build=None, **builder_options):
+    """
+    Run an AsyncBuilder over content_dir in build, returns the sources that
+    failed.
+
+    Written outputs are added to the build's changed, and counts of written
+    and unchanged pages, and of the inline memo's lookups, to its stats.
+    """
+    builder = AsyncBuilder(content_dir, template_path, dest_dir, basepath, build, **builder_options)
+    memo = builder.build.inline_memo
+    memo_counts = memo.counts() if memo is not None else {}
+    failures = asyncio.run(builder.run())
+    build = builder.build
+    if build.changed is not None:
+        build.changed.extend(builder.changed)
+    if build.stats is not None:
+        build.stats["pages_written"] += len(builder.changed)
+        build.stats["pages_unchanged"] += builder.unchanged
+        if memo is not None:
+            build.stats.update({name: count - memo_counts[name] for name, count in memo.counts().items()})
+    return failures
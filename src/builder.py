@@ -0,0 +1,301 @@
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from main import (
+    CACHE_DIR, LAYOUTS_DIR, BuildContext, RenderOptions, build_incremental, collect_pages, generate_pages,
+    generated_files, stream_title, write_listings,
+)
+from async_build import build_async
+from compress import DEFAULT_JOBS as COMPRESS_JOBS, Precompressor, compressed_suffixes, minify_css
+from frontmatter import MetadataIndex
+from highlight import HIGHLIGHT_CSS_NAME, write_stylesheet
+from images import DEFAULT_JOBS as IMAGE_JOBS, ImagePipeline, format_unreferenced_images
+from inline_memo import DEFAULT_MAX_BYTES as INLINE_MEMO_MAX_BYTES, InlineMemo, format_memo_stats
+from links import LinkIndex, format_broken_links
+from listings import DEFAULT_PER_PAGE as LISTING_PER_PAGE, DEFAULT_SECTION as LISTING_SECTION, Listings
+from manifest import BuildManifest
+from output import write_changed_list
+from profiler import BuildProfiler
+from render_cache import DEFAULT_MAX_BYTES
+from search import SearchIndex, search_outputs
+from sync import sync_directory, format_sync_stats
+from template import Layouts
+
+logger = logging.getLogger(__name__)
+
+
+class SiteConfig:
+    """
+    Everything a build depends on, the options main takes as flags.
+
+    targets: (dest_dir, basepath) pairs, every one gets the whole site from
+    a single parse. Links are checked and search terms collected against
+    the first. cache_dir holds the manifest, caches and indexes kept
+    between builds. Raises ValueError for options that can't be combined.
+    """
+
+    def __init__(self, static_dir="static", content_dir="content", template_path="template.html",
+                 targets=(("docs", "/"),), cache_dir=CACHE_DIR, jobs=1, incremental=False, use_async=False,
+                 render_cache=False, render_cache_max_bytes=DEFAULT_MAX_BYTES, static_mode="reflink",
+                 static_hash=False, profile=False, profile_json=None, profile_top=10, minify=False,
+                 precompress=False, drafts=False, per_page=LISTING_PER_PAGE, site_url="", changed_list=None,
+                 inline_memo_bytes=INLINE_MEMO_MAX_BYTES):
+        self.static_dir = static_dir
+        self.content_dir = content_dir
+        self.template_path = template_path
+        self.layouts_dir = os.path.join(os.path.dirname(template_path), LAYOUTS_DIR)
+        self.targets = list(targets)
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.incremental = incremental
+        self.use_async = use_async
+        self.render_cache = render_cache
+        self.render_cache_max_bytes = render_cache_max_bytes
+        self.static_mode = static_mode
+        self.static_hash = static_hash
+        self.profile = profile
+        self.profile_json = profile_json or self.cache_path("profile.json")
+        self.profile_top = profile_top
+        self.minify = minify
+        self.precompress = precompress
+        self.drafts = drafts
+        self.per_page = per_page
+        self.site_url = site_url
+        self.changed_list = changed_list or self.cache_path("changed.txt")
+        self.inline_memo_bytes = inline_memo_bytes
+
+        if site_url and not (urlsplit(site_url).scheme and urlsplit(site_url).netloc):
+            raise ValueError(f"the site URL needs a scheme and host, like https://example.com, got {site_url!r}")
+        if not self.targets:
+            raise ValueError("at least one target is needed")
+        if len(self.targets) > 1 and (incremental or use_async):
+            raise ValueError("several targets can't be combined with incremental or async builds")
+        if use_async and (incremental or jobs > 1 or render_cache or profile):
+            raise ValueError("async builds can't be combined with incremental ones, several jobs, the render cache or profiling")
+
+    def cache_path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+
+class BuildResult:
+    """
+    What one SiteBuilder.build did.
+
+    written and unchanged count page outputs across every target, those of
+    pages an incremental build didn't regenerate included. failed holds the
+    sources that failed to generate, skipped the drafts left out. changed
+    holds every output written or removed, broken the (source, line, kind,
+    url) of every broken link. timings maps each stage to the seconds it
+    took, "total" to the whole build's. stats holds the build's counters.
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.unchanged = 0
+        self.failed = []
+        self.skipped = []
+        self.changed = []
+        self.broken = []
+        self.timings = {}
+        self.stats = Counter()
+        self.profiler = None
+
+    @property
+    def succeeded(self):
+        return not self.failed
+
+
+class SiteBuilder:
+    """
+    Builds a site from a SiteConfig, as often as asked, in one process.
+
+    Parsed templates and open caches already live as long as the process.
+    The builder keeps the rest warm between builds: the incremental
+    manifest, and the indexes of page metadata, images and precompressed
+    files, which are only read from disk by the first build, the inline
+    memo and, with several jobs, the worker processes. Every build still
+    checks its sources, so nothing is missed between builds. Progress is
+    logged to this module's and main's loggers.
+
+    Each build passes its own BuildContext down to the pages, so builders
+    can build side by side in one process. close, or leaving a with block,
+    shuts the workers down.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.manifest = None
+        self.metadata = MetadataIndex(config.content_dir, config.cache_path("metadata.json"))
+        self.image_pipeline = ImagePipeline(config.static_dir, config.targets[0][0], config.cache_path("images"))
+        self.precompressor = Precompressor(config.cache_path("precompress.json"))
+        self.inline_memo = InlineMemo(config.inline_memo_bytes) if config.inline_memo_bytes else None
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut down the worker processes, the next build starts new ones"""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _pool(self):
+        """The worker processes, started by the first build that needs them"""
+        if self.config.jobs > 1 and self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.config.jobs)
+        return self.pool
+
+    def _static_options(self):
+        config = self.config
+        static_options = {"use_hash": config.static_hash, "mode": config.static_mode}
+        if config.minify:
+            static_options["transforms"] = {".css": minify_css}
+        if config.precompress:
+            # Compressed copies of static files are kept only as long as the files themselves
+            static_options["companions"] = compressed_suffixes()
+        return static_options
+
+    def _build_pages(self, build, pages, skip, listings):
+        """Sync static files and generate pages into every target, returns the sources that failed"""
+        config = self.config
+        dest, basepath = config.targets[0]
+        static_options = self._static_options()
+        if config.incremental:
+            if self.manifest is None:
+                self.manifest = BuildManifest.load(config.cache_path("manifest.json"))
+            return build_incremental(
+                config.static_dir, config.content_dir, config.template_path, dest, basepath, build,
+                manifest_path=config.cache_path("manifest.json"), jobs=config.jobs, static_options=static_options,
+                skip=skip, listings=listings, manifest=self.manifest,
+            )
+
+        # Pages written here aren't recorded, the next incremental build can't trust its manifest
+        BuildManifest.invalidate(config.cache_path("manifest.json"))
+        self.manifest = None
+        for dest_dir, _ in config.targets:
+            keep = [os.path.join(dest_dir, os.path.relpath(page, dest)) for _, page in pages]
+            keep += generated_files(dest_dir, build.options.image_catalog, listings)
+            sync_stats = build.timed("copy", sync_directory, config.static_dir, dest_dir, keep, changed=build.changed, **static_options)
+            logger.info(format_sync_stats(config.static_dir, dest_dir, sync_stats))
+        if config.use_async:
+            return build_async(config.content_dir, config.template_path, dest, basepath, build, skip=skip)
+        return generate_pages(pages, config.template_path, basepath, config.jobs, build,
+                              targets=config.targets if len(config.targets) > 1 else None)
+
+    def build(self):
+        """
+        Build the site once, returns a BuildResult. Pages that fail are
+        reported in it, and end the build before anything else is written,
+        any other error is raised.
+        """
+        config = self.config
+        result = BuildResult()
+        started = time.perf_counter()
+        stage_started = started
+
+        def finish_stage(stage):
+            nonlocal stage_started
+            now = time.perf_counter()
+            result.timings[stage] = result.timings.get(stage, 0) + now - stage_started
+            stage_started = now
+
+        dest = config.targets[0][0]
+        link_index = LinkIndex()
+        search_index = SearchIndex()
+        # Made again every build, so added and removed layouts are noticed
+        layouts = Layouts(config.content_dir, config.layouts_dir, config.template_path)
+        if config.profile:
+            result.profiler = BuildProfiler()
+        logger.info("Now beginning static site generation...")
+        options = RenderOptions(
+            layouts=layouts, highlight_cache_path=config.cache_path("highlight.sqlite"), image_catalog=self.image_pipeline.scan(),
+            minify=config.minify, inline_memo_bytes=config.inline_memo_bytes,
+        )
+        if config.render_cache:
+            options = options.replace(cache_path=config.cache_path("render.sqlite"), cache_max_bytes=config.render_cache_max_bytes)
+        build = BuildContext(
+            options, profiler=result.profiler, stats=result.stats, link_index=link_index, search_index=search_index,
+            changed=result.changed, inline_memo=self.inline_memo, pool=self._pool(),
+        )
+        # Only every page's front matter is read for this, and only when the page changed
+        self.metadata.scan(stream_title)
+        listings = Listings(self.metadata, LISTING_SECTION, config.per_page)
+        skip = set() if config.drafts else self.metadata.drafts()
+        result.skipped = sorted(skip)
+        pages = collect_pages(config.content_dir, dest, skip)
+        finish_stage("scan")
+
+        result.failed = self._build_pages(build, pages, skip, listings)
+        result.written = result.stats["pages_written"]
+        result.unchanged = result.stats["pages_unchanged"]
+        finish_stage("pages")
+        if result.failed:
+            result.timings["total"] = time.perf_counter() - started
+            return result
+
+        referenced = link_index.targets(dest, "image")
+        listing_template = layouts.for_page(os.path.join(config.content_dir, LISTING_SECTION, "index.md"))
+        for dest_dir, target_basepath in config.targets:
+            # Listing pages a markdown page already makes are left to it
+            page_outputs = {output for _, output in collect_pages(config.content_dir, dest_dir, skip)}
+            listed = write_listings(listings, dest_dir, listing_template, target_basepath, page_outputs,
+                                    result.changed, config.minify)
+            finish_stage("listings")
+
+            # Variants of the images pages show, the rest are only reported
+            unreferenced = self.image_pipeline.build(referenced, max(config.jobs, IMAGE_JOBS), result.changed, dest_dir)
+            finish_stage("images")
+
+            # Built from what the pages collected as they were generated, no HTML is read back
+            # The listing pages have no search terms, but belong in the sitemap
+            result.changed.extend(search_index.retarget(dest, dest_dir).write(
+                dest_dir, target_basepath, config.site_url, listings.outputs(dest_dir, page_outputs),
+            ))
+            logger.info(f"Search index: {len(search_index)} pages in {', '.join(search_outputs(dest_dir, bool(config.site_url)))}")
+            if write_stylesheet(dest_dir):
+                result.changed.append(os.path.join(dest_dir, HIGHLIGHT_CSS_NAME))
+            finish_stage("search")
+
+            # Last, once everything it compresses is in place
+            if config.precompress:
+                compressed, unchanged = self.precompressor.compress(dest_dir, max(config.jobs, COMPRESS_JOBS), result.changed)
+                logger.info(f"Precompressed: {compressed} files in {dest_dir} compressed, {unchanged} unchanged")
+                finish_stage("compress")
+        logger.info(f"Listings: {listed} pages for {len(self.metadata.posts(LISTING_SECTION))} posts in {LISTING_SECTION}/, "
+                    f"{len(result.skipped)} drafts left out")
+        if not config.site_url:
+            logger.warning("Sitemap: left out, it needs a site URL for its absolute URLs")
+        logger.info(f"Images: {len(self.image_pipeline.catalog.images)} found, {len(unreferenced)} not referenced by any page")
+        if unreferenced:
+            logger.info(format_unreferenced_images(unreferenced))
+
+        write_changed_list(config.changed_list, result.changed, dest if len(config.targets) == 1 else os.curdir)
+        logger.info(f"Pages: {result.written} written, {result.unchanged} unchanged; "
+                    f"{len(result.changed)} changed files listed in {config.changed_list}")
+
+        # Every target has the same pages, so checking the first is enough
+        result.broken = link_index.check(dest, config.static_dir, listings.outputs(dest))
+        logger.info(f"Link check: {len(link_index)} references, {len(result.broken)} broken")
+        if result.broken:
+            logger.warning(format_broken_links(result.broken))
+        finish_stage("links")
+
+        if config.render_cache:
+            logger.info(f"Render cache: {result.stats['cache_hits']} hits, {result.stats['cache_misses']} misses")
+        if config.inline_memo_bytes:
+            logger.info(format_memo_stats(result.stats))
+        if result.profiler is not None:
+            result.profiler.finish()
+            logger.info(result.profiler.report(config.profile_top))
+            result.profiler.write_json(config.profile_json, config.profile_top)
+            logger.info(f"Profile written to {config.profile_json}")
+        result.timings["total"] = time.perf_counter() - started
+        return result
@@ -0,0 +1,195 @@
+import gzip
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_file
+from output import write_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_JOBS = os.cpu_count() or 4
+
+# Files worth sending compressed, everything else in static/ already is or barely shrinks
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".json", ".xml", ".svg", ".txt")
+
+# HTML whitespace, unlike \s this leaves non-breaking spaces alone
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f]+")
+
+# Comments, elements whose contents are kept as they are, and any other tag
+_HTML_TOKEN_RE = re.compile(
+    r"<!--.*?-->|<(pre|textarea|script|style)\b[^>]*>.*?</\1\s*>|</?[a-zA-Z!][^>]*>",
+    re.DOTALL | re.IGNORECASE,
+)
+_TAG_NAME_RE = re.compile(r"</?([a-zA-Z][\w-]*)")
+_STYLE_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.DOTALL | re.IGNORECASE)
+
+# Elements that don't flow with the text around them, so whitespace next to their tags never shows
+_BLOCK_ELEMENTS = frozenset({
+    "address", "article", "aside", "base", "blockquote", "body", "br", "dd", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "head", "header", "hr", "html", "li", "link", "main", "meta", "nav", "ol", "p", "pre",
+    "script", "section", "style", "table", "tbody", "td", "tfoot", "th", "thead", "title", "tr", "ul",
+    "!doctype",
+})
+
+_CSS_TOKEN_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|[ \t\n\r\f]+|[^"\'/ \t\n\r\f]+|/', re.DOTALL)
+
+# No whitespace is needed next to these in CSS, and none after a colon
+_CSS_PUNCTUATION = "{};,>"
+
+
+def _is_block(tag):
+    if tag.startswith("<!"):
+        return tag[:9].lower() == "<!doctype"
+    match = _TAG_NAME_RE.match(tag)
+    return match is not None and match.group(1).lower() in _BLOCK_ELEMENTS
+
+
+def minify_html(html):
+    """
+    html with comments dropped and whitespace collapsed to single spaces, or
+    left out next to block-level tags. The contents of pre, textarea and
+    script are kept exactly, those of style are minified as CSS.
+    """
+    texts = []
+    tags = []
+    text = []
+    position = 0
+    for match in _HTML_TOKEN_RE.finditer(html):
+        text.append(html[position:match.start()])
+        position = match.end()
+        tag = match.group(0)
+        if tag.startswith("<!--") and not tag.startswith("<!--["):
+            continue
+        if tag[:6].lower() == "<style":
+            tag = _STYLE_RE.sub(lambda style: style.group(1) + minify_css(style.group(2)) + style.group(3), tag)
+        texts.append(_WHITESPACE_RE.sub(" ", "".join(text)))
+        tags.append((tag, _is_block(tag)))
+        text = []
+    text.append(html[position:])
+    texts.append(_WHITESPACE_RE.sub(" ", "".join(text)))
+
+    # texts[i] sits between tags[i - 1] and tags[i]
+    parts = []
+    for i, text in enumerate(texts):
+        if i == 0 or tags[i - 1][1]:
+            text = text.lstrip(" ")
+        if i == len(tags) or tags[i][1]:
+            text = text.rstrip(" ")
+        parts.append(text)
+        if i < len(tags):
+            parts.append(tags[i][0])
+    return "".join(parts)
+
+
+def minify_css(css):
+    """css without comments, other than /*! ones, or whitespace it doesn't need"""
+    tokens = []
+    for token in _CSS_TOKEN_RE.findall(css):
+        if (token.startswith("/*") and not token.startswith("/*!")) or _WHITESPACE_RE.fullmatch(token):
+            if tokens and tokens[-1] != " ":
+                tokens.append(" ")
+        else:
+            tokens.append(token)
+
+    parts = []
+    for i, token in enumerate(tokens):
+        if token == " ":
+            following = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if not parts or not following or parts[-1][-1] in _CSS_PUNCTUATION + ":" or following[0] in _CSS_PUNCTUATION:
+                continue
+        elif token[0] not in "\"'":
+            # The last declaration of a block needn't end in ;
+            token = token.replace(";}", "}")
+            if token[0] == "}" and parts and parts[-1][-1] == ";":
+                parts[-1] = parts[-1][:-1]
+        parts.append(token)
+    return "".join(parts)
+
+
+def compressed_suffixes():
+    """Suffixes of the compressed copies Precompressor writes next to a file"""
+    return (".gz", ".br") if brotli is not None else (".gz",)
+
+
+def _compress_file(path):
+    """Write path's compressed copies, returns the ones that changed"""
+    with open(path, "rb") as f:
+        data = f.read()
+    # No timestamp in the gzip header, so unchanged input gives unchanged output
+    copies = {path + ".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies[path + ".br"] = brotli.compress(data, quality=11)
+    return [copy for copy, compressed in copies.items() if write_file(copy, compressed)]
+
+
+class Precompressor:
+    """
+    Writes gzip copies, and brotli ones when brotli is installed, of the text
+    files in an output directory next to them, for the server to send as
+    they are instead of compressing every response.
+
+    Files are remembered by size, mtime and content hash in index_path, so
+    only those whose content changed since the last build are compressed.
+    index_path is only read once, later builds reuse what the last one left.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.index = None
+
+    def _load_index(self):
+        if self.index is not None:
+            return self.index
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def compress(self, dest_dir, jobs=DEFAULT_JOBS, changed=None):
+        """
+        Compress the text files in dest_dir whose content changed, or whose
+        copies are missing, on a thread pool. Copies written are added to
+        changed. Returns (files compressed, files unchanged).
+        """
+        if changed is None:
+            changed = []
+        index = self._load_index()
+        previous = index.get(dest_dir, {})
+        entries = {}
+        stale = []
+        suffixes = compressed_suffixes()
+        for root, _, filenames in os.walk(dest_dir):
+            for filename in filenames:
+                if not filename.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                key = os.path.relpath(path, dest_dir).replace(os.sep, "/")
+                stat = os.stat(path)
+                entry = previous.get(key)
+                compressed = all(os.path.exists(path + suffix) for suffix in suffixes)
+                if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                    # Touched, it still needn't be compressed again if its bytes are the same
+                    content_hash = hash_file(path)
+                    if entry is None or entry["hash"] != content_hash:
+                        compressed = False
+                    entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": content_hash}
+                entries[key] = entry
+                if not compressed:
+                    stale.append(path)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(stale)))) as pool:
+                for written in pool.map(_compress_file, stale):
+                    changed.extend(written)
+        if entries != previous:
+            index[dest_dir] = entries
+            write_file(self.index_path, json.dumps(index, indent=1, sort_keys=True))
+        self.index = index
+        return len(stale), len(entries) - len(stale)
@@ -0,0 +1,199 @@
+import datetime
+import io
+import json
+import os
+
+from output import write_file
+
+FENCE = "---"
+
+# A page opening with --- that isn't closed this soon has no front matter, only its header is ever read
+MAX_FRONT_MATTER_LINES = 100
+
+# Bump when what MetadataIndex records about a page changes
+METADATA_VERSION = 1
+
+
+def _parse_value(value):
+    if value.startswith("[") and value.endswith("]"):
+        return [_unquote(item.strip()) for item in value[1:-1].split(",") if item.strip()]
+    if value.lower() == "true":
+        return True
+    if value.lower() == "false":
+        return False
+    return _unquote(value)
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def parse_front_matter(lines):
+    """
+    Parse the lines between the --- fences, a small YAML subset: key: value
+    pairs, true/false, quoted strings, and lists either as [a, b] or as
+    "- item" lines under an empty key. Keys are lowercased.
+    """
+    metadata = {}
+    key = None
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and key is not None and isinstance(metadata[key], list):
+            metadata[key].append(_unquote(stripped[2:].strip()))
+            continue
+        name, separator, value = stripped.partition(":")
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid front matter on line {number + 1}: {stripped!r}")
+        key = name.strip().lower()
+        value = value.strip()
+        metadata[key] = _parse_value(value) if value else []
+    return metadata
+
+
+def read_front_matter(f):
+    """
+    Read the front matter at the start of f, an open text file, leaving f
+    just after its closing fence. Returns {} and leaves f where it was if
+    there is none.
+    """
+    start = f.tell()
+    if f.readline().rstrip("\r\n") == FENCE:
+        lines = []
+        for line in iter(f.readline, ""):
+            if line.rstrip("\r\n") == FENCE:
+                return parse_front_matter(lines)
+            lines.append(line)
+            if len(lines) > MAX_FRONT_MATTER_LINES:
+                break
+    f.seek(start)
+    return {}
+
+
+def split_front_matter(markdown):
+    """(front matter, the markdown after it)"""
+    if not markdown.startswith(FENCE):
+        return {}, markdown
+    f = io.StringIO(markdown)
+    metadata = read_front_matter(f)
+    return metadata, markdown[f.tell():]
+
+
+def _text(value):
+    return value if isinstance(value, str) else ""
+
+
+def page_metadata(front_matter):
+    """
+    What the build uses from a page's front matter: title, date as
+    YYYY-MM-DD, tags, draft and description, with defaults filled in.
+    """
+    date = _text(front_matter.get("date"))
+    if date:
+        # Validated here so a typo fails the build instead of sorting wrongly
+        date = datetime.date.fromisoformat(date).isoformat()
+    tags = front_matter.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",")]
+    return {
+        "title": _text(front_matter.get("title")) or None,
+        "date": date,
+        "tags": [str(tag) for tag in tags if str(tag)],
+        "draft": front_matter.get("draft") is True,
+        "description": _text(front_matter.get("description")),
+    }
+
+
+def _read_page_metadata(path, find_title):
+    with open(path, "r", encoding="utf-8") as f:
+        metadata = page_metadata(read_front_matter(f))
+        if metadata["title"] is None:
+            # Stops at the first heading, usually right after the front matter
+            metadata["title"] = find_title(f)
+    return metadata
+
+
+class MetadataIndex:
+    """
+    Metadata of every page under content_dir, by source path, for the
+    pages that list other pages.
+
+    Only each page's front matter, and its lines up to the first heading
+    when the front matter has no title, are read. Entries are kept in
+    index_path by size and mtime, so a page is only read again once it
+    changes.
+
+    pages: markdown source path -> page_metadata of it, with its title
+    errors: markdown source path -> why its metadata couldn't be read,
+    like invalid front matter. Those pages are left out of pages, and fail
+    on their own when they're generated.
+
+    index_path is only read by the first scan, later ones reuse the entries
+    the last one left.
+    """
+
+    def __init__(self, content_dir, index_path):
+        self.content_dir = content_dir
+        self.index_path = index_path
+        self.pages = {}
+        self.errors = {}
+        self.entries = None
+
+    def _load_index(self):
+        if self.entries is not None:
+            return self.entries
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return index["pages"] if index.get("version") == METADATA_VERSION else {}
+
+    def scan(self, find_title):
+        """Read the metadata of new and changed pages, find_title(lines) finds a page's first heading"""
+        index = self._load_index()
+        entries = {}
+        self.errors = {}
+        for root, _, filenames in os.walk(self.content_dir):
+            for filename in filenames:
+                if not filename.endswith(".md"):
+                    continue
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                entry = index.get(path)
+                if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                    try:
+                        metadata = _read_page_metadata(path, find_title)
+                    except ValueError as e:
+                        # Read again next time, until it's fixed
+                        self.errors[path] = str(e)
+                        continue
+                    entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "metadata": metadata}
+                entries[path] = entry
+
+        if entries != index:
+            write_file(self.index_path, json.dumps({"version": METADATA_VERSION, "pages": entries}, indent=1, sort_keys=True))
+        self.entries = entries
+        self.pages = {path: entry["metadata"] for path, entry in sorted(entries.items())}
+        return self
+
+    def drafts(self):
+        return {path for path, metadata in self.pages.items() if metadata["draft"]}
+
+    def posts(self, section):
+        """
+        (source, metadata) of the published pages below content_dir/section,
+        other than its own index.md, newest first
+        """
+        section_dir = os.path.join(self.content_dir, section)
+        section_index = os.path.join(section_dir, "index.md")
+        posts = [
+            (path, metadata) for path, metadata in self.pages.items()
+            if path.startswith(section_dir + os.sep) and path != section_index and not metadata["draft"]
+        ]
+        posts.sort(key=lambda post: (post[1]["title"] or "", post[0]))
+        posts.sort(key=lambda post: post[1]["date"], reverse=True)
+        return posts
@@ -0,0 +1,81 @@
+import html
+import os
+
+from manifest import hash_text
+from output import write_file
+
+try:
+    import pygments
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:
+    pygments = None
+
+HIGHLIGHT_CSS_NAME = "highlight.css"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Bump when highlight's output changes. The pygments version is part of the
+# cache version too, so upgrading it re-highlights every snippet.
+HIGHLIGHTER_VERSION = 1
+CACHE_VERSION = f"{HIGHLIGHTER_VERSION}-pygments-{pygments.__version__ if pygments else 'none'}"
+
+# Class of highlighted <code> elements, highlight.css is scoped to it
+CSS_CLASS = "highlight"
+
+# language -> pygments lexer, or None for languages pygments doesn't know
+_lexers = {}
+
+
+def _lexer(language):
+    if language not in _lexers:
+        try:
+            # Keep the code's leading and trailing newlines as they are
+            _lexers[language] = get_lexer_by_name(language, stripnl=False, ensurenl=False)
+        except ClassNotFound:
+            _lexers[language] = None
+    return _lexers[language]
+
+
+def can_highlight(language):
+    return pygments is not None and bool(language) and _lexer(language) is not None
+
+
+def _highlight(code, language):
+    highlighted = pygments.highlight(code, _lexer(language), HtmlFormatter(nowrap=True))
+    if highlighted.endswith("\n") and not code.endswith("\n"):
+        highlighted = highlighted[:-1]
+    return highlighted
+
+
+def highlight(code, language, cache=None):
+    """
+    code as HTML to go inside a <code> element, escaped, with pygments
+    spans when language is one it knows.
+
+    Highlighted snippets are memoized in cache, a RenderCache, by language
+    and code hash, so a snippet repeated across pages is only highlighted once.
+    """
+    if not can_highlight(language):
+        return html.escape(code, quote=False)
+    if cache is None:
+        return _highlight(code, language)
+
+    key = hash_text(f"{language}\n{code}")
+    highlighted = cache.get(key)
+    if highlighted is None:
+        highlighted = _highlight(code, language)
+        cache.put(key, highlighted)
+    return highlighted
+
+
+def stylesheet():
+    """CSS for the classes highlight puts on code, empty without pygments"""
+    if pygments is None:
+        return ""
+    return HtmlFormatter().get_style_defs(f".{CSS_CLASS}") + "\n"
+
+
+def write_stylesheet(dest_dir):
+    """Write highlight.css into dest_dir, returns whether it changed"""
+    return write_file(os.path.join(dest_dir, HIGHLIGHT_CSS_NAME), stylesheet())
@@ -1,4 +1,10 @@
+# Elements that never have content or a closing tag
+VOID_ELEMENTS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"})
+
 class HTMLNode:
+    # Pages create a node per element, slots keep each one free of a __dict__
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -6,8 +12,16 @@ class HTMLNode:
         self.props = props
     
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def iter_html(self):
+        """Yield the node's HTML in chunks instead of building one string"""
         raise NotImplementedError
 
+    def write_html(self, out):
+        """Stream the node's HTML into a file-like object"""
+        out.writelines(self.iter_html())
+
     def props_to_html(self):
         if self.props is None:
             return ""
@@ -21,10 +35,14 @@ class HTMLNode:
         return f"HTMLNode\nTag: {self.tag}\nValue: {self.value}\nChildren: {self.children}\nProps: {self.props}"
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
     
     def to_html(self):
+        if self.tag in VOID_ELEMENTS:
+            return f"<{self.tag}{self.props_to_html()}>"
         if not self.value:
             raise ValueError("All leaf nodes must have a value")
         elif self.tag == None:
@@ -33,29 +51,27 @@ class LeafNode(HTMLNode):
             tags = self.props_to_html()
             return f"<{self.tag}{tags}>{self.value}</{self.tag}>"
 
-    def props_to_html(self):
-        return super().props_to_html()
-    
-    def __eq__(self, other_node):
-        return super().__eq__(other_node)
-    
-    def __repr__(self):
-        return super().__repr__()
-    
+    def iter_html(self):
+        yield self.to_html()
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def iter_html(self):
         if not self.tag:
             raise ValueError("every parent node needs a tag")
         if not self.children:
             raise ValueError("parent nodes must have children")
-        else:
-            opening = f"<{self.tag}>"
-            closing = f"</{self.tag}>"
-            children_html = ""
-            for child in self.children:
-                children_html += child.to_html()
-            
-            return opening + children_html + closing
+
+        yield f"<{self.tag}{self.props_to_html()}>"
+        for child in self.children:
+            # Leaves render to a single string, so skip a generator per leaf
+            if isinstance(child, ParentNode):
+                yield from child.iter_html()
+            else:
+                yield child.to_html()
+        yield f"</{self.tag}>"
+
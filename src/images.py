@@ -0,0 +1,265 @@
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from manifest import hash_file, hash_text
+from output import write_file
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Widths of the variants made of every image wider than them
+DEFAULT_WIDTHS = (480, 960, 1600)
+
+DEFAULT_JOBS = 4
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+# JPEG start-of-frame markers, the ones that hold the image size
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker in _JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def image_size(path):
+    """(width, height) read from the header of a PNG, JPEG, GIF or WebP file, or None"""
+    with open(path, "rb") as f:
+        head = f.read(30)
+        if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) == 30:
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        if head[:2] == b"\xff\xd8":
+            return _jpeg_size(f)
+    return None
+
+
+def image_key(url):
+    """The static-relative path a root-relative URL points at, or None for any other URL"""
+    if not url.startswith("/") or url.startswith("//"):
+        return None
+    return url[1:].split("?", 1)[0].split("#", 1)[0]
+
+
+def variant_path(path, width):
+    """images/photo.png -> images/photo-480w.png"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}-{width}w{extension}"
+
+
+class ImageCatalog:
+    """
+    Sizes of the images under the static directory, by their path relative
+    to it, used to fill in the attributes of <img> elements as pages are
+    rendered. Small enough to hand to every build worker.
+
+    images: static-relative path -> (width, height, content hash)
+    """
+
+    def __init__(self, images, widths=DEFAULT_WIDTHS, resize=Image is not None):
+        self.images = images
+        self.widths = tuple(sorted(widths))
+        self.resize = resize
+
+    def __eq__(self, other):
+        return isinstance(other, ImageCatalog) and (self.images, self.widths, self.resize) == (other.images, other.widths, other.resize)
+
+    def key(self, url):
+        """The static-relative path of the catalogued image url points at, or None"""
+        key = image_key(url)
+        return key if key in self.images else None
+
+    def variant_widths(self, key):
+        if not self.resize:
+            return []
+        width = self.images[key][0]
+        return [variant_width for variant_width in self.widths if variant_width < width]
+
+    def attributes(self, url):
+        """width, height and, when there are smaller variants, srcset and sizes for an <img> of url"""
+        key = self.key(url)
+        if key is None:
+            return {}
+        width, height, _ = self.images[key]
+        attributes = {"width": str(width), "height": str(height)}
+        variant_widths = self.variant_widths(key)
+        if variant_widths:
+            # Separated by "," alone, see rewrite_basepath
+            candidates = [f"/{variant_path(key, variant_width)} {variant_width}w" for variant_width in variant_widths]
+            candidates.append(f"/{key} {width}w")
+            attributes["srcset"] = ",".join(candidates)
+            attributes["sizes"] = f"(max-width: {width}px) 100vw, {width}px"
+        attributes["loading"] = "lazy"
+        return attributes
+
+    def attribute_hash(self, url):
+        """Hash of the attributes rendered for an <img> of url"""
+        return hash_text(json.dumps(self.attributes(url), sort_keys=True))
+
+    def attribute_hashes(self):
+        """static-relative path -> hash of the attributes rendered for it, to tell which images' pages are stale"""
+        return {key: self.attribute_hash("/" + key) for key in self.images}
+
+    def outputs(self, key, dest_dir):
+        return [os.path.join(dest_dir, variant_path(key, width)) for width in self.variant_widths(key)]
+
+    def variant_outputs(self, dest_dir):
+        """Every variant a build could put in dest_dir, kept when static files are synced"""
+        return [output for key in sorted(self.images) for output in self.outputs(key, dest_dir)]
+
+
+def _encode(source, dest, width):
+    """Write source resized to width pixels wide to dest, in the same format"""
+    with Image.open(source) as image:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        options = {"optimize": True}
+        if image.format == "JPEG":
+            options["quality"] = 82
+            options["progressive"] = True
+        tmp_path = dest + ".tmp"
+        resized.save(tmp_path, format=image.format, **options)
+    os.replace(tmp_path, dest)
+    return dest
+
+
+class ImagePipeline:
+    """
+    Makes the resized variants of the images pages reference.
+
+    Variants are kept in cache_dir under their source's content hash, so an
+    image is only resized again when its bytes change, wherever it lives.
+    Sizes are remembered by path, size and mtime in cache_dir/index.json,
+    so unchanged images aren't even read to build the catalog.
+    """
+
+    def __init__(self, static_dir, dest_dir, cache_dir, widths=DEFAULT_WIDTHS):
+        self.static_dir = static_dir
+        self.dest_dir = dest_dir
+        self.cache_dir = cache_dir
+        self.widths = widths
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.catalog = None
+        # What index_path holds, once a scan read or wrote it
+        self.index = None
+
+    def _load_index(self):
+        if self.index is not None:
+            return self.index
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def scan(self):
+        """Find every image under static_dir, returns the ImageCatalog of them"""
+        index = self._load_index()
+        images = {}
+        entries = {}
+        for root, _, filenames in os.walk(self.static_dir):
+            for filename in filenames:
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                key = os.path.relpath(path, self.static_dir).replace(os.sep, "/")
+                stat = os.stat(path)
+                entry = index.get(key)
+                if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                    size = image_size(path)
+                    if size is None:
+                        continue
+                    entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": hash_file(path), "dimensions": list(size)}
+                entries[key] = entry
+                images[key] = (*entry["dimensions"], entry["hash"])
+
+        if entries != index:
+            write_file(self.index_path, json.dumps(entries, indent=1, sort_keys=True))
+        self.index = entries
+        self.catalog = ImageCatalog(images, self.widths)
+        return self.catalog
+
+    def _cached(self, key, width):
+        _, extension = os.path.splitext(key)
+        return os.path.join(self.cache_dir, f"{self.catalog.images[key][2]}-{width}w{extension.lower()}")
+
+    def build(self, referenced, jobs=DEFAULT_JOBS, changed=None, dest_dir=None):
+        """
+        Put the variants of the referenced images, static-relative paths, in
+        dest_dir and remove those of images no page references any more.
+        Resizing runs on a process pool. Every output written or removed is
+        added to changed. Returns the images no page references, sorted.
+
+        dest_dir defaults to the pipeline's, another one gets the same
+        variants from the cache without resizing anything again.
+        """
+        if changed is None:
+            changed = []
+        if dest_dir is None:
+            dest_dir = self.dest_dir
+        wanted = [key for key in sorted(self.catalog.images) if key in referenced]
+        unreferenced = [key for key in sorted(self.catalog.images) if key not in referenced]
+
+        encodes = []
+        for key in wanted:
+            for width in self.catalog.variant_widths(key):
+                cached = self._cached(key, width)
+                if not os.path.exists(cached):
+                    encodes.append((os.path.join(self.static_dir, key), cached, width))
+        if encodes:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(encodes)))) as pool:
+                list(pool.map(_encode, *zip(*encodes)))
+
+        for key in wanted:
+            for width, output in zip(self.catalog.variant_widths(key), self.catalog.outputs(key, dest_dir)):
+                with open(self._cached(key, width), "rb") as f:
+                    if write_file(output, f.read()):
+                        changed.append(output)
+        for key in unreferenced:
+            for output in self.catalog.outputs(key, dest_dir):
+                if os.path.exists(output):
+                    os.remove(output)
+                    changed.append(output)
+        return unreferenced
+
+
+def format_unreferenced_images(unreferenced):
+    return "\n".join(f"Unreferenced image: {key}" for key in unreferenced)
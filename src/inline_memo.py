@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+# Longer text is rarely repeated, it would only push the short fragments that are out
+MAX_TEXT_LENGTH = 256
+
+
+class InlineMemo:
+    """
+    Inline markdown already converted, by its raw text.
+
+    entries: text -> (HTML fragment, the text's words, its (kind, url) references)
+
+    Holds up to max_bytes of text and HTML, evicting the least recently
+    used fragments first. hits, misses and evictions count lookups over
+    the memo's life, for sizing it. A memo can be kept across builds,
+    catalog is the ImageCatalog its fragments' images were sized with and
+    main clears the memo when another is set.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.catalog = None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text):
+        """The entry for text, None when it has to be converted, long text always is"""
+        if len(text) > MAX_TEXT_LENGTH:
+            return None
+        entry = self.entries.get(text)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(text)
+        self.hits += 1
+        return entry
+
+    def put(self, text, html, words, references=()):
+        if len(text) > MAX_TEXT_LENGTH or text in self.entries:
+            return
+        self.entries[text] = (html, words, tuple(references))
+        self.size += len(text) + len(html) + len(words)
+        while self.size > self.max_bytes and self.entries:
+            evicted, (evicted_html, evicted_words, _) = self.entries.popitem(last=False)
+            self.size -= len(evicted) + len(evicted_html) + len(evicted_words)
+            self.evictions += 1
+
+    def counts(self):
+        return {"inline_hits": self.hits, "inline_misses": self.misses, "inline_evictions": self.evictions}
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+def format_memo_stats(stats):
+    lookups = stats["inline_hits"] + stats["inline_misses"]
+    rate = stats["inline_hits"] / lookups if lookups else 0
+    return (
+        f"Inline memo: {stats['inline_hits']} hits, {stats['inline_misses']} misses ({rate:.0%} hit rate), "
+        f"{stats['inline_evictions']} evictions"
+    )
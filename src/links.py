@@ -0,0 +1,136 @@
+import os
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+
+class LinkIndex:
+    """
+    Link and image references collected while pages are generated.
+
+    pages: markdown source path -> (output path, [(kind, url), ...])
+
+    Once the build is done, check looks every internal reference up in the
+    set of generated pages and static files. Line numbers are only worked
+    out for the references that turn out to be broken.
+    """
+
+    def __init__(self):
+        self.pages = {}
+
+    def add(self, source, output, links):
+        self.pages[source] = (output, [tuple(link) for link in links])
+
+    def links(self, source):
+        return self.pages[source][1] if source in self.pages else []
+
+    def __len__(self):
+        return sum(len(links) for _, links in self.pages.values())
+
+    def targets(self, dest_dir, kind):
+        """Site paths of every internal reference of kind, "link" or "image", on any page"""
+        targets = set()
+        for output, links in self.pages.values():
+            page_dir = posixpath.dirname(_site_path(output, dest_dir))
+            for link_kind, url in links:
+                if link_kind == kind:
+                    target = resolve(url, page_dir)
+                    if target is not None:
+                        targets.add(target)
+        return targets
+
+    def check(self, dest_dir, static_dir, generated=()):
+        """
+        Return (source, line, kind, url) for every reference to a file the
+        site doesn't have. generated lists outputs besides the pages', like
+        listing pages, that references may point at.
+        """
+        targets = site_files(dest_dir, static_dir, [output for output, _ in self.pages.values()] + list(generated))
+
+        # Root-relative URLs resolve the same from every page, so each is looked up once
+        exists = {}
+        broken = []
+        for source, (output, links) in sorted(self.pages.items()):
+            page_dir = posixpath.dirname(_site_path(output, dest_dir))
+            dangling = []
+            for kind, url in dict.fromkeys(links):
+                key = url if url.startswith("/") else (url, page_dir)
+                if key not in exists:
+                    target = resolve(url, page_dir)
+                    exists[key] = target is None or any(candidate in targets for candidate in _candidates(target))
+                if not exists[key]:
+                    dangling.append((kind, url))
+            if not dangling:
+                continue
+
+            lines = find_lines(source, {url for _, url in dangling})
+            for kind, url in dangling:
+                for line in lines[url]:
+                    broken.append((source, line, kind, url))
+        return broken
+
+
+def _site_path(path, root):
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def site_files(dest_dir, static_dir, outputs):
+    """Paths relative to the site root of every generated page and static file"""
+    files = {_site_path(output, dest_dir) for output in outputs}
+    for root, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            files.add(_site_path(os.path.join(root, filename), static_dir))
+    return files
+
+
+def resolve(url, page_dir):
+    """
+    The site path url points at from a page in page_dir, or None for
+    external URLs and links within the page
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+
+    path = unquote(parts.path)
+    if not path.startswith("/"):
+        path = posixpath.join(page_dir, path)
+    trailing_slash = path.endswith("/")
+    path = posixpath.normpath(path.lstrip("/"))
+    if path == ".":
+        return ""
+    return path + "/" if trailing_slash else path
+
+
+def _candidates(target):
+    """A link to a directory is served by its index.html"""
+    if target == "" or target.endswith("/"):
+        return (target + "index.html",)
+    return (target, target + "/index.html")
+
+
+def find_lines(source, urls):
+    """
+    Map each url to the line numbers in source that reference it, or to
+    [None] if it can't be found. The file is read once for all of them.
+    """
+    needles = {f"]({url})": url for url in urls}
+    found = {url: [] for url in urls}
+    try:
+        with open(source, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if "](" not in line:
+                    continue
+                for needle, url in needles.items():
+                    if needle in line:
+                        found[url].append(number)
+    except OSError:
+        pass
+    return {url: lines or [None] for url, lines in found.items()}
+
+
+def format_broken_links(broken):
+    lines = []
+    for source, line, kind, url in broken:
+        location = f"{source}:{line}" if line is not None else source
+        lines.append(f"{location}: broken {kind} {url}")
+    return "\n".join(lines)
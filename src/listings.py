@@ -0,0 +1,107 @@
+import os
+import re
+
+from htmlnode import LeafNode, ParentNode
+from search import page_url
+
+DEFAULT_SECTION = "blog"
+DEFAULT_PER_PAGE = 10
+
+_SLUG_RE = re.compile(r"[^\w]+")
+
+
+def tag_slug(tag):
+    """The URL segment of a tag's pages, "Middle Earth" -> "middle-earth" """
+    return _SLUG_RE.sub("-", tag.casefold()).strip("-") or "tag"
+
+
+def _listing_path(base, number):
+    """Site path of page number of the listing at base, the first page is base itself"""
+    return base if number == 1 else f"{base}page/{number}/"
+
+
+class Listings:
+    """
+    The index of the posts under content_dir/section, a page for each of
+    their tags, and further pages of either once they list more than
+    per_page posts.
+
+    Everything comes from a MetadataIndex, so no post is parsed to list it.
+    Bodies are rendered with the HTML nodes the rest of the site uses,
+    write_listings in main puts them in the section's layout.
+    """
+
+    def __init__(self, metadata, section=DEFAULT_SECTION, per_page=DEFAULT_PER_PAGE):
+        self.metadata = metadata
+        self.section = section
+        self.per_page = per_page
+
+    def _post_url(self, source):
+        relative_path = os.path.relpath(source, self.metadata.content_dir)
+        return "/" + page_url(os.path.splitext(relative_path)[0] + ".html", os.curdir)
+
+    def pages(self):
+        """
+        (site path, title, heading, posts, previous page path, next page path)
+        of every listing page, posts being (url, metadata) pairs
+        """
+        posts = [(self._post_url(source), metadata) for source, metadata in self.metadata.posts(self.section)]
+        listings = [(f"/{self.section}/", self.section.capitalize(), self.section.capitalize(), posts)]
+
+        tags = {}
+        for post in posts:
+            for tag in post[1]["tags"]:
+                tags.setdefault(tag_slug(tag), (tag, []))[1].append(post)
+        for slug, (tag, tagged) in sorted(tags.items()):
+            listings.append((f"/{self.section}/tags/{slug}/", f"Tagged {tag}", f"Posts tagged “{tag}”", tagged))
+
+        pages = []
+        for base, title, heading, listed in listings:
+            count = max(1, -(-len(listed) // self.per_page))
+            for number in range(1, count + 1):
+                pages.append((
+                    _listing_path(base, number),
+                    title if number == 1 else f"{title}, page {number}",
+                    heading,
+                    listed[(number - 1) * self.per_page:number * self.per_page],
+                    _listing_path(base, number - 1) if number > 1 else None,
+                    _listing_path(base, number + 1) if number < count else None,
+                ))
+        return pages
+
+    def output(self, path, dest_dir):
+        return os.path.join(dest_dir, *path.strip("/").split("/"), "index.html")
+
+    def outputs(self, dest_dir, skip=()):
+        """Every listing page's output in dest_dir, leaving out those in skip"""
+        outputs = [self.output(path, dest_dir) for path, *_ in self.pages()]
+        return [output for output in outputs if output not in skip]
+
+    def _post_node(self, url, metadata):
+        children = [ParentNode("h2", [LeafNode("a", metadata["title"] or url, {"href": url})])]
+        if metadata["date"]:
+            children.append(LeafNode("time", metadata["date"], {"datetime": metadata["date"]}))
+        if metadata["description"]:
+            children.append(LeafNode("p", metadata["description"]))
+        if metadata["tags"]:
+            children.append(ParentNode("ul", [
+                ParentNode("li", [LeafNode("a", tag, {"href": f"/{self.section}/tags/{tag_slug(tag)}/"})])
+                for tag in metadata["tags"]
+            ], {"class": "tags"}))
+        return ParentNode("li", children)
+
+    def render_content(self, heading, posts, previous, following):
+        """The body of one listing page"""
+        children = [LeafNode("h1", heading)]
+        if posts:
+            children.append(ParentNode("ul", [self._post_node(url, metadata) for url, metadata in posts], {"class": "posts"}))
+        else:
+            children.append(LeafNode("p", "Nothing here yet."))
+        links = []
+        if previous:
+            links.append(LeafNode("a", "Newer posts", {"href": previous, "rel": "prev"}))
+        if following:
+            links.append(LeafNode("a", "Older posts", {"href": following, "rel": "next"}))
+        if links:
+            children.append(ParentNode("nav", links))
+        return ParentNode("div", children).to_html()
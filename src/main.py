@@ -1,13 +1,171 @@
 import re
 import os
-import shutil
 import logging
 import sys
+import argparse
+import io
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from textnode import TextNode, TextType
-from htmlnode import LeafNode, ParentNode, HTMLNode
+from htmlnode import LeafNode, ParentNode, HTMLNode, VOID_ELEMENTS
+from manifest import BuildManifest, hash_file, hash_text
+from template import Layouts, load_template
+from render_cache import open_render_cache, DEFAULT_MAX_BYTES
+from profiler import BuildProfiler
+from sync import sync_directory, format_sync_stats
+from links import LinkIndex
+from search import SearchIndex, TermCounter, search_outputs
+from highlight import HIGHLIGHT_CSS_NAME, highlight
+from highlight import CACHE_VERSION as HIGHLIGHT_CACHE_VERSION, DEFAULT_MAX_BYTES as HIGHLIGHT_CACHE_MAX_BYTES
+from images import image_key
+from output import OutputWriter, stream_file, write_file
+from compress import minify_html
+from frontmatter import page_metadata, read_front_matter, split_front_matter
+from inline_memo import DEFAULT_MAX_BYTES as INLINE_MEMO_MAX_BYTES, InlineMemo
+from listings import DEFAULT_PER_PAGE as LISTING_PER_PAGE, DEFAULT_SECTION as LISTING_SECTION
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = ".ssg-cache"
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+RENDER_CACHE_PATH = os.path.join(CACHE_DIR, "render.sqlite")
+PROFILE_PATH = os.path.join(CACHE_DIR, "profile.json")
+CHANGED_LIST_PATH = os.path.join(CACHE_DIR, "changed.txt")
+HIGHLIGHT_CACHE_PATH = os.path.join(CACHE_DIR, "highlight.sqlite")
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+PRECOMPRESS_INDEX_PATH = os.path.join(CACHE_DIR, "precompress.json")
+METADATA_INDEX_PATH = os.path.join(CACHE_DIR, "metadata.json")
+# Per-section layouts live here, next to the default template
+LAYOUTS_DIR = "layouts"
+
+# Bump whenever markdown_to_html_node's output changes, so cached pages are re-rendered
+CONVERTER_VERSION = 3
+
+# Pages at least this many bytes are converted a block at a time instead of read whole
+STREAM_THRESHOLD = 8 << 20
+
+class RenderOptions:
+    """
+    How every page of a build is rendered.
+
+    layouts picks each page's layout instead of the template path.
+    cache_path holds the render cache, highlight_cache_path the highlight
+    cache. image_catalog sizes the images pages show, minify minifies their
+    HTML and inline_memo_bytes sizes the InlineMemo inline markdown goes
+    through, 0 for none.
+    """
+
+    def __init__(self, layouts=None, cache_path=None, cache_max_bytes=DEFAULT_MAX_BYTES, highlight_cache_path=None,
+                 image_catalog=None, minify=False, inline_memo_bytes=0):
+        self.layouts = layouts
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.highlight_cache_path = highlight_cache_path
+        self.image_catalog = image_catalog
+        self.minify = minify
+        self.inline_memo_bytes = inline_memo_bytes
+
+    def replace(self, **changes):
+        """A copy with changes, given as to __init__"""
+        return RenderOptions(**dict(vars(self), **changes))
+
+class BuildContext:
+    """
+    The state of one build, passed down to every page it renders instead of
+    kept in globals, so builds in the same process share nothing.
+
+    Pages are rendered with options. What the build collects goes into
+    stats, link_index, search_index, changed and profiler, which times
+    every stage. inline_memo and pool, the worker processes, can be kept
+    across builds. The rest is set for each page: output_writer writes it,
+    highlight_cache memoizes its highlighted code, links and terms collect
+    its references and words, and page_log its messages, which are logged
+    right away without one. Any of them can be None.
+    """
+
+    def __init__(self, options=None, profiler=None, stats=None, link_index=None, search_index=None, changed=None,
+                 inline_memo=None, pool=None, output_writer=None, highlight_cache=None, links=None, terms=None,
+                 page_log=None):
+        self.options = options or RenderOptions()
+        self.profiler = profiler
+        self.stats = stats
+        self.link_index = link_index
+        self.search_index = search_index
+        self.changed = changed
+        self.inline_memo = inline_memo
+        self.pool = pool
+        self.output_writer = output_writer
+        self.highlight_cache = highlight_cache
+        self.links = links
+        self.terms = terms
+        self.page_log = page_log
+
+        # Memoized fragments hold the image attributes of the catalog they were converted with,
+        # a memo kept across builds stays warm as long as the images are the same
+        if inline_memo is not None and inline_memo.catalog != self.options.image_catalog:
+            inline_memo.clear()
+            inline_memo.catalog = self.options.image_catalog
+
+    def replace(self, **changes):
+        """A copy with changes, given as to __init__"""
+        return BuildContext(**dict(vars(self), **changes))
+
+    def log(self, message):
+        if self.page_log is None:
+            logger.info(message)
+        else:
+            self.page_log.write(message + "\n")
+
+    def timed(self, stage, func, *args, **kwargs):
+        """Call func, charging its time to stage when there's a profiler"""
+        if self.profiler is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profiler.add(stage, time.perf_counter() - started)
+
+# Pages converted outside of a build, with no caches, collectors or profiler
+_NO_BUILD = BuildContext()
+
+# (build id, BuildContext) of the build a pool worker last rendered a page of, only set in
+# worker processes, see generate_pages
+_worker_build = None
+
+def _worker_context(build_id, image_catalog, minify, inline_memo_bytes):
+    global _worker_build
+    if _worker_build is None or _worker_build[0] != build_id:
+        # Every worker memoizes what it converts itself, nothing is shared between processes.
+        # A worker kept for several builds keeps its memo, unless its size changes
+        memo = _worker_build[1].inline_memo if _worker_build else None
+        if not inline_memo_bytes:
+            memo = None
+        elif memo is None or memo.max_bytes != inline_memo_bytes:
+            memo = InlineMemo(inline_memo_bytes)
+        options = RenderOptions(image_catalog=image_catalog, minify=minify, inline_memo_bytes=inline_memo_bytes)
+        _worker_build = (build_id, BuildContext(options, inline_memo=memo))
+    return _worker_build[1]
+
+_REFERENCE_KINDS = {TextType.LINK: "link", TextType.IMAGES: "image"}
+
+def _write_output(build, path, text):
+    if build.options.minify:
+        text = minify_html(text)
+    if build.output_writer is None:
+        write_file(path, text)
+    else:
+        build.output_writer.write(path, text)
 
-def text_node_to_html_node(text_node):
+def _stream_output(build, path, write, wait=False):
+    if build.output_writer is None:
+        stream_file(path, write)
+    else:
+        build.output_writer.stream(path, write, wait)
+
+def text_node_to_html_node(text_node, image_catalog=None):
     match (text_node.text_type):
         case (TextType.NORMAL_TEXT):
             value = text_node.text
@@ -28,7 +186,10 @@ def text_node_to_html_node(text_node):
         case (TextType.IMAGES):
             alt = text_node.text
             src = text_node.url
-            return LeafNode("img", "", {"src": f"{src}", "alt": f"{alt}"})
+            props = {"src": f"{src}", "alt": f"{alt}"}
+            if image_catalog is not None:
+                props.update(image_catalog.attributes(src))
+            return LeafNode("img", "", props)
         case _:
             raise Exception("not a valid text type")
 
@@ -107,19 +268,82 @@ def split_nodes_link(old_nodes):
 
     return new_nodes    
 
+_IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_LINK_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
 def extract_markdown_images(text):
-    return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    return _IMAGE_RE.findall(text)
 
 def extract_markdown_links(text):
-    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    return _LINK_RE.findall(text)
+
+# Inline scanner
+_INLINE_DELIMITER_RE = re.compile(r"\*\*|_|`")
+_IMAGE_OR_LINK_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)|(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+# (current mode, delimiter) -> mode after the delimiter. Pairs that are missing
+# are delimiters of lower precedence, which are plain text inside that span.
+_INLINE_TRANSITIONS = {}
+for _mode in TextType.NORMAL_TEXT, TextType.BOLD_TEXT, TextType.ITALIC_TEXT, TextType.CODE_TEXT:
+    _INLINE_TRANSITIONS[(_mode, "**")] = TextType.NORMAL_TEXT if _mode is TextType.BOLD_TEXT else TextType.BOLD_TEXT
+    if _mode is not TextType.BOLD_TEXT:
+        _INLINE_TRANSITIONS[(_mode, "_")] = TextType.NORMAL_TEXT if _mode is TextType.ITALIC_TEXT else TextType.ITALIC_TEXT
+    if _mode in (TextType.NORMAL_TEXT, TextType.CODE_TEXT):
+        _INLINE_TRANSITIONS[(_mode, "`")] = TextType.NORMAL_TEXT if _mode is TextType.CODE_TEXT else TextType.CODE_TEXT
+
+def _append_normal_text(nodes, text):
+    """Append the normal text, image and link nodes of a plain text span"""
+    if "[" not in text:
+        nodes.append(TextNode(text, TextType.NORMAL_TEXT))
+        return
+
+    position = 0
+    for match in _IMAGE_OR_LINK_RE.finditer(text):
+        if match.start() > position:
+            nodes.append(TextNode(text[position:match.start()], TextType.NORMAL_TEXT))
+        if match.group(2) is not None:
+            nodes.append(TextNode(match.group(1), TextType.IMAGES, match.group(2)))
+        else:
+            nodes.append(TextNode(match.group(3), TextType.LINK, match.group(4)))
+        position = match.end()
+    if position < len(text):
+        nodes.append(TextNode(text[position:], TextType.NORMAL_TEXT))
 
 def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.NORMAL_TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD_TEXT)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC_TEXT)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE_TEXT)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    """
+    Tokenize inline markdown in one scan, producing the same TextNodes as
+    chaining split_nodes_delimiter for "**", "_" and "`" and then
+    split_nodes_image and split_nodes_link.
+
+    Those passes give "**" precedence over "_", and "_" over "`": a bold
+    delimiter closes any open italic or code span and an italic delimiter
+    closes any open code span. Images and links are only found in normal text.
+    """
+    nodes = []
+    normal = TextType.NORMAL_TEXT
+    transitions = _INLINE_TRANSITIONS
+    mode = normal
+    start = 0
+
+    for match in _INLINE_DELIMITER_RE.finditer(text):
+        next_mode = transitions.get((mode, match.group()))
+        if next_mode is None:
+            continue
+
+        # The span before a delimiter is kept even when empty, except normal text
+        end = match.start()
+        if mode is not normal:
+            nodes.append(TextNode(text[start:end], mode))
+        elif end > start:
+            _append_normal_text(nodes, text[start:end])
+
+        mode = next_mode
+        start = match.end()
+
+    if mode is not normal:
+        nodes.append(TextNode(text[start:], mode))
+    elif start < len(text):
+        _append_normal_text(nodes, text[start:])
     return nodes
 
 def markdown_to_blocks(markdown): 
@@ -128,6 +352,21 @@ def markdown_to_blocks(markdown):
     cleaned_lines = [line.replace("\n    ", "\n") for line in stripped_lines]
     return cleaned_lines
 
+def iter_markdown_blocks(lines):
+    """
+    Yield the same blocks as markdown_to_blocks from an iterable of lines,
+    such as an open file, holding only one block in memory at a time
+    """
+    block = []
+    for line in lines:
+        # A blank line right after a newline is the "\n\n" markdown_to_blocks splits on
+        if line == "\n" and block and block[-1].endswith("\n"):
+            yield "".join(block)[:-1].strip("\n    ").replace("\n    ", "\n")
+            block = []
+        else:
+            block.append(line)
+    yield "".join(block).strip("\n    ").replace("\n    ", "\n")
+
 # Block Types
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
@@ -137,21 +376,75 @@ class BlockType(Enum):
     UNORDERED_LIST = "unordered_list"
     ORDERED_LIST = "ordered_list"
 
+_HEADING_RE = re.compile(r"^(#{1,6}) ")
+_ORDERED_ITEM_RE = re.compile(r"^(\d+)\. ")
+_ORDERED_MARKER_RE = re.compile(r"^\d+\.\s*")
+
 def block_to_block_type(markdown):
-    lines = markdown.split("\n")
-    
-    if markdown.startswith("```") and markdown.endswith("```"):
-        return BlockType.CODE
-    elif re.match(r"^(#{1,6}) ", markdown):
-        return BlockType.HEADING
-    elif all(line.startswith(">") for line in lines):
-        return BlockType.QUOTE
-    elif all(line.startswith("- ") for line in lines):
-        return BlockType.UNORDERED_LIST
-    elif is_consecutive_ordered_list(lines):
-        return BlockType.ORDERED_LIST
-    else:
-        return BlockType.PARAGRAPH
+    return classify_block(markdown)[0]
+
+def classify_block(block):
+    """
+    Work out a block's type in one pass over its lines. Returns
+    (BlockType, parsed), where parsed is what the matching process_*
+    function would otherwise work out again: (level, text) for a heading,
+    the text of a quote, the item texts of a list, and None otherwise.
+    """
+    if block.startswith("```") and block.endswith("```"):
+        return BlockType.CODE, None
+
+    match = _HEADING_RE.match(block)
+    if match:
+        return BlockType.HEADING, _parse_heading(block, match)
+
+    # Each candidate becomes None as soon as a line rules it out
+    quote = []
+    unordered = []
+    ordered = []
+    expected_number = 1
+    for line in block.split("\n"):
+        if quote is not None:
+            if line.startswith(">"):
+                quote.append(line[1:].strip())
+            else:
+                quote = None
+
+        if unordered is not None:
+            if line.startswith("- "):
+                unordered.append(line[2:].strip())
+            else:
+                unordered = None
+
+        if ordered is not None:
+            stripped = line.strip()
+            if stripped:
+                match = _ORDERED_ITEM_RE.match(stripped)
+                if match and int(match.group(1)) == expected_number:
+                    expected_number += 1
+                    # An indented item keeps its number, as process_ordered_list always has
+                    ordered.append(stripped if line[0].isspace() else stripped[match.end():].strip())
+                else:
+                    ordered = None
+
+        if quote is None and unordered is None and ordered is None:
+            return BlockType.PARAGRAPH, None
+
+    if quote is not None:
+        return BlockType.QUOTE, "\n".join(quote)
+    if unordered is not None:
+        return BlockType.UNORDERED_LIST, unordered
+    if ordered:
+        return BlockType.ORDERED_LIST, ordered
+    return BlockType.PARAGRAPH, None
+
+def _parse_heading(block, match):
+    """(level, text) of a heading block, text is None unless it's a single line"""
+    text = block[match.end():]
+    if text.endswith("\n"):
+        text = text[:-1]
+    if not text or "\n" in text:
+        text = None
+    return len(match.group(1)), text
 
 def is_consecutive_ordered_list(lines):
     lines = [line.strip() for line in lines if line.strip()]
@@ -160,7 +453,7 @@ def is_consecutive_ordered_list(lines):
     
     expected_number = 1
     for line in lines:
-        match = re.match(r"^(\d+)\. ", line)
+        match = _ORDERED_ITEM_RE.match(line)
         if not match:
             return False
         number = int(match.group(1))
@@ -169,84 +462,138 @@ def is_consecutive_ordered_list(lines):
         expected_number += 1
     return True
 
-def text_to_children(text):
+def text_to_children(text, build=None):
     """Convert a string of text to a list of HTMLNodes by parsing markdown"""
+    build = build or _NO_BUILD
+    if build.inline_memo is None:
+        return build.timed("inline", _text_to_children, text, build)
+    return build.timed("inline", _memoized_text_to_children, text, build)
+
+def _memoized_text_to_children(text, build):
+    """
+    text_to_children through the inline memo. Text seen before comes back as
+    one leaf of its rendered HTML, with its words and references collected
+    again for this page.
+    """
+    entry = build.inline_memo.get(text)
+    if entry is not None:
+        html, words, references = entry
+        _collect_inline(build, words, references)
+        return [LeafNode(None, html)] if html else []
+
+    html_nodes, words, references = _convert_inline(text, build)
+    _collect_inline(build, words, references)
+    try:
+        html = "".join(html_node.to_html() for html_node in html_nodes)
+    except ValueError:
+        # Left for write_content to report, with the rest of the page
+        return html_nodes
+    build.inline_memo.put(text, html, words, references)
+    return [LeafNode(None, html)] if html else []
+
+def _text_to_children(text, build):
+    html_nodes, words, references = _convert_inline(text, build)
+    _collect_inline(build, words, references)
+    return html_nodes
+
+def _collect_inline(build, words, references):
+    if build.terms is not None:
+        build.terms.append(words)
+    if build.links is not None:
+        build.links.extend(references)
+
+def _convert_inline(text, build):
+    """(HTML nodes, words, (kind, url) references) of inline markdown"""
     text_nodes = text_to_textnodes(text)
+    words = " ".join([text_node.text for text_node in text_nodes])
+    references = []
     html_nodes = []
     for text_node in text_nodes:
-        html_node = text_node_to_html_node(text_node)
+        if text_node.text_type in _REFERENCE_KINDS:
+            references.append((_REFERENCE_KINDS[text_node.text_type], text_node.url))
+
+        html_node = text_node_to_html_node(text_node, build.options.image_catalog)
 
-        if isinstance(html_node, LeafNode) and not html_node.value:
-            print(f"Warning: Skipping leaf node with no value: {html_node}")
+        if isinstance(html_node, LeafNode) and not html_node.value and html_node.tag not in VOID_ELEMENTS:
+            build.log(f"Warning: Skipping leaf node with no value: {html_node}")
             continue
 
         html_nodes.append(html_node)
-    return html_nodes
+    return html_nodes, words, references
 
-def process_paragraph(block):
-    children = text_to_children(block)
+def process_paragraph(block, build=None):
+    children = text_to_children(block, build)
 
     if not children:
         children = [LeafNode(None, block)]
 
     return ParentNode("p", children)
 
-def process_heading(block):
-    match = re.match(r"^(#{1,6}) (.+)$", block)
+def process_heading(block, heading=None, build=None):
+    if heading is None:
+        match = _HEADING_RE.match(block)
+        if not match:
+            return ParentNode("h1", [LeafNode(None, block)])
+        heading = _parse_heading(block, match)
 
-    if not match:
+    level, text = heading
+    if text is None:
         return ParentNode("h1", [LeafNode(None, block)])
 
-    level = len(match.group(1))
-    text = match.group(2)
-    children = text_to_children(text)
+    children = text_to_children(text, build)
 
     if not children:
         children = [LeafNode(None, text)]
 
     return ParentNode(f"h{level}", children)
 
-def process_code(block):
+def process_code(block, build=None):
+    build = build or _NO_BUILD
     lines = block.split("\n")
+    language = None
     if len(lines) >= 2 and lines[0].startswith("```") and lines[-1].endswith("```"):
         content = "\n".join(lines[1:-1])
+        # The info string after the opening fence, e.g. ```python
+        info = lines[0][3:].split()
+        language = info[0].lower() if info else None
     else:
         content = block.strip("`").strip()
 
     if not content:
         content = " "
 
-    code_node = LeafNode("code", content)
+    props = {"class": f"highlight language-{language}"} if language else None
+    code_node = LeafNode("code", build.timed("highlight", highlight, content, language, build.highlight_cache), props)
 
     return ParentNode("pre", [code_node])
 
-def process_quote(block):
+def process_quote(block, clean_text=None, build=None):
     """Convert a quote block to an HTMLNode."""
-    # Remove the > marker from each line
-    lines = block.split("\n")
-    clean_lines = [line[1:].strip() if line.startswith('>') else line.strip() for line in lines]
-    clean_text = "\n".join(clean_lines)
+    if clean_text is None:
+        # Remove the > marker from each line
+        lines = block.split("\n")
+        clean_lines = [line[1:].strip() if line.startswith('>') else line.strip() for line in lines]
+        clean_text = "\n".join(clean_lines)
     
-    children = text_to_children(clean_text)
+    children = text_to_children(clean_text, build)
     # Make sure we have at least one child
     if not children:
         children = [LeafNode(None, clean_text)]
     return ParentNode("blockquote", children)
 
-def process_unordered_list(block):
+def process_unordered_list(block, items=None, build=None):
     """Convert an unordered list block to an HTMLNode."""
-    lines = block.split("\n")
+    if items is None:
+        # Remove the "- " marker
+        items = [line[2:].strip() if line.startswith("- ") else line.strip() for line in block.split("\n") if line.strip()]
     list_items = []
     
-    for line in lines:
-        if line.strip():
-            # Remove the "- " marker
-            text = line[2:].strip() if line.startswith("- ") else line.strip()
-            children = text_to_children(text)
-            # Make sure we have at least one child
-            if not children:
-                children = [LeafNode(None, text)]
-            list_items.append(ParentNode("li", children))
+    for text in items:
+        children = text_to_children(text, build)
+        # Make sure we have at least one child
+        if not children:
+            children = [LeafNode(None, text)]
+        list_items.append(ParentNode("li", children))
     
     # Make sure we have at least one item
     if not list_items:
@@ -254,19 +601,18 @@ def process_unordered_list(block):
     
     return ParentNode("ul", list_items)
 
-def process_ordered_list(block):
-    lines = block.split("\n")
+def process_ordered_list(block, items=None, build=None):
+    if items is None:
+        # Remove the "number. " marker
+        items = [_ORDERED_MARKER_RE.sub("", line).strip() for line in block.split("\n") if line.strip()]
     list_items = []
     
-    for line in lines:
-        if line.strip():
-            # Remove the "number. " marker
-            text = re.sub(r"^\d+\.\s*", "", line).strip()
-            children = text_to_children(text)
-            # Make sure we have at least one child
-            if not children:
-                children = [LeafNode(None, text)]
-            list_items.append(ParentNode("li", children))
+    for text in items:
+        children = text_to_children(text, build)
+        # Make sure we have at least one child
+        if not children:
+            children = [LeafNode(None, text)]
+        list_items.append(ParentNode("li", children))
     
     # Make sure we have at least one item
     if not list_items:
@@ -275,167 +621,295 @@ def process_ordered_list(block):
     return ParentNode("ol", list_items)
 
 
-def markdown_to_html_node(markdown):
-    """Convert a markdown string to a single HTMLNode object"""
-    blocks = markdown_to_blocks(markdown)
-    block_nodes = []
+def block_to_html_node(block, build=None):
+    """Convert one markdown block to an HTMLNode"""
+    build = build or _NO_BUILD
+    block_type, parsed = build.timed("classify", classify_block, block)
 
-    for block in blocks:
-        if not block.strip():
-            continue
+    try:
+        match block_type:
+            case BlockType.PARAGRAPH:
+                return process_paragraph(block, build)
+            case BlockType.HEADING:
+                return process_heading(block, parsed, build)
+            case BlockType.CODE:
+                return process_code(block, build)
+            case BlockType.QUOTE:
+                return process_quote(block, parsed, build)
+            case BlockType.UNORDERED_LIST:
+                return process_unordered_list(block, parsed, build)
+            case BlockType.ORDERED_LIST:
+                return process_ordered_list(block, parsed, build)
+    except Exception as e:
+        build.log(f"Error processing block of type {block_type}: {e}")
+        build.log(f"Block content: {block}")
 
-        block_type = block_to_block_type(block)
+        return ParentNode("p", [LeafNode(None, block)])
 
-        try:
-            match block_type:
-                case BlockType.PARAGRAPH:
-                    block_nodes.append(process_paragraph(block))
-                case BlockType.HEADING:
-                    block_nodes.append(process_heading(block))
-                case BlockType.CODE:
-                    block_nodes.append(process_code(block))
-                case BlockType.QUOTE:
-                    block_nodes.append(process_quote(block))
-                case BlockType.UNORDERED_LIST:
-                    block_nodes.append(process_unordered_list(block))
-                case BlockType.ORDERED_LIST:
-                    block_nodes.append(process_ordered_list(block))
-        except Exception as e:
-            print(f"Error processing block of type {block_type}: {e}")
-            print(f"Block content: {block}")
-
-            block_nodes.append(ParentNode("p", [LeafNode(None, block)]))
+def markdown_to_html_node(markdown, build=None):
+    """Convert a markdown string to a single HTMLNode object"""
+    build = build or _NO_BUILD
+    blocks = build.timed("blocks", markdown_to_blocks, markdown)
+    block_nodes = [block_to_html_node(block, build) for block in blocks if block.strip()]
 
     if not block_nodes:
         block_nodes = [ParentNode("p", [LeafNode(None, "Empty markdown document")])]
 
     return ParentNode("div", block_nodes)     
 
-def copy_directory(source_dir, dest_dir):
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
-
-    if not os.path.exists(source_dir):
-        logging.error(f"Source directory '{source_dir}' does not exist!")
-        return
-    
-    if os.path.exists(dest_dir):
-        logging.info(f"Deleting contents of '{dest_dir}'")
-        for item in os.listdir(dest_dir):
-            item_path = os.path.join(dest_dir, item)
-            if os.path.isfile(item_path):
-                os.remove(item_path)
-                logging.info(f"Deleted file: {item_path}")
-            elif os.path.isdir(item_path):
-                shutil.rmtree(item_path)
-                logging.info(f"Deleted directory: {item_path}")
-    
-    else:
-        os.makedirs(dest_dir)
-        logging.info(f"Created destination directory: {dest_dir}")
-
-    _copy_contents(source_dir, dest_dir)
-
-    logging.info(f"Copy finalized: '{source_dir}' -> '{dest_dir}'")
-
-def _copy_contents(src, dst):
-    for item in os.listdir(src):
-        src_path = os.path.join(src, item)
-        dst_path = os.path.join(dst, item)
+def iter_markdown_html(blocks, build=None):
+    """
+    Yield the HTML markdown_to_html_node would produce for these blocks,
+    converting and serializing one block at a time
+    """
+    yield "<div>"
+    empty = True
+    for block in blocks:
+        if not block.strip():
+            continue
+        empty = False
+        yield from block_to_html_node(block, build).iter_html()
+    if empty:
+        yield "<p>Empty markdown document</p>"
+    yield "</div>"
 
-        if os.path.isfile(src_path):
-            shutil.copy2(src_path, dst_path)
-            logging.info(f"Copied file: {src_path} to {dst_path}")
-        elif os.path.isdir(src_path):
-            if not os.path.exists(dst_path):
-                os.makedirs(dst_path)
-                logging.info(f"Created new directory: {dst_path}")
-            _copy_contents(src_path, dst_path)
+_TITLE_RE = re.compile(r"^#\s+(.+)$", re.MULTILINE)
 
 def extract_title(markdown):
-    match = re.search(r"^#\s+(.+)$", markdown, re.MULTILINE)
+    match = _TITLE_RE.search(markdown)
     if match:
         return match.group(1).strip()
     else:
         raise Exception("No h1 header found!")
     
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    
-    # Read the markdown file
-    with open(from_path, 'r', encoding='utf-8') as md_file:
-        markdown_content = md_file.read()
-    
-    # Read the template file
-    with open(template_path, 'r', encoding='utf-8') as template_file:
-        template_content = template_file.read()
-    
-    # Convert markdown to HTML
-    html_node = markdown_to_html_node(markdown_content)
-    
+def page_title(markdown, build=None):
     try:
-        html_content = html_node.to_html()
-    except ValueError as e:
-        print(f"Error generating HTML: {e}")
-        print("Falling back to simple HTML generation")
-        html_content = f"<div><p>Error converting markdown to HTML: {e}</p></div>"
-    
-    # Extract title
-    try:
-        title = extract_title(markdown_content)
+        return extract_title(markdown)
     except Exception as e:
-        print(f"Error extracting title: {e}")
-        title = "Untitled Page"
-    
-    # Replace placeholders in template
-    final_html = template_content.replace("{{ Title }}", title)
-    final_html = final_html.replace("{{ Content }}", html_content)
-    final_html = final_html.replace('href="/', 'href="{basepath}')
-    final_html = final_html.replace('src="/', 'src="{basepath}')
-    
-    # Create destination directory if it doesn't exist
-    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    
-    # Write the final HTML to the destination file
-    with open(dest_path, 'w', encoding='utf-8') as dest_file:
-        dest_file.write(final_html)
-    
-    print(f"Successfully generated {dest_path}")
+        (build or _NO_BUILD).log(f"Error extracting title: {e}")
+        return "Untitled Page"
 
-def copy_directory(source_dir, dest_dir):
+def stream_title(lines, build=None):
+    """page_title for an iterable of lines, stops reading at the title"""
+    pending = None
+    for line in lines:
+        if pending is not None:
+            # "#" and a run of blank lines, the title is the next non-blank line
+            pending += line
+            if line.strip():
+                return extract_title(pending)
+        elif line.startswith("#"):
+            if line[1:].isspace():
+                pending = line
+                continue
+            match = _TITLE_RE.match(line)
+            if match:
+                return match.group(1).strip()
+    return page_title(pending or "", build)
+
+# Candidates in the srcsets of generated pages are separated by a bare ","
+_SRCSET_RE = re.compile(r'srcset="([^"]*)"')
+
+def _rewrite_srcset(srcset, basepath):
+    candidates = [basepath + candidate[1:] if candidate.startswith("/") else candidate for candidate in srcset.split(",")]
+    return 'srcset="' + ",".join(candidates) + '"'
+
+def rewrite_basepath(html, basepath):
     """
-    Recursively copy all contents from source_dir to dest_dir.
-    First deletes all contents of dest_dir for a clean copy.
-    
-    Args:
-        source_dir (str): Path to source directory
-        dest_dir (str): Path to destination directory
+    Point root-relative href, src and srcset attributes at basepath. The template
+    is rewritten once when it's compiled, this is only needed for page content.
     """
-    # Ensure source directory exists
-    if not os.path.exists(source_dir):
-        print(f"Source directory '{source_dir}' does not exist!")
-        return
-    
-    # Delete destination directory contents if it exists
-    if os.path.exists(dest_dir):
-        print(f"Deleting contents of '{dest_dir}'")
-        for item in os.listdir(dest_dir):
-            item_path = os.path.join(dest_dir, item)
-            if os.path.isfile(item_path):
-                os.remove(item_path)
-                print(f"Deleted file: {item_path}")
-            elif os.path.isdir(item_path):
-                shutil.rmtree(item_path)
-                print(f"Deleted directory: {item_path}")
+    if basepath == "/":
+        return html
+    html = html.replace('href="/', f'href="{basepath}')
+    html = html.replace('src="/', f'src="{basepath}')
+    if 'srcset="' in html:
+        html = _SRCSET_RE.sub(lambda match: _rewrite_srcset(match.group(1), basepath), html)
+    return html
+
+def write_content(html_node, dest_file, basepath, build=None):
+    """
+    Stream html_node into dest_file chunk by chunk. If the tree can't be
+    serialized, whatever was written is discarded and an error message is
+    written in its place.
+    """
+    write_chunks(html_node.iter_html(), dest_file, basepath, build)
+
+def write_chunks(chunks, dest_file, basepath, build=None):
+    """write_content for an iterable of HTML chunks"""
+    start = dest_file.tell()
+    try:
+        for chunk in chunks:
+            dest_file.write(rewrite_basepath(chunk, basepath))
+    except ValueError as e:
+        build = build or _NO_BUILD
+        build.log(f"Error generating HTML: {e}")
+        build.log("Falling back to simple HTML generation")
+        dest_file.seek(start)
+        dest_file.truncate()
+        dest_file.write(f"<div><p>Error converting markdown to HTML: {e}</p></div>")
+
+def write_page(template, context, dest_path, build=None):
+    build = build or _NO_BUILD
+    # Written atomically, and not at all if the file already has this exact HTML
+    if build.options.minify:
+        # Minifying needs the whole document
+        _write_output(build, dest_path, template.render(context))
     else:
-        # Create destination directory if it doesn't exist
-        os.makedirs(dest_dir)
-        print(f"Created destination directory: {dest_dir}")
+        # Streamed into the file and a hasher, never held as a whole
+        _stream_output(build, dest_path, lambda out: template.write(out, context))
+
+def render_content(html_node, build=None):
+    """Serialize a page body to a string, with write_content's error fallback"""
+    buffer = io.StringIO()
+    write_content(html_node, buffer, "/", build)
+    return buffer.getvalue()
+
+def _read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def page_context(front_matter, find_title):
+    """
+    The template slots filled from a page's front matter, Title, Description
+    and Date. find_title() is only called when there is no title in it.
+    """
+    metadata = page_metadata(front_matter)
+    return {
+        "Title": metadata["title"] or find_title(),
+        "Description": metadata["description"],
+        "Date": metadata["date"],
+    }
+
+def render_page(markdown_content, template, basepath, build=None):
+    """The title and HTML generate_page writes for markdown_content, without a render cache"""
+    front_matter, markdown_content = split_front_matter(markdown_content)
+    html_node = markdown_to_html_node(markdown_content, build)
+    context = page_context(front_matter, lambda: page_title(markdown_content, build))
+    context["Content"] = lambda out: write_content(html_node, out, basepath, build)
+    return context["Title"], template.render(context)
+
+def generate_large_page(from_path, template, dest_path, basepath, build=None):
+    """
+    Convert from_path a block at a time, streaming the HTML into dest_path.
+    The title is found in a first pass over the file, so memory use doesn't
+    grow with the size of the page. Returns the title.
+    """
+    with open(from_path, 'r', encoding='utf-8') as f:
+        # Only read up to the first heading, when the front matter has no title
+        context = page_context(read_front_matter(f), lambda: stream_title(f, build))
+
+    with open(from_path, 'r', encoding='utf-8') as f:
+        read_front_matter(f)
+        blocks = iter_markdown_blocks(f)
+        context["Content"] = lambda out: write_chunks(iter_markdown_html(blocks, build), out, basepath, build)
+        # Converted as it's written, from the open file
+        _stream_output(build or _NO_BUILD, dest_path, lambda out: template.write(out, context), wait=True)
+    return context["Title"]
+
+def generate_page(from_path, template_path, dest_path, basepath, cache=None, build=None):
+    """
+    Generate one page, returns what the build indexes about it: a dict of
+    its (kind, url) link and image references, title and search terms
+    """
+    return generate_page_targets(from_path, template_path, [(dest_path, basepath)], cache, build)
+
+def generate_page_targets(from_path, template_path, outputs, cache=None, build=None):
+    """
+    generate_page for a page that goes to every (dest_path, basepath) in
+    outputs. The markdown is parsed once, only the template step and the
+    write happen per output.
+    """
+    page = {"links": [], "title": None, "terms": TermCounter()}
+    build = (build or _NO_BUILD).replace(links=page["links"], terms=page["terms"])
+    page["title"] = _generate_page(from_path, template_path, outputs, cache, build)
+    return page
+
+def _generate_large_page(from_path, template_path, outputs, build):
+    """Stream the page into every output, converting it again for each one"""
+    def write(dest_path, basepath, build):
+        title = generate_large_page(from_path, load_template(template_path, basepath), dest_path, basepath, build)
+        build.log(f"Successfully generated {dest_path}")
+        return title
+
+    title = write(*outputs[0], build)
+    # The page's links and terms were collected the first time through
+    for dest_path, basepath in outputs[1:]:
+        write(dest_path, basepath, build.replace(links=None, terms=None))
+    return title
+
+def _image_cache_context(markdown, image_catalog):
+    """
+    The attributes of the catalogued images markdown shows, which its
+    rendered body depends on besides its text. Only a page showing an
+    image that changed misses the render cache, not every page.
+    """
+    if image_catalog is None:
+        return ""
+    urls = sorted({url for _, url in extract_markdown_images(markdown) if image_catalog.key(url)})
+    return "\n".join(f"{url} {image_catalog.attribute_hash(url)}" for url in urls)
+
+def _generate_page(from_path, template_path, outputs, cache, build):
+    build.log(f"Generating page from {from_path} to {', '.join(dest_path for dest_path, _ in outputs)} using {template_path}")
+    profiler = build.profiler
+    if profiler is None and os.path.getsize(from_path) >= STREAM_THRESHOLD:
+        # Too big to hold in memory, and to be worth keeping in the render cache
+        return _generate_large_page(from_path, template_path, outputs, build)
+
+    if profiler is not None:
+        profiler.start_page(from_path)
+    
+    # Read the markdown file, the front matter only fills template slots
+    front_matter, markdown_content = split_front_matter(build.timed("read", _read_text, from_path))
     
-    # Recursively copy from source to destination
-    _copy_contents(source_dir, dest_dir)
+    # Convert markdown to HTML, unless the cache has this exact markdown already
+    content = None
+    if cache is not None:
+        cache_key = cache.key(markdown_content, _image_cache_context(markdown_content, build.options.image_catalog))
+        cached = cache.get_page(cache_key)
+        if cached is not None:
+            content, cached_links, cached_terms = cached
+            build.links.extend(cached_links)
+            build.terms.update(cached_terms)
+
+    if content is None:
+        html_node = markdown_to_html_node(markdown_content, build)
+        # When profiling, the body is serialized up front so it's timed apart from the write.
+        # It's also serialized once for every output, rather than again for each of them
+        if cache is not None or profiler is not None or len(outputs) > 1:
+            content = build.timed("to_html", render_content, html_node, build)
+        if cache is not None:
+            cache.put(cache_key, content, build.links, build.terms.counts())
     
-    print(f"Copy completed: '{source_dir}' → '{dest_dir}'")
+    # Extract title, description and date
+    page_slots = page_context(front_matter, lambda: page_title(markdown_content, build))
     
+    for dest_path, basepath in outputs:
+        # Compiled once per build and basepath, re-read only if the file changes
+        template = build.timed("template", load_template, template_path, basepath)
+
+        # Fill the template's slots, a freshly parsed body is serialized straight into the page
+        context = dict(page_slots)
+        if content is not None:
+            context["Content"] = rewrite_basepath(content, basepath)
+        else:
+            context["Content"] = lambda out: write_content(html_node, out, basepath, build)
+
+        if profiler is None:
+            write_page(template, context, dest_path, build)
+        else:
+            page_html = build.timed("template", template.render, context)
+            build.timed("write", _write_output, build, dest_path, page_html)
+            profiler.add_bytes(written=len(page_html.encode("utf-8")))
+    
+    if profiler is not None:
+        profiler.add_bytes(read=os.path.getsize(from_path))
+        profiler.end_page()
+
+    for dest_path, _ in outputs:
+        build.log(f"Successfully generated {dest_path}")
+    return page_slots["Title"]
+
 def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
     os.makedirs(dest_dir_path, exist_ok=True)
 
@@ -455,29 +929,367 @@ def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, bas
             generate_page(entry_path, template_path, output_path, basepath)
             print(f"Generated {output_path} from {entry_path}")
 
+def collect_pages(dir_path_content, dest_dir_path, skip=()):
+    """Return (markdown path, html path) pairs for every page under dir_path_content, but the sources in skip"""
+    pages = []
+    for entry in sorted(os.listdir(dir_path_content)):
+        entry_path = os.path.join(dir_path_content, entry)
 
+        if os.path.isdir(entry_path):
+            dest_subdir = os.path.join(dest_dir_path, entry)
+            pages.extend(collect_pages(entry_path, dest_subdir, skip))
 
-def main():
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
+        elif entry.endswith('.md') and entry_path not in skip:
+            output_filename = os.path.splitext(entry)[0] + '.html'
+            pages.append((entry_path, os.path.join(dest_dir_path, output_filename)))
+    return pages
+
+def _generate_page_job(job, build=None):
+    """
+    Run generate_page_targets for one page of generate_pages, in build or,
+    in a pool worker, the worker's context for the build the job is from
+    """
+    from_path, template_path, outputs, cache_config, highlight_config, profile, *worker_build = job
+    if build is None:
+        build = _worker_context(*worker_build[0])
+    cache = open_render_cache(*cache_config) if cache_config else None
+    hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+    memo_counts = build.inline_memo.counts() if build.inline_memo else None
+
+    # Each page gets its own profiler, whose record is merged by the parent
+    page_profiler = BuildProfiler() if profile else None
+    # Pool workers write as they go, so the result can say whether the file changed
+    page_writer = OutputWriter(jobs=0) if build.output_writer is None else None
+    # and capture their page's log, so pages don't interleave
+    log = io.StringIO() if page_writer is not None else None
+    page_build = build.replace(
+        profiler=page_profiler, output_writer=build.output_writer or page_writer, page_log=log,
+        highlight_cache=open_render_cache(*highlight_config) if highlight_config else None,
+    )
+
+    result = {"source": from_path, "output": outputs[0][0], "error": None, "profile": None, "links": [], "title": None, "terms": {}, "changed": []}
+    try:
+        page = generate_page_targets(from_path, template_path, outputs, cache, page_build)
+        result["links"] = page["links"]
+        result["title"] = page["title"]
+        result["terms"] = page["terms"].counts()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if page_writer is not None:
+            result["changed"] = page_writer.changed
+
+    result["log"] = log.getvalue() if log is not None else ""
+    if cache:
+        result["cache_hits"] = cache.hits - hits
+        result["cache_misses"] = cache.misses - misses
+    if memo_counts:
+        result["memo"] = {name: count - memo_counts[name] for name, count in build.inline_memo.counts().items()}
+    if page_profiler and page_profiler.pages:
+        result["profile"] = page_profiler.pages[0]
+    return result
+
+def generate_pages(pages, template_path, basepath, jobs=1, build=None, targets=None):
+    """
+    Generate every (markdown path, html path) pair in pages in build, on
+    jobs worker processes, into each (dest_dir, basepath) of targets.
+    Returns the sources that failed.
+    """
+    if build is None:
+        build = BuildContext()
+    options = build.options
+    stats = build.stats
+    # Code blocks in cached bodies are highlighted, so they're only reused with the same highlighter.
+    # The image attributes they hold are part of each page's key instead, see _image_cache_context
+    cache_version = f"{CONVERTER_VERSION}-{HIGHLIGHT_CACHE_VERSION}"
+    cache_config = (options.cache_path, cache_version, options.cache_max_bytes) if options.cache_path else None
+    highlight_config = (options.highlight_cache_path, HIGHLIGHT_CACHE_VERSION, HIGHLIGHT_CACHE_MAX_BYTES) if options.highlight_cache_path else None
+    profile = build.profiler is not None
+    if targets is None:
+        targets = [(None, basepath)]
+    root = targets[0][0]
+    outputs = {
+        dest_path: [
+            (os.path.join(dest_dir, os.path.relpath(dest_path, root)) if dest_dir != root else dest_path, target_basepath)
+            for dest_dir, target_basepath in targets
+        ]
+        for _, dest_path in pages
+    }
+    work = [
+        (from_path, options.layouts.for_page(from_path) if options.layouts else template_path, outputs[dest_path], cache_config, highlight_config, profile)
+        for from_path, dest_path in pages
+    ]
+
+    writer = None
+    if jobs > 1 and len(work) > 1:
+        chunksize = max(1, len(work) // (jobs * 4))
+        # Workers make their own context from this, once per build, see _worker_context
+        worker_build = (uuid.uuid4().hex, options.image_catalog, options.minify, options.inline_memo_bytes)
+        work = [job + (worker_build,) for job in work]
+        if build.pool is None:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(_generate_page_job, work, chunksize=chunksize))
+        else:
+            results = list(build.pool.map(_generate_page_job, work, chunksize=chunksize))
     else:
-        basepath = "/"
+        # Pages are written on I/O threads while the next one is parsed, unless
+        # profiling, where a page's write has to be timed with the page
+        writer = OutputWriter(jobs=0) if profile else OutputWriter()
+        inline_memo = build.inline_memo
+        if inline_memo is None and options.inline_memo_bytes:
+            inline_memo = InlineMemo(options.inline_memo_bytes)
+        pages_build = build.replace(output_writer=writer, inline_memo=inline_memo)
+        results = (_generate_page_job(job, pages_build) for job in work)
+
+    failures = []
+    changed_outputs = []
+    try:
+        for result in results:
+            if result["log"]:
+                logger.info(result["log"].rstrip("\n"))
+            if result["error"]:
+                logger.error(f"Failed to generate {result['output']} from {result['source']}: {result['error']}")
+                failures.append(result["source"])
+            if stats is not None and cache_config:
+                stats["cache_hits"] += result["cache_hits"]
+                stats["cache_misses"] += result["cache_misses"]
+            if stats is not None and "memo" in result:
+                stats.update(result["memo"])
+            if profile and result["profile"]:
+                build.profiler.add_page(result["profile"])
+            if build.link_index is not None:
+                build.link_index.add(result["source"], result["output"], result["links"])
+            if build.search_index is not None and not result["error"]:
+                build.search_index.add(result["source"], result["output"], result["title"], result["terms"])
+            changed_outputs.extend(result["changed"])
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        changed_outputs.extend(writer.changed)
+        sources = {output: from_path for from_path, dest_path in pages for output, _ in outputs[dest_path]}
+        for path, error in writer.errors:
+            logger.error(f"Failed to write {path}: {type(error).__name__}: {error}")
+            if sources[path] not in failures:
+                failures.append(sources[path])
+    if stats is not None:
+        stats["pages_written"] += len(changed_outputs)
+        stats["pages_unchanged"] += (len(pages) - len(failures)) * len(targets) - len(changed_outputs)
+    if build.changed is not None:
+        build.changed.extend(changed_outputs)
+    return failures
+
+def generated_files(dest_dir, image_catalog=None, listings=None):
+    """Files a build writes into dest_dir besides the pages, kept when static files are synced"""
+    files = search_outputs(dest_dir) + [os.path.join(dest_dir, HIGHLIGHT_CSS_NAME)]
+    if image_catalog is not None:
+        files.extend(image_catalog.variant_outputs(dest_dir))
+    if listings is not None:
+        files.extend(listings.outputs(dest_dir))
+    return files
+
+def write_listings(listings, dest_dir, template_path, basepath="/", skip=(), changed=None, minify=False):
+    """
+    Write the pages of listings into dest_dir, filled into the template at
+    template_path, other than those whose output is in skip: the ones a
+    markdown page makes already. Outputs written are added to changed.
+    Returns how many were written or left unchanged.
+    """
+    template = load_template(template_path, basepath)
+    count = 0
+    for path, title, heading, posts, previous, following in listings.pages():
+        output = listings.output(path, dest_dir)
+        if output in skip:
+            continue
+        content = rewrite_basepath(listings.render_content(heading, posts, previous, following), basepath)
+        page = template.render({"Title": title, "Description": "", "Date": "", "Content": content})
+        if minify:
+            page = minify_html(page)
+        if write_file(output, page) and changed is not None:
+            changed.append(output)
+        count += 1
+    return count
+
+def _remove_output(path, dest_root):
+    """Delete a stale output file and any directories it leaves empty"""
+    if os.path.isfile(path):
+        os.remove(path)
+        logger.info(f"Removed stale output {path}")
+
+    directory = os.path.dirname(path)
+    dest_root = os.path.abspath(dest_root)
+    while os.path.abspath(directory).startswith(dest_root + os.sep):
+        if os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+        else:
+            break
+
+def build_incremental(static_dir, dir_path_content, template_path, dest_dir_path, basepath, build=None, manifest_path=MANIFEST_PATH, jobs=1, static_options=None, skip=(), listings=None, manifest=None):
+    """
+    Rebuild only what changed since the build recorded in the manifest, from
+    content hashes, the templates and images each page uses, and the build's
+    options. Returns the sources that failed.
+    """
+    if build is None:
+        build = BuildContext()
+    options = build.options
+    if manifest is None:
+        manifest = BuildManifest.load(manifest_path)
+    pages = collect_pages(dir_path_content, dest_dir_path, skip)
+
+    # Static assets, this also clears out pages whose markdown is gone
+    image_catalog = options.image_catalog
+    keep = [dest for _, dest in pages] + generated_files(dest_dir_path, image_catalog, listings)
+    sync_stats = build.timed("copy", sync_directory, static_dir, dest_dir_path, keep, changed=build.changed, **(static_options or {}))
+    logger.info(format_sync_stats(static_dir, dest_dir_path, sync_stats))
+
+    # Templates: every layout in use, and what each one includes
+    layouts = options.layouts
+    if layouts is None:
+        layouts = Layouts(dir_path_content, os.path.join(os.path.dirname(template_path), LAYOUTS_DIR), template_path)
+    page_layouts = {from_path: layouts.for_page(from_path) for from_path, _ in pages}
+    templates = {}
+    for layout in sorted(set(page_layouts.values())):
+        dependencies = load_template(layout, basepath).dependencies
+        templates[layout] = {"hash": hash_file(layout), "includes": dependencies[1:]}
+        for path in dependencies[1:]:
+            templates.setdefault(path, {"hash": hash_file(path), "includes": []})
+    changed_templates = {
+        path for path, entry in templates.items()
+        if manifest.templates.get(path, {}).get("hash") != entry["hash"]
+    }
+
+    # Pages are regenerated when an image they show changes size or variants
+    images = image_catalog.attribute_hashes() if image_catalog else {}
+    changed_images = {
+        key for key in images.keys() | manifest.images.keys()
+        if images.get(key) != manifest.images.get(key)
+    }
+
+    # Minified pages, and those of another converter or highlighter, are told apart from
+    # the rest like pages with another basepath
+    basepath_hash = hash_text("\n".join([
+        basepath, "minified" if options.minify else "", str(CONVERTER_VERSION), HIGHLIGHT_CACHE_VERSION,
+    ]))
+    full_rebuild = basepath_hash != manifest.basepath
+    if full_rebuild and manifest.pages:
+        logger.info("Basepath, minification, converter or highlighter changed, regenerating every page")
+    elif changed_templates and manifest.pages:
+        logger.info(f"Templates changed: {', '.join(sorted(changed_templates))}")
+
+    link_index = build.link_index if build.link_index is not None else LinkIndex()
+    search_index = build.search_index if build.search_index is not None else SearchIndex()
+    # Bodies of pages that are only re-templated come from here
+    options = options.replace(layouts=layouts, cache_path=options.cache_path or os.path.join(os.path.dirname(manifest_path), "render.sqlite"))
+    build = build.replace(options=options, link_index=link_index, search_index=search_index)
+
+    page_entries = {}
+    stale_pages = []
+    retemplated = 0
+    for from_path, dest_path in pages:
+        page_hash = hash_file(from_path)
+        layout = page_layouts[from_path]
+        entry = {"hash": page_hash, "output": dest_path, "layout": layout}
+        page_entries[from_path] = entry
+
+        previous = manifest.pages.get(from_path, {})
+        unchanged = previous.get("hash") == page_hash and previous.get("output") == dest_path and os.path.exists(dest_path)
+        template_changed = previous.get("layout") != layout or any(
+            path in changed_templates for path in [layout, *templates[layout]["includes"]]
+        )
+        images_changed = any(
+            kind == "image" and image_key(url) in changed_images for kind, url in previous.get("links", [])
+        )
+        if not full_rebuild and unchanged and not template_changed and not images_changed:
+            link_index.add(from_path, dest_path, previous.get("links", []))
+            search_index.add(from_path, dest_path, previous.get("title"), previous.get("terms", {}))
+            continue
+        if unchanged and not full_rebuild and not images_changed:
+            retemplated += 1
+        stale_pages.append((from_path, dest_path))
+
+    failures = generate_pages(stale_pages, template_path, basepath, jobs, build)
+    if failures:
+        return failures
+    generated = len(stale_pages)
+
+    for from_path, entry in page_entries.items():
+        entry["links"] = [list(link) for link in link_index.links(from_path)]
+        entry["title"], entry["terms"] = search_index.entry(from_path)
+
+    manifest.templates = templates
+    manifest.images = images
+    manifest.basepath = basepath_hash
+    manifest.pages = page_entries
+    manifest.save()
+
+    unchanged = len(page_entries) - generated
+    if build.stats is not None:
+        build.stats["pages_unchanged"] += unchanged
+    logger.info(f"Incremental build: {generated} pages generated ({retemplated} only re-templated), {unchanged} unchanged")
+    return failures
+
+def parse_target(value):
+    """BASEPATH=DIR, as given to --target, -> (DIR, BASEPATH)"""
+    basepath, separator, dest_dir = value.partition("=")
+    if not separator or not basepath or not dest_dir:
+        raise argparse.ArgumentTypeError(f"expected BASEPATH=DIR, got {value!r}")
+    return dest_dir, basepath
 
+def main():
+    parser = argparse.ArgumentParser(description="Generate the static site from content/ into docs/")
+    parser.add_argument("basepath", nargs="?", default="/", help="URL prefix the site is served under")
+    parser.add_argument("--target", dest="targets", action="append", type=parse_target, metavar="BASEPATH=DIR",
+                        help="build into DIR for serving under BASEPATH instead, repeat to build several from one parse")
+    parser.add_argument("--incremental", action="store_true", help=f"only rebuild what changed, tracked in {MANIFEST_PATH}")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="overlap reading and writing pages with parsing them, for slow disks")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of worker processes used to render pages")
+    parser.add_argument("--cache", action="store_true", help=f"reuse rendered pages from {RENDER_CACHE_PATH} across builds")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="render cache size limit in MB")
+    parser.add_argument("--static-mode", choices=["copy", "reflink", "hardlink"], default="reflink", help="how static files are put in docs/, links fall back to copies")
+    parser.add_argument("--static-hash", action="store_true", help="compare static files by content when their mtimes differ")
+    parser.add_argument("--profile", action="store_true", help="time every pipeline stage and report the slowest pages")
+    parser.add_argument("--profile-json", default=PROFILE_PATH, help="where --profile writes its JSON report")
+    parser.add_argument("--profile-top", type=int, default=10, help="number of slowest pages to report")
+    parser.add_argument("--strict-links", action="store_true", help="fail the build if any internal link or image is broken")
+    parser.add_argument("--inline-memo-size", type=int, default=INLINE_MEMO_MAX_BYTES // (1024 * 1024), help="MB of converted inline markdown remembered for reuse across pages, 0 to turn it off")
+    parser.add_argument("--minify", action="store_true", help="minify the pages' HTML and the CSS copied from static/")
+    parser.add_argument("--precompress", action="store_true", help="write .gz, and .br with brotli installed, copies of text outputs next to them")
+    parser.add_argument("--drafts", action="store_true", help="build pages whose front matter says draft: true as well")
+    parser.add_argument("--per-page", type=int, default=LISTING_PER_PAGE, help=f"posts on each page of the {LISTING_SECTION}/ index and tag pages")
+    parser.add_argument("--site-url", default="", help="scheme and host the site is served from, e.g. https://example.com, sitemap.xml is only written with it")
+    parser.add_argument("--changed-list", default=CHANGED_LIST_PATH, help="where to list the files in docs/ this build wrote or removed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    # builder imports this module
+    from builder import SiteBuilder, SiteConfig
     try:
-        print(f"Now beginning static site generation...")
-        copy_directory("static", "docs")
-        generate_pages_recursive(
-            dir_path_content="content",
-            template_path="template.html",
-            dest_dir_path="docs",
-            basepath=basepath
+        config = SiteConfig(
+            targets=args.targets or [("docs", args.basepath)], jobs=args.jobs, incremental=args.incremental,
+            use_async=args.use_async, render_cache=args.cache, render_cache_max_bytes=args.cache_size * 1024 * 1024,
+            static_mode=args.static_mode, static_hash=args.static_hash, profile=args.profile,
+            profile_json=args.profile_json, profile_top=args.profile_top, minify=args.minify,
+            precompress=args.precompress, drafts=args.drafts, per_page=args.per_page, site_url=args.site_url,
+            changed_list=args.changed_list, inline_memo_bytes=args.inline_memo_size * 1024 * 1024,
         )
+    except ValueError as e:
+        parser.error(str(e))
 
+    try:
+        with SiteBuilder(config) as builder:
+            result = builder.build()
+        if result.failed:
+            raise Exception(f"{len(result.failed)} pages failed to generate")
+        if result.broken and args.strict_links:
+            raise Exception(f"{len(result.broken)} broken links")
         print("Static site generated!")
     except Exception as e:
         print(f"Error during site generation: {e}")
         sys.exit(1)
-    
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 6
+
+
+def hash_bytes(data):
+    """Return a short hex digest for a bytes object"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_text(text):
+    return hash_bytes(text.encode("utf-8"))
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Hash a file without loading it into memory all at once"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    Record of what the last build produced, stored as JSON on disk.
+
+    pages: markdown source path -> {"hash": ..., "output": ..., "layout": ..., "links": [[kind, url], ...],
+                                    "title": ..., "terms": {term: count}}
+    templates: layout or partial path -> {"hash": ..., "includes": [partial paths]}
+    images: static-relative image path -> hash of the <img> attributes rendered for it
+
+    Together they form the dependency graph from pages to the template files
+    they're rendered with.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.templates = {}
+        self.images = {}
+        self.basepath = None
+        self.pages = {}
+
+    @classmethod
+    def load(cls, path):
+        manifest = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+
+        # A manifest from another version is treated as missing, forcing a full build
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return manifest
+
+        manifest.templates = data.get("templates", {})
+        manifest.images = data.get("images", {})
+        manifest.basepath = data.get("basepath")
+        manifest.pages = data.get("pages", {})
+        return manifest
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            "version": MANIFEST_VERSION,
+            "templates": self.templates,
+            "images": self.images,
+            "basepath": self.basepath,
+            "pages": self.pages,
+        }
+
+        # Write to a temp file first so an interrupted save never leaves a broken manifest
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def invalidate(path):
+        """
+        Forget the build recorded at path, for builds that write outputs
+        without recording them, so the next incremental build starts over
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
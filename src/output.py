@@ -0,0 +1,188 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_file
+
+DEFAULT_JOBS = 4
+
+
+def _temp_path(path):
+    # Unique per writer thread, next to path so the rename stays on one filesystem
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def _same_contents(path, data):
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+class _HashingWriter:
+    """
+    Text output that goes to a binary file as UTF-8 and is hashed on the
+    way, so the file never has to be read back to be compared. Seeking
+    back, as write_chunks does to replace a body that failed, makes digest
+    hash the file instead.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.blake2b(digest_size=16)
+        self.rewound = False
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.hasher.update(data)
+        return self.f.write(data)
+
+    def tell(self):
+        return self.f.tell()
+
+    def seek(self, position):
+        self.rewound = True
+        return self.f.seek(position)
+
+    def truncate(self, size=None):
+        return self.f.truncate(size)
+
+    def digest(self):
+        self.f.flush()
+        return hash_file(self.f.name) if self.rewound else self.hasher.hexdigest()
+
+
+def _same_digest(path, size, digest):
+    try:
+        return os.path.getsize(path) == size and hash_file(path) == digest
+    except OSError:
+        return False
+
+
+def write_file(path, data):
+    """
+    Replace path with data, str or bytes, returns whether it was written.
+
+    A file that already holds exactly data is left alone, mtime included.
+    Otherwise data goes to a temp file that is renamed over path, so path
+    is never seen half-written.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if _same_contents(path, data):
+        return False
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def stream_file(path, write):
+    """
+    write_file for output streamed rather than held in memory, write(out)
+    streams it as text. It goes to the temp file and a hasher at once, the
+    old file is only read, to hash it, when its size is the same.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            out = _HashingWriter(f)
+            write(out)
+            size = f.tell()
+            digest = out.digest()
+        if _same_digest(path, size, digest):
+            return False
+        os.replace(tmp_path, path)
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class OutputWriter:
+    """
+    Writes build outputs with write_file, or streams them with stream_file,
+    on a small thread pool.
+
+    changed lists every path that was actually written, in the order the
+    writes were queued. Errors are collected in errors as (path, exception)
+    once flushed. With jobs=0 every write happens, and raises, right away.
+    """
+
+    def __init__(self, jobs=DEFAULT_JOBS):
+        self.pool = ThreadPoolExecutor(max_workers=jobs) if jobs > 0 else None
+        # Bounds how much queued output is held in memory at once
+        self.max_pending = max(1, jobs) * 4
+        self.pending = []
+        self.changed = []
+        self.unchanged = 0
+        self.errors = []
+
+    def _record(self, path, changed):
+        if changed:
+            self.changed.append(path)
+        else:
+            self.unchanged += 1
+
+    def write(self, path, data):
+        if self.pool is None:
+            self._record(path, write_file(path, data))
+            return
+
+        self._submit(path, write_file, data)
+
+    def _submit(self, path, func, data):
+        self.pending.append((path, self.pool.submit(func, path, data)))
+        if len(self.pending) > self.max_pending:
+            self._wait(len(self.pending) - self.max_pending)
+
+    def stream(self, path, write, wait=False):
+        """
+        Stream one output straight to disk with stream_file, on the pool
+        like write. wait streams it right away, for a write that depends on
+        the caller's state, like a file it has open, after what's queued.
+        """
+        if self.pool is None or wait:
+            self.flush()
+            self._record(path, stream_file(path, write))
+            return
+
+        self._submit(path, stream_file, write)
+
+    def _wait(self, count):
+        done, self.pending = self.pending[:count], self.pending[count:]
+        for path, future in done:
+            try:
+                self._record(path, future.result())
+            except Exception as e:
+                self.errors.append((path, e))
+
+    def flush(self):
+        self._wait(len(self.pending))
+
+    def close(self):
+        self.flush()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def write_changed_list(path, changed, root):
+    """Write the changed outputs as paths relative to root, one per line"""
+    lines = sorted({os.path.relpath(output, root).replace(os.sep, "/") for output in changed})
+    write_file(path, "".join(line + "\n" for line in lines))
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+# Pipeline stages in the order a page goes through them
+STAGES = ("copy", "read", "blocks", "classify", "inline", "highlight", "to_html", "template", "write")
+
+
+class BuildProfiler:
+    """
+    Collects per-stage timings and byte counts for a build.
+
+    Time spent outside any page, like copying static files, only counts
+    towards the stage totals. Page records are plain dicts so they can be
+    sent back from pool workers and merged with add_page.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.pages = []
+        self.current = None
+
+    def start_page(self, path):
+        self.current = {
+            "page": path,
+            "seconds": 0.0,
+            "stages": dict.fromkeys(STAGES, 0.0),
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "_started": time.perf_counter(),
+        }
+
+    def end_page(self):
+        page = self.current
+        page["seconds"] = time.perf_counter() - page.pop("_started")
+        self.current = None
+        self.add_page(page)
+        return page
+
+    def add_page(self, page):
+        self.pages.append(page)
+        for stage, seconds in page["stages"].items():
+            self.totals[stage] += seconds
+
+    def add(self, stage, seconds):
+        if self.current is not None:
+            self.current["stages"][stage] += seconds
+        else:
+            self.totals[stage] += seconds
+
+    def add_bytes(self, read=0, written=0):
+        if self.current is not None:
+            self.current["bytes_read"] += read
+            self.current["bytes_written"] += written
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self, top=10):
+        wall = (self.finished or time.perf_counter()) - self.started
+        slowest = sorted(self.pages, key=lambda page: page["seconds"], reverse=True)[:top]
+        return {
+            "pages": len(self.pages),
+            "wall_seconds": wall,
+            "page_seconds": sum(page["seconds"] for page in self.pages),
+            "stages": dict(self.totals),
+            "bytes_read": sum(page["bytes_read"] for page in self.pages),
+            "bytes_written": sum(page["bytes_written"] for page in self.pages),
+            "slowest": slowest,
+            "per_page": sorted(self.pages, key=lambda page: page["page"]),
+        }
+
+    def report(self, top=10):
+        summary = self.summary(top)
+        lines = [
+            f"Built {summary['pages']} pages in {summary['wall_seconds']:.3f} s "
+            f"({summary['bytes_read']} bytes read, {summary['bytes_written']} bytes written)",
+            "",
+            f"{'stage':<10} {'seconds':>10} {'share':>7}",
+        ]
+        total = sum(summary["stages"].values()) or 1.0
+        for stage, seconds in summary["stages"].items():
+            lines.append(f"{stage:<10} {seconds:>10.4f} {seconds / total:>6.1%}")
+
+        lines += ["", f"Slowest {len(summary['slowest'])} pages:"]
+        for page in summary["slowest"]:
+            stages = page["stages"]
+            busiest = max(stages, key=stages.get)
+            lines.append(f"{page['seconds']:>10.4f} s  {page['page']}  (mostly {busiest})")
+        return "\n".join(lines)
+
+    def write_json(self, path, top=10):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(top), f, indent=1)
@@ -0,0 +1,165 @@
+import atexit
+import json
+import os
+import sqlite3
+import time
+
+from manifest import hash_text
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the pages table changes, older cache files are emptied and recreated
+SCHEMA_VERSION = 3
+
+# A hit only moves an entry up the LRU order once it's this old, and those
+# moves are written this many at a time, so hits rarely take the write lock
+TOUCH_INTERVAL_NS = 3600 * 10**9
+TOUCH_BATCH = 64
+
+
+class RenderCache:
+    """
+    On-disk cache of rendered page bodies, stored in a sqlite file.
+
+    Entries are keyed by the hash of the markdown and the converter version,
+    so bumping the version invalidates everything rendered by older code.
+    Each entry also keeps the page's link and image references and its
+    search terms, so a cached page can still be link checked and indexed
+    without parsing it.
+    Once the stored HTML grows past max_bytes the least recently used
+    entries are evicted. When an entry was last used is only kept to
+    within TOUCH_INTERVAL_NS, and written with the next put, every
+    TOUCH_BATCH hits, or on flush.
+    """
+
+    def __init__(self, path, version, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.version = str(version)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Keys of hits whose last_used is yet to be written
+        self.touched = []
+
+        # Several build workers may share the file, WAL lets readers and a writer overlap
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS pages")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " hash TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " html TEXT NOT NULL,"
+                " links TEXT NOT NULL,"
+                " terms TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used INTEGER NOT NULL,"
+                " PRIMARY KEY (hash, version))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)")
+        self._total_bytes = self._stored_bytes()
+
+    def key(self, markdown, context=""):
+        """The key of markdown's entry, context is anything else its HTML depends on"""
+        return hash_text(markdown + "\0" + context) if context else hash_text(markdown)
+
+    def get(self, key):
+        page = self.get_page(key)
+        return page[0] if page is not None else None
+
+    def get_page(self, key):
+        """(html, links, terms) stored under key, or None"""
+        row = self.connection.execute(
+            "SELECT html, links, terms, last_used FROM pages WHERE hash = ? AND version = ?", (key, self.version)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if time.time_ns() - row[3] >= TOUCH_INTERVAL_NS:
+            self.touched.append(key)
+            if len(self.touched) >= TOUCH_BATCH:
+                self.flush()
+        return row[0], [tuple(link) for link in json.loads(row[1])], json.loads(row[2])
+
+    def _write_touched(self):
+        self.connection.executemany(
+            "UPDATE pages SET last_used = ? WHERE hash = ? AND version = ?",
+            [(time.time_ns(), key, self.version) for key in self.touched],
+        )
+        self.touched = []
+
+    def flush(self):
+        """Write when the entries hit since the last write were used"""
+        if self.touched:
+            with self.connection:
+                self._write_touched()
+
+    def put(self, key, html, links=(), terms=None):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self.connection:
+            # Written first, so eviction sees them
+            self._write_touched()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages (hash, version, html, links, terms, size, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, self.version, html, json.dumps(list(links)), json.dumps(dict(terms or {})), size, time.time_ns()),
+            )
+            # The running total only estimates the size, other processes may write too
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _stored_bytes(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _evict(self):
+        total = self._stored_bytes()
+        if total <= self.max_bytes:
+            self._total_bytes = total
+            return
+
+        # Evict down to 90% of the limit so every put after this doesn't evict again
+        target = self.max_bytes * 9 // 10
+        rows = self.connection.execute("SELECT hash, version, size FROM pages ORDER BY last_used")
+        evicted = []
+        for page_hash, version, size in rows:
+            if total <= target:
+                break
+            evicted.append((page_hash, version))
+            total -= size
+        self.connection.executemany("DELETE FROM pages WHERE hash = ? AND version = ?", evicted)
+        self._total_bytes = total
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+# One cache per process, so pool workers each open their own connection
+_open_caches = {}
+
+
+def open_render_cache(path, version, max_bytes=DEFAULT_MAX_BYTES):
+    # Forked workers inherit the parent's caches, but not a connection they can use
+    key = (os.getpid(), os.path.abspath(path), str(version), max_bytes)
+    if key not in _open_caches:
+        _open_caches[key] = RenderCache(path, version, max_bytes)
+        # Pool workers exit without running this, their last few hits just stay older in the LRU order
+        atexit.register(_open_caches[key].flush)
+    return _open_caches[key]
@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import time
+from collections import Counter
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from output import write_file
+
+SEARCH_INDEX_NAME = "search.json"
+SITEMAP_NAME = "sitemap.xml"
+
+# Bump when the layout of search.json changes, the client script checks it
+SEARCH_INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w\w+")
+
+
+def tokenize(text):
+    """Lowercased words of at least two characters in text"""
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class TermCounter:
+    """
+    Counts the terms in a page's text nodes as they're collected.
+
+    Text is tokenized a batch at a time, one regex pass per batch is much
+    cheaper than one per node, and a big page's text is never held whole.
+    """
+
+    BATCH_SIZE = 64 * 1024
+
+    def __init__(self):
+        self.terms = Counter()
+        self.pending = []
+        self.pending_size = 0
+
+    def append(self, text):
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= self.BATCH_SIZE:
+            self.flush()
+
+    def update(self, terms):
+        self.terms.update(terms)
+
+    def flush(self):
+        if self.pending:
+            self.terms.update(tokenize(" ".join(self.pending)))
+            self.pending = []
+            self.pending_size = 0
+
+    def counts(self):
+        """{term: count} for everything appended so far"""
+        self.flush()
+        return dict(self.terms)
+
+
+def search_outputs(dest_dir, sitemap=True):
+    """The files SearchIndex.write adds to dest_dir, the sitemap only when it has a site URL for it"""
+    outputs = [os.path.join(dest_dir, SEARCH_INDEX_NAME)]
+    if sitemap:
+        outputs.append(os.path.join(dest_dir, SITEMAP_NAME))
+    return outputs
+
+
+def page_url(output, dest_dir):
+    """URL of an output relative to the site root, a page named index.html is served as its directory"""
+    path = os.path.relpath(output, dest_dir).replace(os.sep, "/")
+    if path == "index.html":
+        return ""
+    if path.endswith("/index.html"):
+        return path[: -len("index.html")]
+    return path
+
+
+class SearchIndex:
+    """
+    Titles and term counts of every page, collected while pages are generated.
+
+    pages: markdown source path -> (output path, title, {term: count})
+
+    write turns them into an inverted index for client-side search and a
+    sitemap, without reading back any of the generated HTML.
+    """
+
+    def __init__(self):
+        self.pages = {}
+
+    def add(self, source, output, title, terms):
+        self.pages[source] = (output, title, dict(terms))
+
+    def entry(self, source):
+        """(title, terms) recorded for source, or None"""
+        if source not in self.pages:
+            return None
+        _, title, terms = self.pages[source]
+        return title, terms
+
+    def __len__(self):
+        return len(self.pages)
+
+    def retarget(self, root, dest_dir):
+        """A copy with every output under root moved under dest_dir, for another target of the same build"""
+        retargeted = SearchIndex()
+        for source, (output, title, terms) in self.pages.items():
+            retargeted.pages[source] = (os.path.join(dest_dir, os.path.relpath(output, root)), title, terms)
+        return retargeted
+
+    def index(self, dest_dir, basepath="/"):
+        """
+        The search index as a dict. pages lists [url, title] pairs, sorted by
+        url, and terms maps each term to a flat [page, count, page, count, ...]
+        list of positions in pages.
+        """
+        pages = sorted((basepath + page_url(output, dest_dir), title) for output, title, _ in self.pages.values())
+        positions = {url: number for number, (url, _) in enumerate(pages)}
+
+        postings = {}
+        for output, _, terms in self.pages.values():
+            number = positions[basepath + page_url(output, dest_dir)]
+            for term, count in terms.items():
+                postings.setdefault(term, []).append((number, count))
+
+        terms = {}
+        for term in sorted(postings):
+            terms[term] = [value for posting in sorted(postings[term]) for value in posting]
+        return {"version": SEARCH_INDEX_VERSION, "pages": [list(page) for page in pages], "terms": terms}
+
+    def sitemap(self, dest_dir, basepath="/", site_url="", listed=()):
+        """
+        sitemap.xml listing every page, and the outputs in listed of pages
+        made without markdown, dated by when each output last changed. Its
+        URLs have to be absolute, so site_url is required.
+        """
+        if not site_url:
+            raise ValueError("a sitemap needs the site's URL")
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+        ]
+        outputs = {output for output, _, _ in self.pages.values()} | set(listed)
+        for url, output in sorted((page_url(output, dest_dir), output) for output in outputs):
+            location = escape(site_url.rstrip("/") + quote(basepath + url))
+            lines.append(f"  <url><loc>{location}</loc>{_lastmod(output)}</url>")
+        lines.append("</urlset>")
+        return "\n".join(lines) + "\n"
+
+    def write(self, dest_dir, basepath="/", site_url="", listed=()):
+        """
+        Write search.json into dest_dir, and sitemap.xml with a site_url,
+        removing one a build with a site_url left. listed goes to sitemap.
+        Returns the paths that changed.
+        """
+        index_path, sitemap_path = search_outputs(dest_dir)
+        index = json.dumps(self.index(dest_dir, basepath), ensure_ascii=False, separators=(",", ":"))
+
+        changed = []
+        if write_file(index_path, index):
+            changed.append(index_path)
+        if site_url:
+            if write_file(sitemap_path, self.sitemap(dest_dir, basepath, site_url, listed)):
+                changed.append(sitemap_path)
+        elif os.path.exists(sitemap_path):
+            os.remove(sitemap_path)
+            changed.append(sitemap_path)
+        return changed
+
+
+def _lastmod(output):
+    # Outputs are only rewritten when their bytes change, so the mtime is when the page last did
+    try:
+        mtime = os.path.getmtime(output)
+    except OSError:
+        return ""
+    return f"<lastmod>{time.strftime('%Y-%m-%d', time.gmtime(mtime))}</lastmod>"
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+
+class SiteTestCase(unittest.TestCase):
+    """
+    A test case with a site laid out in a temporary directory.
+
+    files: relative path -> text written before every test, like the
+    content, static files and template of the site under test.
+    """
+
+    files = {}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        for relative_path, text in self.files.items():
+            self.write(relative_path, text)
+
+    def path(self, relative_path):
+        return os.path.join(self.root, relative_path)
+
+    def write(self, relative_path, data, mtime=None):
+        """Write text, or bytes, to relative_path, returns its full path"""
+        path = self.path(relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(data, bytes):
+            with open(path, "wb") as f:
+                f.write(data)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def read(self, relative_path):
+        with open(self.path(relative_path), encoding="utf-8") as f:
+            return f.read()
@@ -0,0 +1,175 @@
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_file
+from output import write_file
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl that makes dst share src's blocks on copy-on-write filesystems (btrfs, XFS)
+FICLONE = 0x40049409
+
+DEFAULT_JOBS = 8
+
+
+def _same_file(src_stat, dst_stat):
+    return src_stat.st_ino == dst_stat.st_ino and src_stat.st_dev == dst_stat.st_dev
+
+
+def _unchanged(src_path, src_stat, dst_path, use_hash):
+    """Whether dst_path already holds the same file as src_path"""
+    try:
+        dst_stat = os.stat(dst_path)
+    except FileNotFoundError:
+        return False
+
+    if _same_file(src_stat, dst_stat):
+        return True
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return True
+
+    # Same size but touched, e.g. after a checkout. Compare contents and adopt the mtime
+    if use_hash and hash_file(src_path) == hash_file(dst_path):
+        os.utime(dst_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+        return True
+    return False
+
+
+def _reflink(src_path, dst_path):
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dst_path)
+
+
+def _transfer(src_path, dst_path, mode, transform=None):
+    """
+    Put a copy of src_path at dst_path, returns "linked" or "copied".
+
+    The copy is made next to dst_path and renamed over it, so a hardlinked
+    output is replaced rather than written through to its source. With a
+    transform, dst_path gets transform of src_path's text instead, and
+    "unchanged" is returned if it already held that.
+    """
+    if transform is not None:
+        with open(src_path, "r", encoding="utf-8") as f:
+            return "copied" if write_file(dst_path, transform(f.read())) else "unchanged"
+
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = dst_path + ".sync-tmp"
+
+    if mode in ("hardlink", "reflink"):
+        try:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            if mode == "hardlink":
+                os.link(src_path, tmp_path)
+            elif fcntl is not None:
+                _reflink(src_path, tmp_path)
+            else:
+                raise OSError("reflinks are not supported here")
+            os.replace(tmp_path, dst_path)
+            return "linked"
+        except OSError:
+            # Different filesystems, or one without links or copy-on-write
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+
+    shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+    return "copied"
+
+
+def _kept(path, wanted, keep, companions):
+    if path in wanted or path in keep:
+        return True
+    for suffix in companions:
+        if path.endswith(suffix) and _kept(path[: -len(suffix)], wanted, keep, ()):
+            return True
+    return False
+
+
+def _remove_stale(dest_dir, wanted, keep, companions, changed):
+    removed = 0
+    for root, dirs, filenames in os.walk(dest_dir, topdown=False):
+        for filename in filenames:
+            path = os.path.normpath(os.path.join(root, filename))
+            if not _kept(path, wanted, keep, companions):
+                os.remove(path)
+                changed.append(path)
+                removed += 1
+        for directory in dirs:
+            path = os.path.join(root, directory)
+            if os.path.isdir(path) and not os.path.islink(path) and not os.listdir(path):
+                os.rmdir(path)
+    return removed
+
+
+def sync_directory(source_dir, dest_dir, keep=(), use_hash=False, mode="reflink", jobs=DEFAULT_JOBS, changed=None,
+                   transforms=None, companions=()):
+    """
+    Make dest_dir mirror source_dir, copying only files that changed.
+
+    Files are compared by size and mtime, and by content hash as well when
+    use_hash is set. mode is "copy", "reflink" or "hardlink". Reflinks and
+    hardlinks fall back to a copy when the filesystem can't make them.
+    transforms maps lowercase extensions to functions of a file's text,
+    files with those extensions get what it returns instead of a copy and
+    are only written when that changes. Files in dest_dir that aren't in
+    source_dir or keep, or named like one that is plus one of the suffixes
+    in companions, are removed. Transfers run on up to jobs threads. Every
+    path copied, linked or removed in dest_dir is added to changed. Returns
+    counts of what happened.
+    """
+    if changed is None:
+        changed = []
+    if transforms is None:
+        transforms = {}
+    stats = {"copied": 0, "linked": 0, "unchanged": 0, "removed": 0, "bytes": 0}
+    if not os.path.exists(source_dir):
+        logger.warning(f"Source directory '{source_dir}' does not exist!")
+    os.makedirs(dest_dir, exist_ok=True)
+
+    wanted = set()
+    transfers = []
+    for root, _, filenames in os.walk(source_dir):
+        for filename in filenames:
+            src_path = os.path.join(root, filename)
+            dst_path = os.path.normpath(os.path.join(dest_dir, os.path.relpath(src_path, source_dir)))
+            wanted.add(dst_path)
+
+            src_stat = os.stat(src_path)
+            # A transformed file's size and mtime say nothing about whether it's up to date
+            transform = transforms.get(os.path.splitext(filename)[1].lower())
+            if transform is None and _unchanged(src_path, src_stat, dst_path, use_hash):
+                stats["unchanged"] += 1
+            else:
+                transfers.append((src_path, dst_path, src_stat.st_size, transform))
+
+    if transfers:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            outcomes = pool.map(lambda transfer: _transfer(transfer[0], transfer[1], mode, transfer[3]), transfers)
+            for outcome, (_, dst_path, size, _) in zip(outcomes, transfers):
+                stats[outcome] += 1
+                if outcome != "unchanged":
+                    stats["bytes"] += size
+                    changed.append(dst_path)
+
+    keep = {os.path.normpath(path) for path in keep}
+    stats["removed"] = _remove_stale(dest_dir, wanted, keep, companions, changed)
+    return stats
+
+
+def format_sync_stats(source_dir, dest_dir, stats):
+    return (
+        f"Synced '{source_dir}' -> '{dest_dir}': {stats['copied']} copied, {stats['linked']} linked, "
+        f"{stats['unchanged']} unchanged, {stats['removed']} removed ({stats['bytes'] / 1e6:.1f} MB transferred)"
+    )
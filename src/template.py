@@ -0,0 +1,158 @@
+import io
+import os
+import re
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*([A-Za-z_][\w-]*)\s*\}\}")
+# {{> partials/header.html }}, a path relative to the including file
+INCLUDE_RE = re.compile(r"\{\{>\s*([^\s}]+)\s*\}\}")
+
+
+class Template:
+    """
+    A template parsed once into literal segments and {{ Name }} slots.
+
+    literals always has one more entry than slots: rendering alternates
+    literals[0], slots[0], literals[1], ... Root-relative href and src
+    attributes in the literals are pointed at basepath when compiling, so
+    rendering a page only fills in the slots. dependencies lists the files
+    the source was read from, the template itself and every partial.
+    """
+
+    def __init__(self, source, basepath="/", dependencies=()):
+        self.basepath = basepath
+        self.dependencies = list(dependencies)
+        self.literals = []
+        self.slots = []
+
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            self.literals.append(source[position:match.start()])
+            # Keep the raw placeholder so unknown names render unchanged
+            self.slots.append((match.group(1), match.group()))
+            position = match.end()
+        self.literals.append(source[position:])
+
+        if basepath != "/":
+            self.literals = [
+                literal.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+                for literal in self.literals
+            ]
+
+    @property
+    def names(self):
+        return {name for name, _ in self.slots}
+
+    def write(self, out, context):
+        """
+        Write the template with its slots filled from context into out.
+
+        A context value can be a string, or a callable that streams its own
+        content into out. Slots missing from context keep their placeholder.
+        """
+        out.write(self.literals[0])
+        for (name, placeholder), literal in zip(self.slots, self.literals[1:]):
+            value = context.get(name, placeholder)
+            if callable(value):
+                value(out)
+            else:
+                out.write(value)
+            out.write(literal)
+
+    def render(self, context):
+        parts = [self.literals[0]]
+        for (name, placeholder), literal in zip(self.slots, self.literals[1:]):
+            value = context.get(name, placeholder)
+            if callable(value):
+                buffer = io.StringIO()
+                value(buffer)
+                value = buffer.getvalue()
+            parts.append(value)
+            parts.append(literal)
+        return "".join(parts)
+
+
+def read_template_source(template_path, _including=()):
+    """
+    Read template_path with every {{> partial }} replaced by the partial's
+    own source. Returns the text and the files it was read from, in the
+    order they were first included.
+    """
+    if template_path in _including:
+        cycle = " -> ".join(_including + (template_path,))
+        raise ValueError(f"Template includes itself: {cycle}")
+
+    with open(template_path, "r", encoding="utf-8") as template_file:
+        source = template_file.read()
+
+    dependencies = [template_path]
+    directory = os.path.dirname(template_path)
+    parts = []
+    position = 0
+    for match in INCLUDE_RE.finditer(source):
+        partial_path = os.path.normpath(os.path.join(directory, match.group(1)))
+        partial_source, partial_dependencies = read_template_source(partial_path, _including + (template_path,))
+        parts.append(source[position:match.start()])
+        parts.append(partial_source)
+        dependencies.extend(path for path in partial_dependencies if path not in dependencies)
+        position = match.end()
+    parts.append(source[position:])
+    return "".join(parts), dependencies
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# (template path, basepath) -> ({dependency: (mtime, size)}, Template)
+_template_cache = {}
+
+
+def load_template(template_path, basepath="/"):
+    """
+    Return the compiled template at template_path, only reading and parsing
+    it again when it or one of its partials changes on disk.
+    """
+    key = (os.path.abspath(template_path), basepath)
+    cached = _template_cache.get(key)
+    if cached and all(_file_state(path) == state for path, state in cached[0].items()):
+        return cached[1]
+
+    source, dependencies = read_template_source(template_path)
+    states = {path: _file_state(path) for path in dependencies}
+    template = Template(source, basepath, dependencies)
+    _template_cache[key] = (states, template)
+    return template
+
+
+class Layouts:
+    """
+    Picks the layout each page is rendered with.
+
+    A page under content_dir/blog/tom/ uses layouts_dir/blog/tom.html if it
+    exists, then layouts_dir/blog.html, and otherwise the default template.
+    """
+
+    def __init__(self, content_dir, layouts_dir, default):
+        self.content_dir = content_dir
+        self.layouts_dir = layouts_dir
+        self.default = default
+        # section directory -> layout path
+        self._layouts = {}
+
+    def for_page(self, source):
+        section = os.path.dirname(os.path.relpath(source, self.content_dir))
+        if section not in self._layouts:
+            self._layouts[section] = self._find(section)
+        return self._layouts[section]
+
+    def _find(self, section):
+        while section and section != os.curdir:
+            path = os.path.join(self.layouts_dir, section + ".html")
+            if os.path.isfile(path):
+                return path
+            section = os.path.dirname(section)
+        return self.default
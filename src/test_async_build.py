@@ -0,0 +1,80 @@
+import contextlib
+import io
+import os
+import unittest
+from collections import Counter
+
+import main
+from async_build import build_async
+from links import LinkIndex
+from main import BuildContext, generate_pages_recursive
+from site_fixture import SiteTestCase
+
+
+class TestAsyncBuild(SiteTestCase):
+
+    files = {
+        "template.html": "<title>{{ Title }}</title><main>{{ Content }}</main>",
+        "content/index.md": "# Home\n\nSee [the post](/blog/post) and **more**.\n",
+        "content/blog/post.md": "# Post\n\n- one\n- two\n\n```\ncode\n```\n",
+        "content/blog/deep/er/page.md": "# Deep\n\n> quoted\n",
+        "content/notes.txt": "not a page",
+    }
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.path("content/empty"))
+
+    def tree(self, directory):
+        files = {}
+        for root, dirs, filenames in os.walk(self.path(directory)):
+            relative_root = os.path.relpath(root, self.path(directory))
+            files[relative_root] = None
+            for filename in filenames:
+                with open(os.path.join(root, filename), "rb") as f:
+                    files[os.path.join(relative_root, filename)] = f.read()
+        return files
+
+    def build_both(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.path("content"), self.path("template.html"), self.path("expected"), "/docs/")
+            failures = build_async(self.path("content"), self.path("template.html"), self.path("docs"), "/docs/", **options)
+        self.assertEqual(failures, [])
+        return self.tree("expected"), self.tree("docs")
+
+    def test_output_matches_generate_pages_recursive(self):
+        expected, built = self.build_both(readers=2, writers=1, max_pending=1)
+        self.assertEqual(built, expected)
+        self.assertIn("empty", built)
+
+    def test_streamed_pages_match(self):
+        self.addCleanup(setattr, main, "STREAM_THRESHOLD", main.STREAM_THRESHOLD)
+        main.STREAM_THRESHOLD = 0
+        expected, built = self.build_both()
+        self.assertEqual(built, expected)
+
+    def test_reports_changes_and_links(self):
+        changed = []
+        stats = Counter()
+        link_index = LinkIndex()
+        self.build_both(build=BuildContext(changed=changed, stats=stats, link_index=link_index))
+        self.assertEqual(stats["pages_written"], 3)
+        self.assertIn(self.path("docs/blog/post.html"), changed)
+        self.assertEqual(link_index.links(self.path("content/index.md")), [("link", "/blog/post")])
+
+        changed.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_async(self.path("content"), self.path("template.html"), self.path("docs"), "/docs/", BuildContext(changed=changed, stats=stats))
+        self.assertEqual(changed, [])
+        self.assertEqual(stats["pages_unchanged"], 3)
+
+    def test_failing_page_does_not_stop_the_build(self):
+        self.write("content/bad.md", b"# Not utf-8 \xff\n")
+        with self.assertLogs("async_build", level="ERROR"):
+            failures = build_async(self.path("content"), self.path("template.html"), self.path("docs"), "/")
+        self.assertEqual(failures, [self.path("content/bad.md")])
+        self.assertTrue(os.path.exists(self.path("docs/blog/deep/er/page.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import struct
+import threading
+import unittest
+
+from builder import SiteBuilder, SiteConfig
+from site_fixture import SiteTestCase
+
+
+class TestSiteBuilder(SiteTestCase):
+    files = {
+        "static/index.css": "body {}",
+        "content/index.md": "# Home\n\n[post](/blog/post.html)",
+        "content/blog/post.md": "---\ntitle: Post\ndate: 2024-05-01\n---\n# Post",
+        "content/blog/draft.md": "---\ndraft: true\n---\n# Draft",
+        "template.html": "<title>{{ Title }}</title>{{ Content }}",
+    }
+
+    def builder(self, **options):
+        options.setdefault("targets", [(self.path("docs"), "/")])
+        options.setdefault("cache_dir", self.path("cache"))
+        config = SiteConfig(
+            static_dir=self.path("static"), content_dir=self.path("content"), template_path=self.path("template.html"),
+            **options,
+        )
+        return SiteBuilder(config)
+
+    def build(self, builder):
+        with self.assertLogs(level="INFO") as logs:
+            result = builder.build()
+        self.logs = logs.output
+        return result
+
+    def test_repeated_builds_only_write_changes(self):
+        builder = self.builder()
+        result = self.build(builder)
+        self.assertTrue(result.succeeded)
+        self.assertEqual((result.written, result.unchanged), (2, 0))
+        self.assertEqual(result.skipped, [self.path("content/blog/draft.md")])
+        self.assertIn(self.path("docs/blog/index.html"), result.changed)
+        self.assertEqual(result.broken, [])
+        self.assertGreaterEqual(result.timings["total"], result.timings["pages"])
+        self.assertFalse(os.path.exists(self.path("docs/sitemap.xml")))
+
+        self.write("content/index.md", "# Home again")
+        result = self.build(builder)
+        self.assertEqual((result.written, result.unchanged), (1, 1))
+        self.assertIn(self.path("docs/index.html"), result.changed)
+        self.assertNotIn(self.path("docs/blog/post.html"), result.changed)
+
+    def test_incremental_builds_keep_the_manifest(self):
+        builder = self.builder(incremental=True)
+        self.build(builder)
+        manifest = builder.manifest
+        self.assertIn(self.path("content/index.md"), manifest.pages)
+
+        result = self.build(builder)
+        self.assertIs(builder.manifest, manifest)
+        self.assertEqual((result.written, result.unchanged), (0, 2))
+        self.assertEqual(result.changed, [])
+
+    def test_full_builds_invalidate_the_manifest(self):
+        self.write("template.html", "<title>{{ Title }}</title>\n{{ Content }}")
+        self.build(self.builder(incremental=True))
+        for options in ({"targets": [(self.path("docs"), "/site/")]}, {"minify": True}):
+            self.build(self.builder(**options))
+            self.build(self.builder(incremental=True))
+            self.assertEqual(self.read("docs/index.html"), '<title>Home</title>\n<div><h1>Home</h1><p><a href="/blog/post.html">post</a></p></div>')
+
+    def test_sitemap_lists_listing_pages(self):
+        self.write("content/blog/post.md", "---\ntitle: Post\ntags: [elves]\n---\n# Post")
+        self.build(self.builder(site_url="https://example.com"))
+        sitemap = self.read("docs/sitemap.xml")
+        for url in ["/", "/blog/post.html", "/blog/", "/blog/tags/elves/"]:
+            self.assertIn(f"<loc>https://example.com{url}</loc>", sitemap)
+
+    def test_failed_pages_are_reported(self):
+        self.write("layouts/blog.html", "{{> missing.html }}{{ Content }}")
+        result = self.build(self.builder())
+        self.assertFalse(result.succeeded)
+        self.assertEqual(result.failed, [self.path("content/blog/post.md")])
+        self.assertTrue(os.path.exists(self.path("docs/index.html")))
+        self.assertIn(f"ERROR:main:Failed to generate {self.path('docs/blog/post.html')} from {self.path('content/blog/post.md')}: "
+                      "FileNotFoundError", "\n".join(self.logs))
+
+    def test_bad_front_matter_only_fails_its_page(self):
+        self.write("content/blog/bad.md", "---\n\nSome text\n\n---\n\n# Rule page")
+        result = self.build(self.builder())
+        self.assertEqual(result.failed, [self.path("content/blog/bad.md")])
+        self.assertTrue(os.path.exists(self.path("docs/blog/post.html")))
+
+    def test_memo_and_workers_are_kept_across_builds(self):
+        with self.builder(jobs=2) as builder:
+            self.build(builder)
+            pool = builder.pool
+            self.assertIsNotNone(pool)
+            self.assertTrue(self.build(builder).succeeded)
+            self.assertIs(builder.pool, pool)
+        self.assertIsNone(builder.pool)
+
+        builder = self.builder()
+        memo = builder.inline_memo
+        self.build(builder)
+        result = self.build(builder)
+        self.assertIs(builder.inline_memo, memo)
+        self.assertGreater(result.stats["inline_hits"], 0)
+
+        # Fragments were sized with the old images, so another catalog starts the memo over
+        self.write("static/pic.png", b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 4, 4) + b"\x08\x06\x00\x00\x00")
+        result = self.build(builder)
+        self.assertEqual(result.stats["inline_hits"], 0)
+        self.assertIs(memo.catalog, builder.image_pipeline.catalog)
+
+    def test_builders_build_side_by_side(self):
+        def builder(name, minify):
+            return self.builder(targets=[(self.path(name), "/")], cache_dir=self.path(f"cache-{name}"), minify=minify)
+
+        with self.assertLogs(level="INFO"):
+            for name, minify in (("plain", False), ("minified", True)):
+                builder(name, minify).build()
+            builders = [builder("plain-threaded", False), builder("minified-threaded", True)]
+            threads = [threading.Thread(target=builder.build) for builder in builders]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        for name in ("plain", "minified"):
+            for page in ("index.html", "blog/post.html"):
+                with open(self.path(f"{name}/{page}")) as expected, open(self.path(f"{name}-threaded/{page}")) as built:
+                    self.assertEqual(built.read(), expected.read())
+
+    def test_incompatible_options(self):
+        with self.assertRaises(ValueError):
+            SiteConfig(use_async=True, jobs=2)
+        with self.assertRaises(ValueError):
+            SiteConfig(targets=[("a", "/"), ("b", "/b/")], incremental=True)
+        with self.assertRaises(ValueError):
+            SiteConfig(site_url="example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
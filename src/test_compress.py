@@ -0,0 +1,114 @@
+import gzip
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+from compress import Precompressor, compressed_suffixes, minify_css, minify_html
+from main import BuildContext, RenderOptions, generate_pages
+from site_fixture import SiteTestCase
+
+
+class TestMinify(unittest.TestCase):
+
+    def test_minify_html(self):
+        html = (
+            "<!DOCTYPE html>\n<html>\n  <head>\n    <title> Page </title>\n  </head>\n  <body>\n"
+            "    <!-- nav -->\n    <p>Some   <b>bold</b> <i>words</i>\n    here</p>\n  </body>\n</html>\n"
+        )
+        self.assertEqual(
+            minify_html(html),
+            "<!DOCTYPE html><html><head><title>Page</title></head><body><p>Some <b>bold</b> <i>words</i> here</p></body></html>",
+        )
+
+    def test_minify_html_keeps_preformatted_text(self):
+        html = '<div>\n  <pre><code class="x">  indented\n\n    code</code></pre>\n  <textarea> a  b </textarea>\n</div>'
+        self.assertEqual(
+            minify_html(html),
+            '<div><pre><code class="x">  indented\n\n    code</code></pre><textarea> a  b </textarea></div>',
+        )
+
+    def test_minify_html_minifies_style_elements(self):
+        self.assertEqual(minify_html("<style>\n  a {\n    color: red;\n  }\n</style>"), "<style>a{color:red}</style>")
+
+    def test_minify_html_keeps_non_breaking_spaces(self):
+        self.assertEqual(minify_html("<p>a\xa0\xa0b  c</p>"), "<p>a\xa0\xa0b c</p>")
+
+    def test_minify_css(self):
+        css = (
+            "/* layout */\nbody , p > a {\n  margin : 0 auto;\n  font: 12px / 1.5 \"Open  Sans\";\n}\n\n"
+            "@media (max-width: 600px) {\n  a :hover { width: calc(100% - 2px); }\n}\n/*! license */\n"
+        )
+        self.assertEqual(
+            minify_css(css),
+            'body,p>a{margin :0 auto;font:12px / 1.5 "Open  Sans"}'
+            "@media (max-width:600px){a :hover{width:calc(100% - 2px)}}/*! license */",
+        )
+
+
+class TestPrecompressor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.precompressor = Precompressor(os.path.join(self.tmp.name, "cache", "precompress.json"))
+        self.write("index.html", "<p>page</p>" * 100)
+        self.write("images/a.png", "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        path = os.path.join(self.dest, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_compresses_text_files(self):
+        changed = []
+        self.assertEqual(self.precompressor.compress(self.dest, jobs=2, changed=changed), (1, 0))
+        page = os.path.join(self.dest, "index.html")
+        self.assertEqual(sorted(changed), [page + suffix for suffix in sorted(compressed_suffixes())])
+        with gzip.open(page + ".gz", "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>page</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images", "a.png.gz")))
+
+    def test_skips_files_whose_content_is_unchanged(self):
+        self.precompressor.compress(self.dest)
+        page = os.path.join(self.dest, "index.html")
+        os.utime(page, (1, 1))
+        os.utime(page + ".gz", (1, 1))
+        self.assertEqual(self.precompressor.compress(self.dest), (0, 1))
+        self.assertEqual(os.path.getmtime(page + ".gz"), 1)
+
+        self.write("index.html", "<p>changed</p>")
+        changed = []
+        self.assertEqual(self.precompressor.compress(self.dest, changed=changed), (1, 0))
+        self.assertIn(page + ".gz", changed)
+
+    def test_recompresses_missing_copies(self):
+        self.precompressor.compress(self.dest)
+        os.remove(os.path.join(self.dest, "index.html.gz"))
+        self.assertEqual(self.precompressor.compress(self.dest), (1, 0))
+
+
+class TestMinifiedPages(SiteTestCase):
+    files = {
+        "template.html": "<html>\n  <title>{{ Title }}</title>\n  <body>\n    {{ Content }}\n  </body>\n</html>\n",
+        "a.md": "# Title\n\n```\nkeep  this\n```",
+        "b.md": "# Title\n\n```\nkeep  this\n```",
+    }
+
+    def test_minified_pages(self):
+        pages = [(self.path(f"{name}.md"), self.path(f"{name}.html")) for name in ["a", "b"]]
+
+        for jobs in (1, 2):
+            stats = Counter()
+            self.assertEqual(generate_pages(pages, self.path("template.html"), "/", jobs, BuildContext(RenderOptions(minify=True), stats=stats)), [])
+            self.assertEqual(self.read("b.html"), "<html><title>Title</title><body><div><h1>Title</h1><pre><code>keep  this</code></pre></div></body></html>")
+        self.assertEqual(stats["pages_written"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import os
+import tempfile
+import unittest
+
+from frontmatter import MetadataIndex, page_metadata, read_front_matter, split_front_matter
+from main import generate_page, stream_title
+from site_fixture import SiteTestCase
+
+
+class TestFrontMatter(unittest.TestCase):
+
+    def test_split_front_matter(self):
+        markdown = "---\ntitle: \"A: title\"\ndate: 2024-05-02\ntags: [one, 'two']\ndraft: true\n---\n# Heading\n"
+        front_matter, body = split_front_matter(markdown)
+        self.assertEqual(front_matter, {"title": "A: title", "date": "2024-05-02", "tags": ["one", "two"], "draft": True})
+        self.assertEqual(body, "# Heading\n")
+
+    def test_list_items_and_comments(self):
+        front_matter, _ = split_front_matter("---\n# a comment\nTags:\n  - one\n  - two\n\ndescription: Text\n---\n")
+        self.assertEqual(front_matter, {"tags": ["one", "two"], "description": "Text"})
+
+    def test_pages_without_front_matter(self):
+        self.assertEqual(split_front_matter("# Title\n\n---\n"), ({}, "# Title\n\n---\n"))
+        self.assertEqual(split_front_matter("---\nnot: closed\n"), ({}, "---\nnot: closed\n"))
+
+    def test_read_front_matter_stops_at_the_fence(self):
+        f = io.StringIO("---\ntitle: T\n---\n# Heading\nBody\n")
+        self.assertEqual(read_front_matter(f), {"title": "T"})
+        self.assertEqual(f.readline(), "# Heading\n")
+
+    def test_invalid_front_matter(self):
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            split_front_matter("---\ntitle: T\njust text\n---\n")
+
+    def test_page_metadata(self):
+        self.assertEqual(
+            page_metadata({"tags": "one, two", "date": "2024-05-02"}),
+            {"title": None, "date": "2024-05-02", "tags": ["one", "two"], "draft": False, "description": ""},
+        )
+        with self.assertRaises(ValueError):
+            page_metadata({"date": "2024-13-01"})
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.index_path = os.path.join(self.tmp.name, "cache", "metadata.json")
+        self.write("blog/new.md", "---\ndate: 2024-05-02\n---\n# New post\n")
+        self.write("blog/old.md", "---\ntitle: Old\ndate: 2023-01-01\ntags: [x]\n---\n# Heading\n")
+        self.write("blog/draft.md", "---\ndraft: true\n---\n# Draft\n")
+        self.write("blog/index.md", "# Blog\n")
+        self.write("index.md", "# Home\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        path = os.path.join(self.content, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_posts_newest_first(self):
+        metadata = MetadataIndex(self.content, self.index_path).scan(stream_title)
+        posts = metadata.posts("blog")
+        self.assertEqual([post["title"] for _, post in posts], ["New post", "Old"])
+        self.assertEqual(metadata.drafts(), {os.path.join(self.content, "blog", "draft.md")})
+
+    def test_unchanged_pages_are_not_read_again(self):
+        MetadataIndex(self.content, self.index_path).scan(stream_title)
+        read = []
+        def find_title(lines):
+            read.append(lines.name)
+            return stream_title(lines)
+
+        path = self.write("blog/new.md", "---\ndate: 2024-06-01\n---\n# Renamed\n")
+        metadata = MetadataIndex(self.content, self.index_path).scan(find_title)
+        self.assertEqual(read, [path])
+        self.assertEqual(metadata.pages[path]["title"], "Renamed")
+        self.assertEqual(metadata.pages[os.path.join(self.content, "blog", "old.md")]["tags"], ["x"])
+
+    def test_unreadable_pages_are_reported(self):
+        header = self.write("blog/rules.md", "---\n\nSome text\n\n---\n\n# Rule page\n")
+        date = self.write("blog/date.md", "---\ndate: 2024-13-01\n---\n# Bad date\n")
+        metadata = MetadataIndex(self.content, self.index_path).scan(stream_title)
+        self.assertEqual(sorted(metadata.errors), [date, header])
+        self.assertIn("line 3", metadata.errors[header])
+        self.assertNotIn(header, metadata.pages)
+        self.assertEqual(len(metadata.posts("blog")), 2)
+
+
+class TestFrontMatterPages(SiteTestCase):
+    files = {
+        "template.html": '<title>{{ Title }}</title><meta content="{{ Description }}">{{ Date }}{{ Content }}',
+        "a.md": "---\ntitle: Front\ndescription: About\ndate: 2024-05-02\n---\n# Heading\n\nText",
+    }
+
+    def test_front_matter_fills_template_slots(self):
+        page = generate_page(self.path("a.md"), self.path("template.html"), self.path("a.html"), "/")
+        self.assertEqual(page["title"], "Front")
+        self.assertEqual(self.read("a.html"), '<title>Front</title><meta content="About">2024-05-02<div><h1>Heading</h1><p>Text</p></div>')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+import highlight
+from highlight import CACHE_VERSION, can_highlight, stylesheet
+from render_cache import RenderCache
+
+
+class TestHighlight(unittest.TestCase):
+
+    def test_unknown_language_is_only_escaped(self):
+        for language in (None, "", "not-a-language"):
+            self.assertEqual(highlight.highlight('if a < b && c > "d":', language), 'if a &lt; b &amp;&amp; c &gt; "d":')
+
+    @unittest.skipUnless(highlight.pygments, "pygments is not installed")
+    def test_known_language_is_highlighted(self):
+        html = highlight.highlight('print("<b>")', "python")
+        self.assertIn('<span class="nb">print</span>', html)
+        self.assertIn("&lt;b&gt;", html)
+        self.assertNotIn("<b>", html)
+        self.assertFalse(html.endswith("\n"))
+        self.assertIn(".highlight .nb", stylesheet())
+
+    @unittest.skipUnless(highlight.pygments, "pygments is not installed")
+    def test_snippets_are_memoized(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RenderCache(os.path.join(tmp, "highlight.sqlite"), CACHE_VERSION)
+            first = highlight.highlight("x = 1", "python", cache)
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(highlight.highlight("x = 1", "python", cache), first)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            # Same code in another language is a different entry
+            highlight.highlight("x = 1", "ruby", cache)
+            self.assertEqual(len(cache), 2)
+            cache.close()
+
+    def test_can_highlight(self):
+        self.assertFalse(can_highlight(None))
+        self.assertFalse(can_highlight("not-a-language"))
+        self.assertEqual(can_highlight("python"), highlight.pygments is not None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -56,6 +57,11 @@ class TestHTMLNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             leaf_node.to_html()
     
+    # Void elements have no value or closing tag
+    def test_lead_node_to_html_void_element(self):
+        leaf_node = LeafNode("img", "", {"src": "/a.png", "alt": "A"})
+        self.assertEqual(leaf_node.to_html(), '<img src="/a.png" alt="A">')
+
     # If tag == None
     def test_lead_node_to_html_tag_none(self):
         value = "bite me spider"
@@ -77,6 +83,26 @@ class TestLeafNode(unittest.TestCase):
         )
         self.assertEqual(node.to_html(), "<p><b>Bold text</b>Normal text<i>italic text</i>Normal text</p>")
 
+    # Streaming
+    def test_parent_node_iter_html(self):
+        node = ParentNode("div", [ParentNode("p", [LeafNode("b", "Bold text")]), LeafNode(None, "Normal text")])
+        self.assertListEqual(list(node.iter_html()), ["<div>", "<p>", "<b>Bold text</b>", "</p>", "Normal text", "</div>"])
+
+    def test_parent_node_write_html(self):
+        node = ParentNode("ul", [ParentNode("li", [LeafNode(None, str(i))]) for i in range(3)])
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), node.to_html())
+        self.assertEqual(out.getvalue(), "<ul><li>0</li><li>1</li><li>2</li></ul>")
+
+    def test_parent_node_props(self):
+        node = ParentNode("ul", [ParentNode("li", [LeafNode(None, "x")])], {"class": "tags"})
+        self.assertEqual(node.to_html(), '<ul class="tags"><li>x</li></ul>')
+
+    def test_nodes_have_no_dict(self):
+        for node in (HTMLNode("p", "text"), LeafNode("b", "Bold"), ParentNode("div", [LeafNode(None, "x")])):
+            self.assertFalse(hasattr(node, "__dict__"))
+
     
 
 
@@ -0,0 +1,127 @@
+import os
+import struct
+import tempfile
+import unittest
+
+import images
+from images import ImageCatalog, ImagePipeline, image_size, variant_path
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x06\x00\x00\x00"
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof = b"\xff\xc0" + struct.pack(">HBHH", 11, 8, height, width) + b"\x01\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof + b"\xff\xd9"
+
+
+class TestImageSize(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def size_of(self, data):
+        path = os.path.join(self.tmp.name, "image")
+        with open(path, "wb") as f:
+            f.write(data)
+        return image_size(path)
+
+    def test_formats(self):
+        self.assertEqual(self.size_of(png(1200, 800)), (1200, 800))
+        self.assertEqual(self.size_of(jpeg(640, 480)), (640, 480))
+        self.assertEqual(self.size_of(b"GIF89a" + struct.pack("<HH", 32, 16) + b"\x00" * 20), (32, 16))
+        vp8x = b"RIFF" + b"\x00" * 4 + b"WEBPVP8X" + b"\x00" * 8 + (1999).to_bytes(3, "little") + (999).to_bytes(3, "little")
+        self.assertEqual(self.size_of(vp8x), (2000, 1000))
+
+    def test_unknown_or_truncated(self):
+        self.assertIsNone(self.size_of(b"<svg></svg>"))
+        self.assertIsNone(self.size_of(b"\xff\xd8\xff\xe0"))
+
+
+class TestImageCatalog(unittest.TestCase):
+
+    def test_attributes(self):
+        catalog = ImageCatalog({"images/a.png": (1200, 800, "h")}, widths=(960, 480, 1600), resize=True)
+        self.assertEqual(catalog.attributes("/images/a.png"), {
+            "width": "1200",
+            "height": "800",
+            "srcset": "/images/a-480w.png 480w,/images/a-960w.png 960w,/images/a.png 1200w",
+            "sizes": "(max-width: 1200px) 100vw, 1200px",
+            "loading": "lazy",
+        })
+        self.assertEqual(catalog.attributes("/images/missing.png"), {})
+        self.assertEqual(catalog.attributes("https://example.com/images/a.png"), {})
+        self.assertEqual(catalog.variant_outputs("docs"), [os.path.join("docs", "images/a-480w.png"), os.path.join("docs", "images/a-960w.png")])
+
+    def test_sizes_only_without_an_encoder(self):
+        catalog = ImageCatalog({"images/a.png": (1200, 800, "h")}, resize=False)
+        self.assertEqual(catalog.attributes("/images/a.png"), {"width": "1200", "height": "800", "loading": "lazy"})
+        self.assertEqual(catalog.variant_outputs("docs"), [])
+
+    def test_variant_path(self):
+        self.assertEqual(variant_path("images/photo.jpeg", 480), "images/photo-480w.jpeg")
+
+
+class TestImagePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.cache = os.path.join(self.tmp.name, "cache")
+        os.makedirs(os.path.join(self.static, "images"))
+        for name, size in [("a.png", (1200, 800)), ("b.png", (300, 200))]:
+            with open(os.path.join(self.static, "images", name), "wb") as f:
+                f.write(png(*size))
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_scan_remembers_sizes(self):
+        catalog = ImagePipeline(self.static, self.dest, self.cache).scan()
+        self.assertEqual(sorted(catalog.images), ["images/a.png", "images/b.png"])
+        self.assertEqual(catalog.images["images/a.png"][:2], (1200, 800))
+
+        # A file with the same size and mtime isn't read again
+        path = os.path.join(self.static, "images", "a.png")
+        stat = os.stat(path)
+        with open(path, "r+b") as f:
+            f.seek(16)
+            f.write(struct.pack(">II", 1, 1))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(ImagePipeline(self.static, self.dest, self.cache).scan().images["images/a.png"][:2], (1200, 800))
+
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(ImagePipeline(self.static, self.dest, self.cache).scan().images["images/a.png"][:2], (1, 1))
+
+    def test_unreferenced_images_are_reported(self):
+        pipeline = ImagePipeline(self.static, self.dest, self.cache)
+        pipeline.scan()
+        pipeline.catalog.resize = False
+        self.assertEqual(pipeline.build({"images/a.png"}), ["images/b.png"])
+
+    @unittest.skipUnless(images.Image, "Pillow is not installed")
+    def test_variants_are_made_once(self):
+        pipeline = ImagePipeline(self.static, self.dest, self.cache, widths=(480,))
+        pipeline.scan()
+        changed = []
+        pipeline.build({"images/a.png", "images/b.png"}, jobs=1, changed=changed)
+        variant = os.path.join(self.dest, "images", "a-480w.png")
+        self.assertEqual(changed, [variant])
+        self.assertEqual(image_size(variant), (480, 320))
+
+        changed = []
+        pipeline.build({"images/b.png"}, jobs=1, changed=changed)
+        self.assertEqual(changed, [variant])
+        self.assertFalse(os.path.exists(variant))
+
+
+if __name__ == "__main__":
+    unittest.main()
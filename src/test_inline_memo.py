@@ -0,0 +1,71 @@
+import unittest
+from collections import Counter
+
+from inline_memo import MAX_TEXT_LENGTH, InlineMemo, format_memo_stats
+from links import LinkIndex
+from main import BuildContext, RenderOptions, generate_pages
+from search import SearchIndex
+from site_fixture import SiteTestCase
+
+
+class TestInlineMemo(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        memo = InlineMemo()
+        self.assertIsNone(memo.get("**a**"))
+        memo.put("**a**", "<b>a</b>", "a", [("link", "/x")])
+        self.assertEqual(memo.get("**a**"), ("<b>a</b>", "a", (("link", "/x"),)))
+        self.assertEqual(memo.counts(), {"inline_hits": 1, "inline_misses": 1, "inline_evictions": 0})
+
+    def test_least_recently_used_is_evicted(self):
+        memo = InlineMemo(max_bytes=40)
+        memo.put("one", "<i>one</i>", "one")
+        memo.put("two", "<i>two</i>", "two")
+        memo.get("one")
+        memo.put("six", "<i>six</i>", "six")
+        self.assertEqual(list(memo.entries), ["one", "six"])
+        self.assertEqual(memo.evictions, 1)
+        self.assertLessEqual(memo.size, 40)
+
+    def test_long_text_is_not_memoized(self):
+        memo = InlineMemo()
+        text = "x" * (MAX_TEXT_LENGTH + 1)
+        memo.put(text, text, text, [])
+        self.assertIsNone(memo.get(text))
+        self.assertEqual((memo.hits, memo.misses, len(memo.entries)), (0, 0, 0))
+
+    def test_format_memo_stats(self):
+        stats = {"inline_hits": 3, "inline_misses": 1, "inline_evictions": 0}
+        self.assertEqual(format_memo_stats(stats), "Inline memo: 3 hits, 1 misses (75% hit rate), 0 evictions")
+
+
+class TestMemoizedPages(SiteTestCase):
+    item = "- See [the **docs**](/docs) and ![logo](/logo.png)\n"
+    files = {
+        "template.html": "{{ Content }}",
+        "a.md": "# a\n\n" + item * 3,
+        "b.md": "# b\n\n" + item * 3,
+    }
+
+    def test_memo_matches_plain_conversion(self):
+        pages = [(self.path(f"{name}.md"), self.path(f"plain/{name}.html")) for name in ["a", "b"]]
+        memoized = [(source, self.path(f"memo/{name}.html")) for (source, _), name in zip(pages, ["a", "b"])]
+
+        plain_links, plain_search = LinkIndex(), SearchIndex()
+        generate_pages(pages, self.path("template.html"), "/", build=BuildContext(link_index=plain_links, search_index=plain_search))
+        for jobs in (1, 2):
+            stats = Counter()
+            link_index, search_index = LinkIndex(), SearchIndex()
+            build = BuildContext(RenderOptions(inline_memo_bytes=1024 * 1024), stats=stats, link_index=link_index,
+                                 search_index=search_index)
+            generate_pages(memoized, self.path("template.html"), "/", jobs, build)
+
+            self.assertGreater(stats["inline_hits"], 0)
+            for name in ["a", "b"]:
+                self.assertEqual(self.read(f"memo/{name}.html"), self.read(f"plain/{name}.html"))
+            self.assertEqual(link_index.links(pages[1][0]), plain_links.links(pages[1][0]))
+            self.assertEqual(search_index.entry(pages[1][0]), plain_search.entry(pages[1][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from links import LinkIndex, find_lines, format_broken_links, resolve
+
+class TestResolve(unittest.TestCase):
+
+    def test_internal_urls(self):
+        self.assertEqual(resolve("/blog/tom", "blog/majesty"), "blog/tom")
+        self.assertEqual(resolve("/", "blog"), "")
+        self.assertEqual(resolve("/blog/", ""), "blog/")
+        self.assertEqual(resolve("../tom?page=2#intro", "blog/majesty"), "blog/tom")
+        self.assertEqual(resolve("/images/a%20b.png", ""), "images/a b.png")
+
+    def test_external_and_in_page_urls(self):
+        for url in ["https://www.boot.dev", "mailto:me@example.com", "//cdn.example.com/a.js", "#top", ""]:
+            self.assertIsNone(resolve(url, "blog"), url)
+
+class TestLinkIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        for relative_path in ["static/images/tom.png", "content/index.md", "content/blog/tom.md"]:
+            os.makedirs(os.path.dirname(self.path(relative_path)), exist_ok=True)
+        with open(self.path("static/images/tom.png"), "wb") as f:
+            f.write(b"png")
+        with open(self.path("content/index.md"), "w", encoding="utf-8") as f:
+            f.write("# Home\n\n[Tom](/blog/tom)\n[Nobody](/blog/nobody)\n\n![Tom](/images/tom.png) ![Gone](/images/gone.png)\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, relative_path):
+        return os.path.join(self.root, relative_path)
+
+    def test_check_reports_dangling_references(self):
+        index = LinkIndex()
+        index.add(self.path("content/index.md"), self.path("docs/index.html"), [
+            ("link", "/blog/tom"), ("link", "/blog/nobody"), ("link", "https://www.boot.dev"),
+            ("image", "/images/tom.png"), ("image", "/images/gone.png"),
+        ])
+        index.add(self.path("content/blog/tom.md"), self.path("docs/blog/tom/index.html"), [("link", "../../")])
+
+        broken = index.check(self.path("docs"), self.path("static"))
+        source = self.path("content/index.md")
+        self.assertListEqual(broken, [(source, 4, "link", "/blog/nobody"), (source, 6, "image", "/images/gone.png")])
+        self.assertEqual(format_broken_links(broken[:1]), f"{source}:4: broken link /blog/nobody")
+        self.assertEqual(len(index), 6)
+
+    def test_find_lines(self):
+        lines = find_lines(self.path("content/index.md"), {"/blog/tom", "/not/there"})
+        self.assertEqual(lines, {"/blog/tom": [3], "/not/there": [None]})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import unittest
+
+from listings import Listings, tag_slug
+
+
+class FakeMetadata:
+    content_dir = "content"
+
+    def __init__(self, posts):
+        self._posts = posts
+
+    def posts(self, section):
+        return self._posts
+
+
+def post(name, date, tags=()):
+    metadata = {"title": name.capitalize(), "date": date, "tags": list(tags), "draft": False, "description": ""}
+    return os.path.join("content", "blog", name, "index.md"), metadata
+
+
+class TestListings(unittest.TestCase):
+
+    def setUp(self):
+        posts = [post("c", "2024-03-01", ["Middle Earth"]), post("b", "2024-02-01"), post("a", "2024-01-01", ["Middle Earth"])]
+        self.listings = Listings(FakeMetadata(posts), "blog", per_page=2)
+
+    def test_tag_slug(self):
+        self.assertEqual(tag_slug("Middle Earth!"), "middle-earth")
+
+    def test_pages(self):
+        pages = self.listings.pages()
+        self.assertEqual([page[0] for page in pages], ["/blog/", "/blog/page/2/", "/blog/tags/middle-earth/"])
+        path, title, heading, posts, previous, following = pages[1]
+        self.assertEqual((title, heading, previous, following), ("Blog, page 2", "Blog", "/blog/", None))
+        self.assertEqual([url for url, _ in posts], ["/blog/a/"])
+        self.assertEqual(pages[0][5], "/blog/page/2/")
+
+    def test_outputs(self):
+        skip = {os.path.join("docs", "blog", "index.html")}
+        self.assertEqual(
+            self.listings.outputs("docs", skip),
+            [os.path.join("docs", "blog", "page", "2", "index.html"), os.path.join("docs", "blog", "tags", "middle-earth", "index.html")],
+        )
+
+    def test_render_content(self):
+        _, _, heading, posts, previous, following = self.listings.pages()[0]
+        html = self.listings.render_content(heading, posts, previous, following)
+        self.assertIn('<li><h2><a href="/blog/c/">C</a></h2><time datetime="2024-03-01">2024-03-01</time>', html)
+        self.assertIn('<ul class="tags"><li><a href="/blog/tags/middle-earth/">Middle Earth</a></li></ul>', html)
+        self.assertTrue(html.endswith('<nav><a href="/blog/page/2/" rel="next">Older posts</a></nav></div>'))
+
+
+if __name__ == "__main__":
+    unittest.main()
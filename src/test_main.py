@@ -1,7 +1,20 @@
+import io
+import os
+import struct
+from collections import Counter
+import tempfile
+import threading
 import unittest
 import textnode
 import htmlnode
-from main import text_node_to_html_node, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link
+import main
+import output
+from links import LinkIndex
+from search import SearchIndex
+from images import ImageCatalog, ImagePipeline
+from profiler import BuildProfiler
+from site_fixture import SiteTestCase
+from main import rewrite_basepath, text_node_to_html_node, extract_markdown_images, extract_markdown_links, split_nodes_image, split_nodes_link, split_nodes_delimiter, text_to_textnodes, build_incremental, collect_pages, generate_pages, BuildContext, RenderOptions, write_content, markdown_to_blocks, iter_markdown_blocks, page_title, stream_title, generate_page, classify_block, BlockType, markdown_to_html_node
 
 class TestNodetoHTML(unittest.TestCase):
 
@@ -12,6 +25,16 @@ class TestNodetoHTML(unittest.TestCase):
         self.assertEqual(html_node.value, "Hello")
         self.assertEqual(html_node.props, None)
 
+    def test_image_node_to_html(self):
+        text_node = textnode.TextNode("A", textnode.TextType.IMAGES, "/images/a.png")
+        self.assertEqual(text_node_to_html_node(text_node).to_html(), '<img src="/images/a.png" alt="A">')
+
+        catalog = ImageCatalog({"images/a.png": (1000, 500, "h")}, widths=(500,), resize=True)
+        html = rewrite_basepath(text_node_to_html_node(text_node, catalog).to_html(), "/site/")
+        self.assertEqual(html, '<img src="/site/images/a.png" alt="A" width="1000" height="500" '
+                               'srcset="/site/images/a-500w.png 500w,/site/images/a.png 1000w" '
+                               'sizes="(max-width: 1000px) 100vw, 1000px" loading="lazy">')
+
     def test_extract_markdown_images(self):
         matches = extract_markdown_images(
             "This is text with an ![image](https://i.imgur.com/zjjcJKZ.png)"
@@ -59,5 +82,337 @@ class TestNodetoHTML(unittest.TestCase):
             new_nodes,
         )
 
+class TestTextToTextNodes(unittest.TestCase):
+
+    def chained(self, text):
+        nodes = [textnode.TextNode(text, textnode.TextType.NORMAL_TEXT)]
+        nodes = split_nodes_delimiter(nodes, "**", textnode.TextType.BOLD_TEXT)
+        nodes = split_nodes_delimiter(nodes, "_", textnode.TextType.ITALIC_TEXT)
+        nodes = split_nodes_delimiter(nodes, "`", textnode.TextType.CODE_TEXT)
+        nodes = split_nodes_image(nodes)
+        return split_nodes_link(nodes)
+
+    def test_text_to_textnodes(self):
+        nodes = text_to_textnodes(
+            "This is **text** with an _italic_ word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"
+        )
+        self.assertListEqual(
+            [
+                textnode.TextNode("This is ", textnode.TextType.NORMAL_TEXT),
+                textnode.TextNode("text", textnode.TextType.BOLD_TEXT),
+                textnode.TextNode(" with an ", textnode.TextType.NORMAL_TEXT),
+                textnode.TextNode("italic", textnode.TextType.ITALIC_TEXT),
+                textnode.TextNode(" word and a ", textnode.TextType.NORMAL_TEXT),
+                textnode.TextNode("code block", textnode.TextType.CODE_TEXT),
+                textnode.TextNode(" and an ", textnode.TextType.NORMAL_TEXT),
+                textnode.TextNode("obi wan image", textnode.TextType.IMAGES, "https://i.imgur.com/fJRm4Vk.jpeg"),
+                textnode.TextNode(" and a ", textnode.TextType.NORMAL_TEXT),
+                textnode.TextNode("link", textnode.TextType.LINK, "https://boot.dev"),
+            ],
+            nodes,
+        )
+
+    def test_matches_chained_passes(self):
+        for text in [
+            "",
+            "plain",
+            "_a **b** c_",
+            "`a**b`",
+            "unclosed **bold",
+            "****",
+            "a_b `c_d` e",
+            "**[bold link](/a)** and [link](/b_c)",
+            "!![img](/a.png)[link](/b)",
+        ]:
+            self.assertListEqual(self.chained(text), text_to_textnodes(text), text)
+
+class TestClassifyBlock(unittest.TestCase):
+
+    def test_block_types_and_parses(self):
+        cases = [
+            ("```\ncode\n```", BlockType.CODE, None),
+            ("### Heading", BlockType.HEADING, (3, "Heading")),
+            ("# Two\nlines", BlockType.HEADING, (1, None)),
+            ("> one\n>  two", BlockType.QUOTE, "one\ntwo"),
+            ("- a\n- **b**", BlockType.UNORDERED_LIST, ["a", "**b**"]),
+            ("1. a\n\n2. b\n 3. c", BlockType.ORDERED_LIST, ["a", "b", "3. c"]),
+            ("1. a\n3. b", BlockType.PARAGRAPH, None),
+            ("- a\n> b", BlockType.PARAGRAPH, None),
+        ]
+        for block, block_type, parsed in cases:
+            self.assertEqual(classify_block(block), (block_type, parsed), block)
+
+    def test_parses_render_like_the_block(self):
+        markdown = "## Title\n\n> quoted _text_\n\n- item\n- `code`\n\n1. first\n2. [link](/a)"
+        self.assertEqual(
+            markdown_to_html_node(markdown).to_html(),
+            "<div><h2>Title</h2><blockquote>quoted <i>text</i></blockquote>"
+            "<ul><li>item</li><li><code>code</code></li></ul>"
+            '<ol><li>first</li><li><a href="/a">link</a></li></ol></div>',
+        )
+
+    def test_code_blocks_are_escaped_and_labelled(self):
+        html = markdown_to_html_node("```\nif a < b:\nc & d\n```").to_html()
+        self.assertEqual(html, "<div><pre><code>if a &lt; b:\nc &amp; d</code></pre></div>")
+
+        html = markdown_to_html_node("```Python extra\nx = '<p>'\n```").to_html()
+        self.assertTrue(html.startswith('<div><pre><code class="highlight language-python">'))
+        self.assertNotIn("<p>", html)
+
+class TestWriteContent(unittest.TestCase):
+
+    def test_rewrites_basepath(self):
+        node = htmlnode.ParentNode("p", [htmlnode.LeafNode("a", "home", {"href": "/index"})])
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as f:
+            write_content(node, f, "/site/")
+            f.seek(0)
+            self.assertEqual(f.read(), '<p><a href="/site/index">home</a></p>')
+
+    def test_falls_back_on_error(self):
+        node = htmlnode.ParentNode("div", [
+            htmlnode.ParentNode("p", [htmlnode.LeafNode(None, "written first")]),
+            htmlnode.ParentNode("p", []),
+        ])
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as f:
+            f.write("<article>")
+            write_content(node, f, "/")
+            f.seek(0)
+            self.assertEqual(f.read(), "<article><div><p>Error converting markdown to HTML: parent nodes must have children</p></div>")
+
+class TestStreamingPages(unittest.TestCase):
+    markdown = "# Changelog\n\n## 1.0\n\n- added\n- fixed **bugs**\n\n\n\n```\ncode\n\n```\n\n    indented\n    text\n"
+
+    def test_blocks_match_markdown_to_blocks(self):
+        for text in [self.markdown, "", "\n", "\n\n", "a\n\n\nb", "a\n\n\n\nb\n\n", "no newline"]:
+            self.assertListEqual(list(iter_markdown_blocks(io.StringIO(text))), markdown_to_blocks(text), repr(text))
+
+    def test_title_matches_page_title(self):
+        for text in [self.markdown, "intro\n# Title  \n", "#\n\nLate title\n", "## Not a title\n", "#No space\n"]:
+            self.assertEqual(stream_title(io.StringIO(text)), page_title(text), repr(text))
+
+    def test_streamed_page_matches_whole_page(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "page.md")
+            template = os.path.join(tmp, "template.html")
+            with open(source, "w", encoding="utf-8") as f:
+                f.write(self.markdown + "[home](/index)\n")
+            with open(template, "w", encoding="utf-8") as f:
+                f.write("<title>{{ Title }}</title><main>{{ Content }}</main>")
+
+            self.addCleanup(setattr, main, "STREAM_THRESHOLD", main.STREAM_THRESHOLD)
+            outputs = []
+            for threshold in (float("inf"), 0):
+                main.STREAM_THRESHOLD = threshold
+                dest = os.path.join(tmp, f"out{len(outputs)}.html")
+                generate_page(source, template, dest, "/docs/")
+                with open(dest, encoding="utf-8") as f:
+                    outputs.append(f.read())
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertIn('href="/docs/index"', outputs[1])
+
+class TestIncrementalBuild(SiteTestCase):
+    files = {
+        "static/index.css": "body {}",
+        "content/index.md": "# Home",
+        "content/blog/post.md": "# Post",
+        "template.html": "<title>{{ Title }}</title>{{ Content }}",
+    }
+
+    def build(self, **context):
+        build_incremental(
+            self.path("static"), self.path("content"), self.path("template.html"),
+            self.path("docs"), "/", BuildContext(**context), manifest_path=self.path("cache/manifest.json"),
+        )
+
+    def test_only_changed_pages_regenerate(self):
+        self.build()
+        post = self.path("docs/blog/post.html")
+        os.utime(post, (0, 0))
+
+        self.write("content/index.md", "# Home again")
+        self.build()
+
+        self.assertEqual(os.stat(post).st_mtime, 0)
+        self.assertIn("Home again", self.read("docs/index.html"))
+
+    def test_template_change_regenerates_everything(self):
+        self.build()
+        post = self.path("docs/blog/post.html")
+        os.utime(post, (0, 0))
+
+        self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build()
+
+        self.assertNotEqual(os.stat(post).st_mtime, 0)
+
+    def test_converter_or_highlighter_change_regenerates_everything(self):
+        self.build()
+        for name in ("CONVERTER_VERSION", "HIGHLIGHT_CACHE_VERSION"):
+            self.addCleanup(setattr, main, name, getattr(main, name))
+            setattr(main, name, f"new {name}")
+            stats = Counter()
+            self.build(stats=stats)
+            # Both pages were converted again, none of their bodies came from the cache
+            self.assertEqual((stats["cache_hits"], stats["cache_misses"]), (0, 2))
+
+    def test_render_cache_only_misses_pages_showing_changed_images(self):
+        self.write("content/blog/post.md", "# Post\n\n![a](/images/a.png)")
+        pages = collect_pages(self.path("content"), self.path("docs"))
+
+        def build(images):
+            stats = Counter()
+            options = RenderOptions(cache_path=self.path("cache/render.sqlite"), image_catalog=ImageCatalog(images, widths=(), resize=False))
+            generate_pages(pages, self.path("template.html"), "/", build=BuildContext(options, stats=stats))
+            return stats["cache_hits"], stats["cache_misses"]
+
+        self.assertEqual(build({"images/a.png": (100, 50, "a")}), (0, 2))
+        # Another image, and new bytes with the same size, change no page
+        self.assertEqual(build({"images/a.png": (100, 50, "a2"), "images/b.png": (10, 10, "b")}), (2, 0))
+        self.assertEqual(build({"images/a.png": (200, 100, "a3"), "images/b.png": (10, 10, "b")}), (1, 1))
+
+    def test_removed_sources_are_deleted(self):
+        self.build()
+        os.remove(self.path("content/blog/post.md"))
+        os.remove(self.path("static/index.css"))
+        self.build()
+
+        self.assertFalse(os.path.exists(self.path("docs/blog")))
+        self.assertFalse(os.path.exists(self.path("docs/index.css")))
+        self.assertTrue(os.path.exists(self.path("docs/index.html")))
+
+    def test_partial_change_regenerates_dependent_pages(self):
+        self.write("partials/footer.html", "<footer>one</footer>")
+        self.write("layouts/blog.html", "<h1>{{ Title }}</h1>{{ Content }}{{> ../partials/footer.html }}")
+        self.build()
+        index = self.path("docs/index.html")
+        os.utime(index, (0, 0))
+
+        self.write("partials/footer.html", "<footer>two</footer>")
+        stats = Counter()
+        self.build(stats=stats)
+
+        self.assertEqual(os.stat(index).st_mtime, 0)
+        self.assertEqual(self.read("docs/blog/post.html"), "<h1>Post</h1><div><h1>Post</h1></div><footer>two</footer>")
+        # The body came from the last build, only the layout was applied again
+        self.assertEqual((stats["cache_hits"], stats["cache_misses"]), (1, 0))
+
+    def test_unchanged_pages_keep_their_links(self):
+        self.write("content/blog/post.md", "# Post\n\n[home](/) and [gone](/missing)")
+        self.build()
+
+        self.write("content/index.md", "# Home again")
+        link_index = LinkIndex()
+        self.build(link_index=link_index)
+
+        self.assertListEqual(link_index.links(self.path("content/blog/post.md")), [("link", "/"), ("link", "/missing")])
+        broken = link_index.check(self.path("docs"), self.path("static"))
+        self.assertListEqual(broken, [(self.path("content/blog/post.md"), 3, "link", "/missing")])
+
+    def test_unchanged_pages_stay_in_the_search_index(self):
+        self.write("content/blog/post.md", "# Post\n\nSome **bold** words, [linked](/) words")
+        self.build()
+
+        self.write("content/index.md", "# Home again")
+        search_index = SearchIndex()
+        self.build(search_index=search_index)
+
+        self.assertEqual(search_index.entry(self.path("content/blog/post.md")),
+                         ("Post", {"post": 1, "some": 1, "bold": 1, "words": 2, "linked": 1}))
+        self.assertEqual(search_index.entry(self.path("content/index.md")), ("Home again", {"home": 1, "again": 1}))
+
+    def test_image_change_regenerates_pages_showing_it(self):
+        self.write("content/blog/post.md", "# Post\n\n![a](/images/a.png)")
+
+        def build_with_image(width, height):
+            self.write("static/images/a.png", b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height))
+            catalog = ImagePipeline(self.path("static"), self.path("docs"), self.path("cache/images")).scan()
+            self.build(options=RenderOptions(image_catalog=catalog))
+            return self.read("docs/blog/post.html")
+
+        self.assertIn('width="100" height="50"', build_with_image(100, 50))
+        index = self.path("docs/index.html")
+        os.utime(index, (0, 0))
+
+        self.assertIn('width="200" height="100"', build_with_image(200, 100))
+        self.assertEqual(os.stat(index).st_mtime, 0)
+
+class TestParallelBuild(SiteTestCase):
+    files = {"template.html": "<title>{{ Title }}</title>{{ Content }}"}
+
+    def test_generate_pages_across_workers(self):
+        for name in ["content/a.md", "content/b.md", "content/blog/c.md"]:
+            self.write(name, f"# {name}")
+
+        pages = collect_pages(self.path("content"), self.path("docs"))
+        self.assertEqual(len(pages), 3)
+        failures = generate_pages(pages, self.path("template.html"), "/", jobs=2)
+
+        self.assertEqual(failures, [])
+        self.assertIn("<title>content/blog/c.md</title>", self.read("docs/blog/c.html"))
+
+    def test_unchanged_outputs_are_not_rewritten(self):
+        pages = [(self.write(f"{name}.md", f"# {name}"), self.path(f"docs/{name}.html")) for name in ["a", "b"]]
+
+        for jobs in (1, 2):
+            generate_pages(pages, self.path("template.html"), "/", jobs=jobs)
+            os.utime(pages[1][1], (0, 0))
+            self.write("a.md", f"# a, build {jobs}")
+
+            changed = []
+            stats = Counter()
+            self.assertEqual(generate_pages(pages, self.path("template.html"), "/", jobs, BuildContext(changed=changed, stats=stats)), [])
+            self.assertListEqual(changed, [pages[0][1]])
+            self.assertEqual((stats["pages_written"], stats["pages_unchanged"]), (1, 1))
+            self.assertEqual(os.stat(pages[1][1]).st_mtime, 0)
+
+    def test_serial_pages_are_written_on_io_threads(self):
+        pages = [(self.write(f"{name}.md", f"# {name}"), self.path(f"docs/{name}.html")) for name in ["a", "b"]]
+        threads = []
+
+        def stream_file(path, write):
+            threads.append(threading.get_ident())
+            return original(path, write)
+
+        original = output.stream_file
+        self.addCleanup(setattr, output, "stream_file", original)
+        output.stream_file = stream_file
+        changed = []
+        self.assertEqual(generate_pages(pages, self.path("template.html"), "/", build=BuildContext(changed=changed)), [])
+
+        self.assertListEqual(changed, [dest_path for _, dest_path in pages])
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_failures_are_reported(self):
+        pages = [(self.path("missing.md"), self.path("missing.html"))]
+        failures = generate_pages(pages, self.path("template.html"), "/", jobs=2)
+        self.assertEqual(failures, [pages[0][0]])
+
+class TestSeveralTargets(SiteTestCase):
+    files = {
+        "template.html": '<link href="/style.css">{{ Content }}',
+        "a.md": "# Title\n\nSee [b](/b)",
+    }
+
+    def test_targets_share_one_parse(self):
+        docs, public = self.path("docs"), self.path("public")
+        pages = [(self.path("a.md"), os.path.join(docs, "a.html"))]
+
+        for jobs in (1, 2):
+            profiler = BuildProfiler()
+            link_index = LinkIndex()
+            changed = []
+            build = BuildContext(profiler=profiler, link_index=link_index, changed=changed)
+            failures = generate_pages(pages, self.path("template.html"), "/", jobs, build, targets=[(docs, "/"), (public, "/site/")])
+            self.assertEqual(failures, [])
+            self.assertEqual(len(profiler.pages), 1)
+            self.assertEqual(link_index.links(pages[0][0]), [("link", "/b")])
+            self.assertEqual(link_index.pages[pages[0][0]][0], pages[0][1])
+            if jobs == 1:
+                self.assertEqual(changed, [pages[0][1], os.path.join(public, "a.html")])
+
+        self.assertEqual(self.read("docs/a.html"), '<link href="/style.css"><div><h1>Title</h1><p>See <a href="/b">b</a></p></div>')
+        self.assertEqual(self.read("public/a.html"), '<link href="/site/style.css"><div><h1>Title</h1><p>See <a href="/site/b">b</a></p></div>')
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from manifest import BuildManifest, hash_file, hash_text
+
+class TestBuildManifest(unittest.TestCase):
+
+    def test_load_missing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = BuildManifest.load(os.path.join(tmp, "manifest.json"))
+            self.assertEqual(manifest.pages, {})
+            self.assertEqual(manifest.templates, {})
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "manifest.json")
+            manifest = BuildManifest(path)
+            manifest.templates = {"template.html": {"hash": "abc", "includes": ["partials/nav.html"]}}
+            manifest.pages = {"content/index.md": {"hash": "123", "output": "docs/index.html"}}
+            manifest.save()
+
+            loaded = BuildManifest.load(path)
+            self.assertEqual(loaded.templates, manifest.templates)
+            self.assertEqual(loaded.pages, manifest.pages)
+
+    def test_invalidate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.json")
+            manifest = BuildManifest(path)
+            manifest.pages = {"content/index.md": {"hash": "123", "output": "docs/index.html"}}
+            manifest.save()
+
+            BuildManifest.invalidate(path)
+            self.assertEqual(BuildManifest.load(path).pages, {})
+            BuildManifest.invalidate(path)
+
+    def test_load_corrupt(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.json")
+            with open(path, "w") as f:
+                f.write("{not json")
+            self.assertEqual(BuildManifest.load(path).pages, {})
+
+    def test_hash_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# Hello")
+            self.assertEqual(hash_file(path), hash_text("# Hello"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from output import OutputWriter, stream_file, write_changed_list, write_file
+
+class TestWriteFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "docs", "index.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_identical_content_is_not_rewritten(self):
+        self.assertTrue(write_file(self.path, "<p>hi</p>"))
+        os.utime(self.path, (0, 0))
+
+        self.assertFalse(write_file(self.path, "<p>hi</p>"))
+        self.assertEqual(os.stat(self.path).st_mtime, 0)
+
+        self.assertTrue(write_file(self.path, "<p>bye</p>"))
+        self.assertEqual(self.read(), "<p>bye</p>")
+        self.assertListEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_replaces_instead_of_writing_through(self):
+        write_file(self.path, "old")
+        link = os.path.join(self.tmp.name, "link.html")
+        os.link(self.path, link)
+
+        write_file(self.path, "new")
+        with open(link, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "old")
+
+    def test_stream_file(self):
+        self.assertTrue(stream_file(self.path, lambda out: out.write("streamed")))
+        os.utime(self.path, (0, 0))
+        self.assertFalse(stream_file(self.path, lambda out: out.write("streamed")))
+        self.assertEqual(os.stat(self.path).st_mtime, 0)
+
+    def test_stream_file_compares_what_was_kept(self):
+        def replaced(text):
+            def write(out):
+                start = out.tell()
+                out.write("a body that failed")
+                out.seek(start)
+                out.truncate()
+                out.write(text)
+            return write
+
+        self.assertTrue(stream_file(self.path, replaced("error")))
+        self.assertEqual(self.read(), "error")
+        self.assertFalse(stream_file(self.path, replaced("error")))
+        self.assertTrue(stream_file(self.path, replaced("other")))
+        self.assertFalse(stream_file(self.path, lambda out: out.write("other")))
+
+    def test_failed_stream_leaves_old_file(self):
+        write_file(self.path, "old")
+
+        def fail(out):
+            out.write("half")
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            stream_file(self.path, fail)
+        self.assertEqual(self.read(), "old")
+        self.assertListEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+class TestOutputWriter(unittest.TestCase):
+
+    def test_changed_in_queued_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f"page{i}.html") for i in range(20)]
+            write_file(paths[3], "page 3")
+
+            writer = OutputWriter(jobs=2)
+            for i, path in enumerate(paths):
+                writer.write(path, f"page {i}")
+            writer.close()
+
+            self.assertListEqual(writer.changed, paths[:3] + paths[4:])
+            self.assertEqual(writer.unchanged, 1)
+            self.assertListEqual(writer.errors, [])
+
+    def test_streams_on_the_pool(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f"page{i}.html") for i in range(3)]
+            threads = []
+
+            def write(out):
+                threads.append(threading.get_ident())
+                out.write("page")
+
+            writer = OutputWriter(jobs=2)
+            for path in paths:
+                writer.stream(path, write)
+            writer.stream(paths[0], write, wait=True)
+            writer.close()
+
+            self.assertListEqual(writer.changed, paths)
+            self.assertEqual(writer.unchanged, 1)
+            self.assertNotIn(threading.get_ident(), threads[:3])
+            self.assertEqual(threads[3], threading.get_ident())
+
+    def test_errors_are_collected(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            blocker = os.path.join(tmp, "blocker")
+            write_file(blocker, "a file, not a directory")
+
+            writer = OutputWriter(jobs=2)
+            writer.write(os.path.join(blocker, "index.html"), "x")
+            writer.close()
+            self.assertEqual([path for path, _ in writer.errors], [os.path.join(blocker, "index.html")])
+
+    def test_changed_list(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            docs = os.path.join(tmp, "docs")
+            list_path = os.path.join(tmp, "changed.txt")
+            write_changed_list(list_path, [os.path.join(docs, "b", "index.html"), os.path.join(docs, "a.css")], docs)
+            with open(list_path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "a.css\nb/index.html\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+
+from main import BuildContext, generate_pages
+from profiler import BuildProfiler, STAGES
+from site_fixture import SiteTestCase
+
+class TestBuildProfiler(unittest.TestCase):
+
+    def test_page_records(self):
+        profiler = BuildProfiler()
+        profiler.start_page("content/index.md")
+        profiler.add("inline", 0.5)
+        profiler.add_bytes(read=10, written=20)
+        page = profiler.end_page()
+
+        self.assertEqual(page["stages"]["inline"], 0.5)
+        self.assertEqual(profiler.totals["inline"], 0.5)
+        self.assertEqual(profiler.summary()["bytes_written"], 20)
+
+    def test_time_outside_pages_counts_towards_totals(self):
+        profiler = BuildProfiler()
+        profiler.add("copy", 1.5)
+        self.assertEqual(profiler.totals["copy"], 1.5)
+        self.assertEqual(profiler.pages, [])
+
+    def test_slowest_pages(self):
+        profiler = BuildProfiler()
+        for name, seconds in [("a", 1.0), ("b", 3.0), ("c", 2.0)]:
+            profiler.add_page({"page": name, "seconds": seconds, "stages": dict.fromkeys(STAGES, 0.0), "bytes_read": 0, "bytes_written": 0})
+
+        summary = profiler.summary(top=2)
+        self.assertEqual([page["page"] for page in summary["slowest"]], ["b", "c"])
+        self.assertIn("Slowest 2 pages", profiler.report(top=2))
+
+    def test_write_json(self):
+        profiler = BuildProfiler()
+        profiler.finish()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out", "profile.json")
+            profiler.write_json(path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["pages"], 0)
+
+
+class TestProfiledPages(SiteTestCase):
+    files = {
+        "template.html": "<title>{{ Title }}</title>{{ Content }}",
+        "a.md": "# Title\n\nSome **bold** text",
+    }
+
+    def test_profiled_pages(self):
+        profiler = BuildProfiler()
+        generate_pages([(self.path("a.md"), self.path("a.html"))], self.path("template.html"), "/", build=BuildContext(profiler=profiler))
+
+        self.assertEqual(len(profiler.pages), 1)
+        self.assertGreater(profiler.totals["inline"], 0)
+        self.assertGreater(profiler.pages[0]["bytes_written"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
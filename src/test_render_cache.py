@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import render_cache
+from render_cache import RenderCache
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache", "render.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_and_miss(self):
+        cache = RenderCache(self.path, 1)
+        key = cache.key("# Hello")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, "<div><h1>Hello</h1></div>")
+        self.assertEqual(cache.get(key), "<div><h1>Hello</h1></div>")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_key_context(self):
+        cache = RenderCache(self.path, 1)
+        self.assertEqual(cache.key("# Hello", ""), cache.key("# Hello"))
+        self.assertNotEqual(cache.key("# Hello", "/a.png 1"), cache.key("# Hello", "/a.png 2"))
+        cache.close()
+
+    def test_persists_across_builds(self):
+        cache = RenderCache(self.path, 1)
+        cache.put(cache.key("# Hello"), "<h1>Hello</h1>")
+        cache.close()
+
+        cache = RenderCache(self.path, 1)
+        self.assertEqual(cache.get(cache.key("# Hello")), "<h1>Hello</h1>")
+        cache.close()
+
+    def test_version_invalidates(self):
+        cache = RenderCache(self.path, 1)
+        cache.put(cache.key("# Hello"), "<h1>Hello</h1>")
+        cache.close()
+
+        cache = RenderCache(self.path, 2)
+        self.assertIsNone(cache.get(cache.key("# Hello")))
+        cache.close()
+
+    def use_every_hit(self):
+        self.addCleanup(setattr, render_cache, "TOUCH_INTERVAL_NS", render_cache.TOUCH_INTERVAL_NS)
+        render_cache.TOUCH_INTERVAL_NS = 0
+
+    def last_used(self, key):
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute("SELECT last_used FROM pages WHERE hash = ?", (key,)).fetchone()[0]
+
+    def test_least_recently_used_evicted(self):
+        self.use_every_hit()
+        cache = RenderCache(self.path, 1, max_bytes=250)
+        for name in ["a", "b"]:
+            cache.put(name, name * 100)
+        cache.get("a")
+        cache.put("c", "c" * 100)
+
+        self.assertEqual(cache.get("a"), "a" * 100)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "c" * 100)
+        cache.close()
+
+    def test_hits_are_written_in_batches(self):
+        cache = RenderCache(self.path, 1)
+        cache.put("a", "<p>a</p>")
+        put_at = self.last_used("a")
+        # Used moments ago, so a hit doesn't write anything
+        cache.get("a")
+        self.assertEqual(cache.touched, [])
+
+        self.use_every_hit()
+        for _ in range(render_cache.TOUCH_BATCH - 1):
+            cache.get("a")
+        self.assertEqual(self.last_used("a"), put_at)
+        cache.get("a")
+        batch_at = self.last_used("a")
+        self.assertGreater(batch_at, put_at)
+        self.assertEqual(cache.touched, [])
+
+        # What's left is written when the cache is closed
+        cache.get("a")
+        cache.close()
+        self.assertGreater(self.last_used("a"), batch_at)
+
+    def test_links_and_terms_stored_with_page(self):
+        cache = RenderCache(self.path, 1)
+        cache.put("a", "<p>a</p>", [("link", "/about"), ("image", "/images/a.png")], {"about": 2})
+        cache.put("b", "<p>b</p>")
+        self.assertEqual(cache.get_page("a"), ("<p>a</p>", [("link", "/about"), ("image", "/images/a.png")], {"about": 2}))
+        self.assertEqual(cache.get_page("b"), ("<p>b</p>", [], {}))
+        self.assertIsNone(cache.get_page("c"))
+        cache.close()
+
+    def test_old_schema_is_recreated(self):
+        os.makedirs(os.path.dirname(self.path))
+        connection = sqlite3.connect(self.path)
+        connection.execute("CREATE TABLE pages (hash TEXT, version TEXT, html TEXT, size INTEGER, last_used INTEGER)")
+        connection.execute("INSERT INTO pages VALUES ('a', '1', '<p>a</p>', 8, 0)")
+        connection.commit()
+        connection.close()
+
+        cache = RenderCache(self.path, 1)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", "<p>a</p>")
+        self.assertEqual(cache.get("a"), "<p>a</p>")
+        cache.close()
+
+if __name__ == "__main__":
+    unittest.main()
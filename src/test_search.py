@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+
+from search import SearchIndex, TermCounter, page_url, tokenize
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def output(self, relative_path):
+        path = os.path.join(self.dest, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("<html></html>")
+        os.utime(path, (0, 0))
+        return path
+
+    def test_tokenize(self):
+        self.assertListEqual(tokenize("The Café's menu, a 2nd look!"), ["the", "café", "menu", "2nd", "look"])
+
+    def test_term_counter_collects_text_nodes(self):
+        terms = TermCounter()
+        terms.append("Hello world")
+        terms.append("hello")
+        terms.update({"world": 1})
+        self.assertEqual(terms.counts(), {"hello": 2, "world": 2})
+
+    def test_page_urls(self):
+        self.assertEqual(page_url(os.path.join(self.dest, "index.html"), self.dest), "")
+        self.assertEqual(page_url(os.path.join(self.dest, "blog", "tom", "index.html"), self.dest), "blog/tom/")
+        self.assertEqual(page_url(os.path.join(self.dest, "about.html"), self.dest), "about.html")
+
+    def test_inverted_index(self):
+        index = SearchIndex()
+        index.add("content/index.md", self.output("index.html"), "Home", {"welcome": 2, "tolkien": 1})
+        index.add("content/blog/tom/index.md", self.output("blog/tom/index.html"), "Tom", {"tolkien": 3})
+
+        self.assertEqual(index.index(self.dest, "/docs/"), {
+            "version": 1,
+            "pages": [["/docs/", "Home"], ["/docs/blog/tom/", "Tom"]],
+            "terms": {"tolkien": [0, 1, 1, 3], "welcome": [0, 2]},
+        })
+
+    def test_write_index_and_sitemap(self):
+        index = SearchIndex()
+        index.add("content/index.md", self.output("index.html"), "Home", {"home": 1})
+        index.add("content/a & b.md", self.output("a & b.html"), "A & B", {})
+
+        changed = index.write(self.dest, "/", "https://example.com/")
+        self.assertListEqual(changed, [os.path.join(self.dest, "search.json"), os.path.join(self.dest, "sitemap.xml")])
+        with open(os.path.join(self.dest, "search.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["pages"], [["/", "Home"], ["/a & b.html", "A & B"]])
+        with open(os.path.join(self.dest, "sitemap.xml"), encoding="utf-8") as f:
+            sitemap = f.read()
+        self.assertIn("<url><loc>https://example.com/</loc><lastmod>1970-01-01</lastmod></url>", sitemap)
+        self.assertIn("<loc>https://example.com/a%20%26%20b.html</loc>", sitemap)
+
+        # Nothing changed, so neither file is rewritten
+        self.assertListEqual(index.write(self.dest, "/", "https://example.com/"), [])
+
+        # Pages made without markdown, like listings, are only in the sitemap
+        listing = self.output("blog/index.html")
+        self.assertListEqual(index.write(self.dest, "/", "https://example.com/", [listing]), [os.path.join(self.dest, "sitemap.xml")])
+        self.assertIn("<url><loc>https://example.com/blog/</loc><lastmod>1970-01-01</lastmod></url>", index.sitemap(self.dest, "/", "https://example.com/", [listing]))
+
+        # Without a site URL there's no sitemap, its URLs would be relative
+        self.assertListEqual(index.write(self.dest, "/"), [os.path.join(self.dest, "sitemap.xml")])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "sitemap.xml")))
+        with self.assertRaises(ValueError):
+            index.sitemap(self.dest, "/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from sync import sync_directory
+
+class TestSyncDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dst = os.path.join(self.tmp.name, "docs")
+        self.write(self.src, "index.css", "body {}")
+        self.write(self.src, "images/a.png", "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, root, relative_path, text):
+        path = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_copies_only_changed_files(self):
+        stats = sync_directory(self.src, self.dst, mode="copy")
+        self.assertEqual(stats["copied"], 2)
+
+        self.write(self.src, "index.css", "body { margin: 0 }")
+        changed = []
+        stats = sync_directory(self.src, self.dst, mode="copy", changed=changed)
+        self.assertEqual((stats["copied"], stats["unchanged"]), (1, 1))
+        self.assertListEqual(changed, [os.path.join(self.dst, "index.css")])
+        with open(os.path.join(self.dst, "index.css"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "body { margin: 0 }")
+
+    def test_removes_stale_files_but_keeps_outputs(self):
+        page = self.write(self.dst, "blog/index.html", "<p>page</p>")
+        self.write(self.dst, "old/stale.png", "old")
+        changed = []
+        stats = sync_directory(self.src, self.dst, keep=[page], mode="copy", changed=changed)
+
+        self.assertEqual(stats["removed"], 1)
+        self.assertIn(os.path.join(self.dst, "old", "stale.png"), changed)
+        self.assertTrue(os.path.exists(page))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "old")))
+
+    def test_hash_comparison_skips_touched_files(self):
+        sync_directory(self.src, self.dst, mode="copy")
+        os.utime(os.path.join(self.src, "index.css"), (1, 1))
+
+        stats = sync_directory(self.src, self.dst, use_hash=True, mode="copy")
+        self.assertEqual(stats["copied"], 0)
+        self.assertEqual(os.stat(os.path.join(self.dst, "index.css")).st_mtime, 1)
+
+    def test_hardlinks(self):
+        stats = sync_directory(self.src, self.dst, mode="hardlink")
+        self.assertEqual(stats["linked"], 2)
+        self.assertTrue(os.path.samefile(os.path.join(self.src, "index.css"), os.path.join(self.dst, "index.css")))
+
+        stats = sync_directory(self.src, self.dst, mode="hardlink")
+        self.assertEqual(stats["unchanged"], 2)
+
+    def test_transforms_write_only_when_the_output_changes(self):
+        transforms = {".css": lambda css: css.replace(" ", "")}
+        stats = sync_directory(self.src, self.dst, mode="hardlink", transforms=transforms)
+        self.assertEqual((stats["copied"], stats["linked"]), (1, 1))
+        with open(os.path.join(self.dst, "index.css"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "body{}")
+
+        changed = []
+        stats = sync_directory(self.src, self.dst, mode="hardlink", transforms=transforms, changed=changed)
+        self.assertEqual((stats["unchanged"], changed), (2, []))
+
+    def test_companions_live_as_long_as_their_file(self):
+        page = self.write(self.dst, "index.html", "<p>page</p>")
+        self.write(self.dst, "index.html.gz", "gz")
+        self.write(self.dst, "index.css.gz", "gz")
+        self.write(self.dst, "gone.css.gz", "gz")
+        sync_directory(self.src, self.dst, keep=[page], mode="copy", companions=(".gz",))
+
+        self.assertTrue(os.path.exists(page + ".gz"))
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "index.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "gone.css.gz")))
+
+if __name__ == "__main__":
+    unittest.main()
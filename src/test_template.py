@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+from template import Layouts, Template, load_template, read_template_source
+
+class TestTemplate(unittest.TestCase):
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title><article>{{ Content }}</article>")
+        self.assertEqual(
+            template.render({"Title": "Hello", "Content": "<p>Hi</p>"}),
+            "<title>Hello</title><article><p>Hi</p></article>",
+        )
+
+    def test_arbitrary_placeholders(self):
+        template = Template("{{ Title }} by {{author}} on {{ Date }}")
+        self.assertEqual(template.names, {"Title", "author", "Date"})
+        self.assertEqual(template.render({"Title": "Post", "author": "Me", "Date": "today"}), "Post by Me on today")
+
+    def test_missing_placeholders_are_kept(self):
+        template = Template("<p>{{ Missing }}</p>")
+        self.assertEqual(template.render({}), "<p>{{ Missing }}</p>")
+
+    def test_callable_values_stream(self):
+        template = Template("<div>{{ Content }}</div>")
+        self.assertEqual(template.render({"Content": lambda out: out.write("streamed")}), "<div>streamed</div>")
+
+    def test_basepath_rewritten_once(self):
+        template = Template('<link href="/index.css"><img src="/a.png">{{ Content }}', "/site/")
+        self.assertEqual(
+            template.render({"Content": '<a href="/b">'}),
+            '<link href="/site/index.css"><img src="/site/a.png"><a href="/b">',
+        )
+
+    def test_load_template_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{{ Title }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("<h1>{{ Title }}</h1>")
+            self.assertEqual(load_template(path).render({"Title": "x"}), "<h1>x</h1>")
+
+class TestIncludes(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_partials_are_inlined(self):
+        header = self.write("partials/header.html", '<header>{{> nav.html }}</header>')
+        nav = self.write("partials/nav.html", '<a href="/">{{ Title }}</a>')
+        layout = self.write("layouts/blog.html", "{{> ../partials/header.html }}{{ Content }}")
+
+        template = load_template(layout, "/site/")
+        self.assertEqual(template.render({"Title": "Home", "Content": "body"}), '<header><a href="/site/">Home</a></header>body')
+        self.assertEqual(template.dependencies, [layout, header, nav])
+
+    def test_changed_partial_reloads(self):
+        self.write("partials/footer.html", "old")
+        layout = self.write("template.html", "{{ Content }}{{> partials/footer.html }}")
+        self.assertEqual(load_template(layout).render({"Content": ""}), "old")
+
+        self.write("partials/footer.html", "new footer")
+        self.assertEqual(load_template(layout).render({"Content": ""}), "new footer")
+
+    def test_include_cycle(self):
+        a = self.write("a.html", "{{> b.html }}")
+        self.write("b.html", "{{> a.html }}")
+        with self.assertRaises(ValueError):
+            read_template_source(a)
+
+    def test_layouts_for_page(self):
+        self.write("layouts/blog.html", "")
+        content = os.path.join(self.root, "content")
+        layouts = Layouts(content, os.path.join(self.root, "layouts"), "template.html")
+
+        self.assertEqual(layouts.for_page(os.path.join(content, "blog", "tom", "index.md")), os.path.join(self.root, "layouts", "blog.html"))
+        self.assertEqual(layouts.for_page(os.path.join(content, "contact", "index.md")), "template.html")
+        self.assertEqual(layouts.for_page(os.path.join(content, "index.md")), "template.html")
+
+if __name__ == "__main__":
+    unittest.main()
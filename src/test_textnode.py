@@ -57,5 +57,9 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", TextType.NORMAL_TEXT)
         self.assertEqual(node.__eq__(node2), True)
 
+    def test_no_dict(self):
+        node = TextNode("This is a text node", TextType.NORMAL_TEXT)
+        self.assertFalse(hasattr(node, "__dict__"))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import time
+import unittest
+
+from site_fixture import SiteTestCase
+from watch import SiteWatcher
+
+class TestSiteWatcher(SiteTestCase):
+    files = {
+        "static/index.css": "body {}",
+        "content/index.md": "# Home",
+        "content/blog/post.md": "# Post",
+        "template.html": "<title>{{ Title }}</title>{{ Content }}",
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.watcher = SiteWatcher(
+            self.path("static"), self.path("content"), self.path("template.html"), self.path("docs"),
+            cache_dir=self.path("cache"),
+        )
+        self.watcher.build()
+
+    def test_initial_build(self):
+        self.assertEqual(self.watcher.parsed, 2)
+        self.assertIn("<title>Post</title>", self.read("docs/blog/post.html"))
+        self.assertEqual(self.read("docs/index.css"), "body {}")
+
+    def test_changed_page_rebuilds_alone(self):
+        self.write("content/index.md", "# Home again", mtime=1)
+        changed = self.watcher.poll()
+
+        self.assertEqual(changed, {self.path("content/index.md")})
+        self.assertEqual(self.watcher.parsed, 3)
+        self.assertIn("Home again", self.read("docs/index.html"))
+
+    def test_edit_to_refresh_counts_from_the_last_scan(self):
+        # An mtime from long ago, like cp -p or git checkout leave
+        self.write("static/index.css", "body { margin: 0 }", mtime=1)
+        scanned_at = self.watcher.scanned_at
+        self.watcher.poll()
+        self.assertGreaterEqual(self.watcher.latency, 0)
+        self.assertLessEqual(self.watcher.latency, time.time() - scanned_at)
+
+    def test_template_change_reuses_parsed_pages(self):
+        self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}", mtime=1)
+        self.watcher.poll()
+
+        self.assertEqual(self.watcher.parsed, 2)
+        self.assertEqual(self.watcher.rendered, 4)
+        self.assertTrue(self.read("docs/blog/post.html").startswith("<h1>Post</h1>"))
+
+    def test_layout_change_rerenders_its_pages(self):
+        self.write("partials/nav.html", "<nav>blog</nav>", mtime=1)
+        self.write("layouts/blog.html", "{{> ../partials/nav.html }}{{ Content }}", mtime=1)
+        self.watcher.poll()
+        self.assertTrue(self.read("docs/blog/post.html").startswith("<nav>blog</nav>"))
+        rendered = self.watcher.rendered
+        self.assertEqual(self.watcher.poll(), set())
+
+        self.write("partials/nav.html", "<nav>posts</nav>", mtime=2)
+        self.watcher.poll()
+
+        self.assertEqual(self.watcher.rendered, rendered + 1)
+        self.assertTrue(self.read("docs/blog/post.html").startswith("<nav>posts</nav>"))
+        self.assertIn("<title>Home</title>", self.read("docs/index.html"))
+
+    def test_removed_sources(self):
+        os.remove(self.path("content/blog/post.md"))
+        os.remove(self.path("static/index.css"))
+        self.watcher.poll()
+
+        self.assertFalse(os.path.exists(self.path("docs/blog/post.html")))
+        self.assertFalse(os.path.exists(self.path("docs/index.css")))
+        # The section's index stays, with nothing in it, as a full build leaves it
+        self.assertIn("Nothing here yet.", self.read("docs/blog/index.html"))
+
+    def test_front_matter(self):
+        self.write("template.html", "<title>{{ Title }}</title><meta content=\"{{ Description }}\">{{ Date }}{{ Content }}", mtime=1)
+        self.write("content/blog/post.md", "---\ntitle: From front matter\ndescription: About it\ndate: 2024-05-01\n---\n# Post", mtime=1)
+        self.watcher.poll()
+
+        self.assertEqual(
+            self.read("docs/blog/post.html"),
+            '<title>From front matter</title><meta content="About it">2024-05-01<div><h1>Post</h1></div>',
+        )
+        self.assertIn("<title>Home</title><meta content=\"\">", self.read("docs/index.html"))
+
+    def test_drafts_are_left_out(self):
+        self.write("content/blog/post.md", "---\ndraft: true\n---\n# Post", mtime=1)
+        self.watcher.poll()
+        self.assertFalse(os.path.exists(self.path("docs/blog/post.html")))
+
+        self.write("content/blog/post.md", "---\ndraft: false\n---\n# Post", mtime=2)
+        self.watcher.poll()
+        self.assertEqual(self.read("docs/blog/post.html"), "<title>Post</title><div><h1>Post</h1></div>")
+
+    def test_listings_follow_the_section(self):
+        self.assertIn('<a href="/blog/post.html">Post</a>', self.read("docs/blog/index.html"))
+
+        self.write("content/blog/post.md", "---\ndate: 2024-05-01\ntags: [elves]\n---\n# Post", mtime=1)
+        self.write("content/blog/older.md", "---\ndate: 2023-01-01\n---\n# Older", mtime=1)
+        self.watcher.poll()
+        listing = self.read("docs/blog/index.html")
+        self.assertLess(listing.index("Post"), listing.index("Older"))
+        self.assertIn("Posts tagged “elves”", self.read("docs/blog/tags/elves/index.html"))
+
+        self.write("content/blog/post.md", "---\ndraft: true\n---\n# Post", mtime=2)
+        self.watcher.poll()
+        self.assertNotIn("Post", self.read("docs/blog/index.html"))
+        self.assertFalse(os.path.exists(self.path("docs/blog/tags")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,278 @@
+import argparse
+import functools
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from main import (
+    CACHE_DIR, LAYOUTS_DIR, MANIFEST_PATH, markdown_to_html_node, page_context, page_title, stream_title, write_content,
+    write_listings, write_page, _remove_output,
+)
+from frontmatter import MetadataIndex, page_metadata, split_front_matter
+from highlight import write_stylesheet
+from listings import DEFAULT_PER_PAGE as LISTING_PER_PAGE, DEFAULT_SECTION as LISTING_SECTION, Listings
+from manifest import BuildManifest
+from template import Layouts, load_template
+
+
+class SiteWatcher:
+    """
+    Keeps a built site in sync with its sources by polling them for changes.
+
+    Parsed pages stay in memory, so a changed page is the only one parsed
+    again. A changed layout or partial re-renders only the pages that use
+    it, from the kept trees, without reading or parsing any markdown.
+    Pages whose front matter says draft: true are left out unless drafts
+    is set, like in a full build. The listing pages of the blog section
+    are written again when a page in it, or a template, changes.
+    """
+
+    def __init__(self, static_dir, content_dir, template_path, dest_dir, basepath="/", drafts=False,
+                 cache_dir=CACHE_DIR, per_page=LISTING_PER_PAGE):
+        self.static_dir = static_dir
+        self.content_dir = content_dir
+        self.template_path = template_path
+        self.dest_dir = dest_dir
+        self.basepath = basepath
+        self.drafts = drafts
+        self.layouts_dir = os.path.join(os.path.dirname(template_path), LAYOUTS_DIR)
+        self.layouts = Layouts(content_dir, self.layouts_dir, template_path)
+        self.metadata = MetadataIndex(content_dir, os.path.join(cache_dir, "metadata.json"))
+        self.per_page = per_page
+
+        # markdown path -> (html node, template slots from its front matter)
+        self.pages = {}
+        # markdown path -> layout it was last rendered with
+        self.page_layouts = {}
+        # Layout of the listing pages, and the outputs they were last written to
+        self.listing_layout = None
+        self.listing_outputs = set()
+        # source path -> (mtime, size)
+        self.snapshot = {}
+        # When the snapshot was taken, and the last rebuild's edit-to-refresh seconds
+        self.scanned_at = None
+        self.latency = None
+        self.parsed = 0
+        self.rendered = 0
+
+    def scan(self):
+        """Stat every source the site is built from"""
+        paths = []
+        for directory in (self.static_dir, self.content_dir, self.layouts_dir):
+            for root, _, filenames in os.walk(directory):
+                paths.extend(os.path.join(root, filename) for filename in filenames)
+        paths.extend(self.template_files())
+
+        snapshot = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def track_template_files(self):
+        """
+        Add partials to the snapshot that were only found while rendering,
+        so the next poll doesn't count them as changed
+        """
+        for path in self.template_files() - set(self.snapshot):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            self.snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+    def template_files(self):
+        """Every layout in use and the partials they include"""
+        files = set()
+        for layout in (set(self.page_layouts.values()) | {self.template_path, self.listing_layout}) - {None}:
+            try:
+                files.update(load_template(layout, self.basepath).dependencies)
+            except (OSError, ValueError):
+                files.add(layout)
+        return files
+
+    def output_path(self, path):
+        if path.startswith(self.static_dir + os.sep):
+            return os.path.join(self.dest_dir, os.path.relpath(path, self.static_dir))
+        relative_path = os.path.relpath(path, self.content_dir)
+        return os.path.join(self.dest_dir, os.path.splitext(relative_path)[0] + ".html")
+
+    def is_page(self, path):
+        return path.startswith(self.content_dir + os.sep) and path.endswith(".md")
+
+    def is_listed(self, path):
+        """Whether the page at path can be on the listing pages"""
+        return self.is_page(path) and path.startswith(os.path.join(self.content_dir, LISTING_SECTION) + os.sep)
+
+    def parse_page(self, path):
+        """Parse the page at path, returns False for a draft left out, whose output is removed"""
+        with open(path, "r", encoding="utf-8") as md_file:
+            front_matter, markdown = split_front_matter(md_file.read())
+        self.parsed += 1
+        if page_metadata(front_matter)["draft"] and not self.drafts:
+            self.pages.pop(path, None)
+            self.page_layouts.pop(path, None)
+            _remove_output(self.output_path(path), self.dest_dir)
+            return False
+        self.pages[path] = (markdown_to_html_node(markdown), page_context(front_matter, lambda: page_title(markdown)))
+        return True
+
+    def render_page(self, path):
+        layout = self.layouts.for_page(path)
+        template = load_template(layout, self.basepath)
+        self.page_layouts[path] = layout
+
+        html_node, context = self.pages[path]
+        context = dict(context, Content=lambda out: write_content(html_node, out, self.basepath))
+        write_page(template, context, self.output_path(path))
+        self.rendered += 1
+
+    def uses_templates(self, path, template_paths):
+        """Whether the page's layout changed, or it includes any of template_paths"""
+        layout = self.layouts.for_page(path)
+        if layout != self.page_layouts.get(path):
+            return True
+        try:
+            return not template_paths.isdisjoint(load_template(layout, self.basepath).dependencies)
+        except (OSError, ValueError):
+            return True
+
+    def write_listings(self):
+        """Write the listing pages from the pages' metadata, and remove those no longer listed"""
+        listings = Listings(self.metadata.scan(stream_title), LISTING_SECTION, self.per_page)
+        self.listing_layout = self.layouts.for_page(os.path.join(self.content_dir, LISTING_SECTION, "index.md"))
+        # Listing pages a markdown page makes are left to it
+        page_outputs = {self.output_path(path) for path in self.pages}
+        write_listings(listings, self.dest_dir, self.listing_layout, self.basepath, page_outputs)
+        outputs = set(listings.outputs(self.dest_dir, page_outputs))
+        for output in sorted(self.listing_outputs - outputs - page_outputs):
+            _remove_output(output, self.dest_dir)
+        self.listing_outputs = outputs
+
+    def build(self):
+        """Build everything from scratch and remember the sources' state"""
+        self.scanned_at = time.time()
+        self.snapshot = self.scan()
+        self.apply(set(self.snapshot), set())
+        self.track_template_files()
+        write_stylesheet(self.dest_dir)
+
+    def apply(self, changed, removed):
+        """Bring the outputs of the changed and removed sources up to date"""
+        template_changes = {
+            path for path in changed | removed
+            if not self.is_page(path) and not path.startswith(self.static_dir + os.sep)
+        }
+        if template_changes:
+            # Layouts may have been added or removed, so every page picks its layout again
+            self.layouts = Layouts(self.content_dir, self.layouts_dir, self.template_path)
+
+        for path in sorted(removed):
+            self.pages.pop(path, None)
+            self.page_layouts.pop(path, None)
+            if path.startswith(self.static_dir + os.sep) or self.is_page(path):
+                _remove_output(self.output_path(path), self.dest_dir)
+
+        pages_to_render = set()
+        for path in sorted(changed):
+            try:
+                if self.is_page(path):
+                    if self.parse_page(path):
+                        pages_to_render.add(path)
+                elif path.startswith(self.static_dir + os.sep):
+                    dest_path = self.output_path(path)
+                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                    shutil.copy2(path, dest_path)
+            except Exception as e:
+                print(f"Error updating {path}: {e}")
+
+        if template_changes:
+            pages_to_render.update(path for path in self.pages if self.uses_templates(path, template_changes))
+
+        for path in sorted(pages_to_render):
+            try:
+                self.render_page(path)
+            except Exception as e:
+                print(f"Error rendering {path}: {e}")
+
+        if template_changes or any(self.is_listed(path) for path in changed | removed):
+            try:
+                self.write_listings()
+            except Exception as e:
+                print(f"Error writing the {LISTING_SECTION}/ listings: {e}")
+
+    def poll(self):
+        """Rebuild whatever changed since the last scan, returns the changed sources"""
+        previous_scan, self.scanned_at = self.scanned_at, time.time()
+        snapshot = self.scan()
+        changed = {path for path, state in snapshot.items() if self.snapshot.get(path) != state}
+        removed = set(self.snapshot) - set(snapshot)
+        self.snapshot = snapshot
+        if not changed and not removed:
+            return set()
+
+        started = time.time()
+        self.apply(changed, removed)
+        self.track_template_files()
+        finished = time.time()
+
+        # Edit-to-refresh latency runs from the newest source mtime to the finished rebuild. The
+        # last scan didn't see the edit, so it came after it, whatever mtime cp -p or git left
+        newest_edit = max((snapshot[path][0] / 1e9 for path in changed), default=started)
+        if previous_scan is not None:
+            newest_edit = max(newest_edit, previous_scan)
+        newest_edit = min(newest_edit, started)
+        self.latency = finished - newest_edit
+        print(
+            f"Rebuilt {len(changed)} changed and {len(removed)} removed sources in "
+            f"{(finished - started) * 1000:.1f} ms, edit-to-refresh {self.latency * 1000:.1f} ms"
+        )
+        return changed | removed
+
+    def run(self, interval=0.5):
+        while True:
+            time.sleep(interval)
+            self.poll()
+
+
+def serve(directory, port):
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"Serving {directory} at http://localhost:{port}/")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the site and rebuild pages as their sources change")
+    parser.add_argument("basepath", nargs="?", default="/", help="URL prefix the site is served under")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls for changes")
+    parser.add_argument("--drafts", action="store_true", help="build pages whose front matter says draft: true as well")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
+    watcher = SiteWatcher("static", "content", "template.html", "docs", args.basepath, args.drafts)
+    # The watcher writes pages without recording them for incremental builds
+    BuildManifest.invalidate(MANIFEST_PATH)
+    started = time.time()
+    watcher.build()
+    print(f"Built {len(watcher.pages)} pages in {(time.time() - started) * 1000:.1f} ms, watching for changes")
+
+    server = serve(watcher.dest_dir, args.port)
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()